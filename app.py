@@ -1,26 +1,95 @@
+"""
+MyDataTrace 的 Streamlit 界面：页面布局、会话状态和交互，数据处理与渲染在 mydatatrace 库中
+导入本模块没有副作用，页面配置和会话状态在 main() 中初始化；Matplotlib、pandas 在用到时才加载
+"""
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
 from datetime import datetime
+import functools
 import io
+import os
+import re
+import secrets
+import time
 
-
-# 设置页面配置
-st.set_page_config(
-    page_title="时光数绘轨迹图 MyDataTrace",
-    page_icon="🎨",
-    layout="wide",
-    initial_sidebar_state="expanded"
+from mydatatrace import palette, perf
+from mydatatrace.cache import RenderCache, chart_cache_key, export_cached, generate_chart_cached
+from mydatatrace.excel_io import (
+    EXPORT_FORMATS, MEMBER_COLUMN, STREAM_MAX_MEMORY_MB, data_to_excel, excel_to_cohort, excel_to_data,
+    excel_to_data_streaming,
 )
+from mydatatrace.formats import CHART_MIME_TYPES, VECTOR_FORMATS
+from mydatatrace.palette import DEFAULT_CUSTOM_COLORS
+from mydatatrace.raster import RasterBudgetError
+from mydatatrace.reconcile import AGGREGATIONS, Reconciler
+from mydatatrace.session_store import SessionStore, SessionWriter
+from mydatatrace.store import ScoreMatrix
+from mydatatrace.timeaxis import GRANULARITIES, get_time_axis
+from mydatatrace.versions import SECTION_LABELS, StateVersions
+
+# 会话持久化
+# 设置环境变量 MYDATATRACE_SESSION_DB 为 SQLite 文件路径后启用：数据按链接中的会话令牌自动保存，
+# 刷新页面或服务重启后打开同一链接即可恢复
+SESSION_DB_PATH = os.environ.get('MYDATATRACE_SESSION_DB')
+# 超过该天数未更新的会话在服务启动时清理
+SESSION_MAX_AGE_DAYS = 90
+SESSION_TOKEN_PATTERN = re.compile(r'[A-Za-z0-9_-]{16,64}')
+
+@st.cache_resource
+def get_session_store(path):
+    """进程内所有会话共享同一个存储连接"""
+    store = SessionStore(path)
+    store.purge(SESSION_MAX_AGE_DAYS * 24 * 3600)
+    return store
+
 
-# 初始化会话状态 
-if 'time_config' not in st.session_state:
+def session_config():
+    """需要持久化的会话配置（可 JSON 序列化）"""
+    time_config = st.session_state.time_config
+    return {
+        'time_config': {
+            **time_config,
+            'start_date': time_config['start_date'].isoformat(),
+            'end_date': time_config['end_date'].isoformat(),
+        },
+        'config_items': list(st.session_state.config_items),
+        'style_config': st.session_state.style_config,
+    }
+
+
+def restore_session(config, data):
+    """用存储中的配置和得分恢复会话状态"""
+    time_config = config['time_config']
     st.session_state.time_config = {
-        'start_date': datetime(2025, 1, 1),
-        'end_date': datetime(2025, 12, 31),
-        'time_granularity': '季度'
+        **time_config,
+        'start_date': datetime.fromisoformat(time_config['start_date']),
+        'end_date': datetime.fromisoformat(time_config['end_date']),
     }
+    st.session_state.config_items = config['config_items']
+    st.session_state.style_config = config['style_config']
+    st.session_state.data = data
+
+
+@perf.timed('app.persist_session')
+def persist_session():
+    """把会话的改动写入存储（未启用存储或上次写入后没有修改时跳过）"""
+    writer = st.session_state.session_writer
+    versions = st.session_state.state_versions.snapshot()
+    if writer is None or versions == st.session_state.persisted_versions:
+        return
+    if writer.flush(get_data_matrix(), session_config()) is not None:
+        st.session_state.persisted_versions = versions
+
+
+def autosaved(fn):
+    """片段单独重跑时整页脚本不会执行，由片段在结束时写入本次重跑中的改动"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        result = fn(*args, **kwargs)
+        persist_session()
+        return result
+    return wrapper
+
 
 # 默认题项配置（精简版）
 default_items = [
@@ -34,90 +103,120 @@ default_items = [
     '我增进了多少成长和智慧？',        # 自我状态
 ]
 
-# 默认配色方案（精简版）
-default_colors = [
-    '#66BB6A',  # 我增进了多少成长和智慧？ - 鲜草绿
-    '#FFA000',  # 我有多少自我觉察、理解和同情？ - 亮橙黄
-    '#F06292',  # 我感到多少爱与被爱？ - 亮粉
-    '#BA68C8',  # 我做了多少满意的善行？ - 亮紫
-    '#26C6DA',  # 我体验了丰富的风景和故事？ - 亮青蓝
-    '#1DE9B6',  # 我的身体有多健康？ - 亮青柠绿
-    '#4DD0E1',  # 我有多少自在闲暇？ - 亮浅蓝
-    '#29B6F6'   # 我的内心有多安宁平和？ - 亮天蓝
-]
 
-if 'config_items' not in st.session_state:
-    st.session_state.config_items = default_items
-
-if 'style_config' not in st.session_state:
-    st.session_state.style_config = {
-        'ncol': 2,
-        'nrow': 6,  # 12个题项，2列6行
-        'color_palette': '默认配色',
-        'custom_colors': default_colors,
-        'font_family': 'STKaiti',
-        'background_color': '#FFFFFF',
-        'margin': 10
-    }
+def get_state_versions():
+    """获取会话中各部分状态的版本号（不存在时创建）"""
+    if 'state_versions' not in st.session_state:
+        st.session_state.state_versions = StateVersions()
+    return st.session_state.state_versions
+
+
+def mark_changed(*sections):
+    """记录会话状态的修改（data/items/time/style），依赖这些状态的图表、导出文件随之过期"""
+    get_state_versions().bump(*sections)
 
-if 'show_results' not in st.session_state:
-    st.session_state.show_results = False
 
-if 'last_chart_buf' not in st.session_state:
-    st.session_state.last_chart_buf = None
+def get_data_matrix():
+    """获取会话中的得分存储，兼容旧版嵌套字典"""
+    data = ScoreMatrix.coerce(st.session_state.data)
+    st.session_state.data = data
+    return data
 
 
-if 'data' not in st.session_state:
-    st.session_state.data = {}
-    for item in st.session_state.config_items:
-        st.session_state.data[item] = {}
+def init_session_state():
+    """初始化会话状态：启用会话存储时先按链接中的令牌恢复已保存的数据，其余状态填入默认值"""
+    # 各部分状态的版本号：修改时递增，生成的图表和导出文件记录生成时的版本
+    get_state_versions()
+    if 'persisted_versions' not in st.session_state:
+        st.session_state.persisted_versions = None
+    
+    # 新会话按链接中的令牌恢复已保存的数据，没有令牌时生成一个并写入链接
+    if 'session_writer' not in st.session_state:
+        st.session_state.session_writer = None
+        if SESSION_DB_PATH:
+            session_store = get_session_store(SESSION_DB_PATH)
+            token = st.query_params.get('session', '')
+            if not SESSION_TOKEN_PATTERN.fullmatch(token):
+                token = secrets.token_urlsafe(16)
+                st.query_params['session'] = token
+            saved = session_store.load(token)
+            saved_config, saved_data = saved if saved is not None else (None, None)
+            if saved is not None:
+                restore_session(saved_config, saved_data)
+            st.session_state.session_writer = SessionWriter(
+                session_store, token, saved_data, saved_config, interval=0
+            )
+    
+    if 'time_config' not in st.session_state:
+        st.session_state.time_config = {
+            'start_date': datetime(2025, 1, 1),
+            'end_date': datetime(2025, 12, 31),
+            'time_granularity': '季度',
+            # 切换到更粗的时间粒度时已有得分的合并方式
+            'aggregation': '平均'
+        }
+    
+    if 'config_items' not in st.session_state:
+        st.session_state.config_items = list(default_items)
+    
+    if 'style_config' not in st.session_state:
+        st.session_state.style_config = {
+            'ncol': 2,
+            'nrow': 6,  # 12个题项，2列6行
+            'color_palette': '默认配色',
+            'custom_colors': list(DEFAULT_CUSTOM_COLORS),
+            'font_family': 'STKaiti',
+            'background_color': '#FFFFFF',
+            'margin': 10
+        }
+    
+    if 'show_results' not in st.session_state:
+        st.session_state.show_results = False
+    
+    if 'last_chart_buf' not in st.session_state:
+        st.session_state.last_chart_buf = None
+        # 生成图表时的状态版本，用于提示图表是否已过期
+        st.session_state.last_chart_versions = None
+    
+    if 'render_job' not in st.session_state:
+        st.session_state.render_job = None
+    
+    if 'render_job_notice' not in st.session_state:
+        # 任务结束时的提示 (级别, 内容)，结束后整页重跑时显示一次
+        st.session_state.render_job_notice = None
+    
+    if 'chart_is_preview' not in st.session_state:
+        st.session_state.chart_is_preview = False
+    
+    if 'last_chart_format' not in st.session_state:
+        st.session_state.last_chart_format = 'jpg'
+    
+    # 矢量图无法直接显示在页面上，另存一张位图预览
+    if 'last_chart_preview' not in st.session_state:
+        st.session_state.last_chart_preview = None
+    
+    # 表格录入编辑器的代次，导入数据后递增以丢弃旧编辑器的状态
+    if 'grid_editor_epoch' not in st.session_state:
+        st.session_state.grid_editor_epoch = 0
+    
+    # 导入的团队数据及其统计量，用于在图表中绘制团队分布带
+    if 'cohort' not in st.session_state:
+        st.session_state.cohort = None
+        st.session_state.cohort_stats = None
+    
+    if 'data' not in st.session_state:
+        st.session_state.data = ScoreMatrix(st.session_state.config_items)
 
 # 配置中心模块
 # 时间配置函数
 def generate_time_points(start_date, end_date, granularity):
     """生成时间点列表"""
-    time_points = []
-    
-    if granularity == '季度':
-        # 生成季度时间点
-        start_year = start_date.year
-        start_quarter = (start_date.month - 1) // 3 + 1
-        end_year = end_date.year
-        end_quarter = (end_date.month - 1) // 3 + 1
-        
-        current_year = start_year
-        current_quarter = start_quarter
-        
-        while current_year < end_year or (current_year == end_year and current_quarter <= end_quarter):
-            time_points.append(f"{current_year}Q{current_quarter}")
-            current_quarter += 1
-            if current_quarter > 4:
-                current_quarter = 1
-                current_year += 1
-    
-    elif granularity == '月份':
-        # 生成月份时间点
-        start_year = start_date.year
-        start_month = start_date.month
-        end_year = end_date.year
-        end_month = end_date.month
-        
-        current_year = start_year
-        current_month = start_month
-        
-        while current_year < end_year or (current_year == end_year and current_month <= end_month):
-            time_points.append(f"{current_year}-{current_month:02d}")
-            current_month += 1
-            if current_month > 12:
-                current_month = 1
-                current_year += 1
-    
-    elif granularity == '年度':
-        # 生成年度时间点
-        for year in range(start_date.year, end_date.year + 1):
-            time_points.append(f"{year}")
-    
-    return time_points
+    return list(get_time_axis(start_date, end_date, granularity).labels)
+
+def current_time_axis():
+    """当前时间配置对应的时间轴（相同配置只生成一次）"""
+    time_config = st.session_state.time_config
+    return get_time_axis(time_config['start_date'], time_config['end_date'], time_config['time_granularity'])
 
 # 题项管理函数
 def add_item():
@@ -125,84 +224,125 @@ def add_item():
     new_item = f"题项{len(st.session_state.config_items) + 1}"
     st.session_state.config_items.append(new_item)
     # 初始化新题项的数据
-    st.session_state.data[new_item] = {}
+    get_data_matrix().add_item(new_item)
+    mark_changed('items', 'data')
     # 更新已有时间点的数据结构
     update_data_structure()
 
 def delete_item(index):
     """删除题项"""
     item = st.session_state.config_items.pop(index)
-    if item in st.session_state.data:
-        del st.session_state.data[item]
+    get_data_matrix().delete_item(item)
+    mark_changed('items', 'data')
 
 def update_item_name(index, new_name):
     """更新题项名称"""
     old_name = st.session_state.config_items[index]
     st.session_state.config_items[index] = new_name
-    # 更新数据字典中的键
-    if old_name in st.session_state.data:
-        st.session_state.data[new_name] = st.session_state.data.pop(old_name)
+    # 更新数据存储中的行名
+    get_data_matrix().rename_item(old_name, new_name)
+    mark_changed('items', 'data')
 
 # 数据结构更新函数
+@perf.timed('app.update_data_structure')
 def update_data_structure():
-    """更新数据结构，确保与当前配置一致"""
-    time_points = generate_time_points(
-        st.session_state.time_config['start_date'],
-        st.session_state.time_config['end_date'],
-        st.session_state.time_config['time_granularity']
-    )
+    """
+    更新数据结构，确保与当前配置一致：只增删变化的题项和时间点，未录入的单元格填入默认得分；
+    切换时间粒度时把已有得分换算到新的时间点
+    """
+    time_config = st.session_state.time_config
+    time_points = current_time_axis().labels
     
-    # 遍历所有题项，确保每个题项都有所有时间点的数据
-    for item in st.session_state.config_items:
-        if item not in st.session_state.data:
-            st.session_state.data[item] = {}
-        
-        # 遍历所有时间点，确保每个时间点都有默认数据
-        for tp in time_points:
-            if tp not in st.session_state.data[item]:
-                st.session_state.data[item][tp] = {'得分': 70.0, '说明': ''}
+    if 'reconciler' not in st.session_state:
+        st.session_state.reconciler = Reconciler(default_score=70.0)
+    if st.session_state.reconciler.reconcile(
+        get_data_matrix(), st.session_state.config_items, time_points, time_config.get('aggregation', '平均')
+    ):
+        mark_changed('data')
+
+# 表格录入
+# 表格录入每页显示的时间点数
+GRID_PAGE_SIZE = 12
+# 题项数×时间点数超过该值时默认使用表格录入
+GRID_DEFAULT_MIN_CELLS = 60
+
+def grid_frame(data, items, time_points):
+    """表格录入的数据：每行一个时间点，每个题项一列得分、一列说明（列名与导出模板一致）"""
+    import pandas as pd
+    
+    scores, notes = ScoreMatrix.coerce(data).block(items, time_points)
+    columns = {}
+    for i, item in enumerate(items):
+        columns[f"{item} - 得分"] = scores[i]
+        columns[f"{item} - 说明"] = notes[i]
+    return pd.DataFrame(columns, index=pd.Index(time_points, name='时间点'))
+
+def apply_grid_edits(data, items, time_points, frame):
+    """
+    把表格编辑器返回的整页数据一次性写回得分存储
+    :return: 改动的单元格数
+    """
+    scores = frame[[f"{item} - 得分" for item in items]].to_numpy(dtype=float, na_value=0.0).T
+    notes = frame[[f"{item} - 说明" for item in items]].fillna('').astype(str).to_numpy(dtype=object).T
+    return data.update_block(items, time_points, np.clip(scores, 0.0, 100.0), notes)
+
+@st.fragment
+@autosaved
+@perf.timed('app.grid_editor')
+def grid_editor(data, items, time_points):
+    """按时间范围分页的表格录入：整页只有一个编辑器组件，编辑结果批量写回（独立重跑的片段）"""
+    pages = [time_points[k:k + GRID_PAGE_SIZE] for k in range(0, len(time_points), GRID_PAGE_SIZE)]
+    page = 0
+    if len(pages) > 1:
+        page = st.selectbox(
+            "时间范围",
+            options=range(len(pages)),
+            format_func=lambda k: f"{pages[k][0]} ~ {pages[k][-1]}（{len(pages[k])} 个时间点）",
+            key="grid_page"
+        )
+    page_points = pages[page]
+    
+    column_config = {}
+    for item in items:
+        column_config[f"{item} - 得分"] = st.column_config.NumberColumn(
+            f"{item} 得分", min_value=0.0, max_value=100.0, step=0.1, format="%.1f"
+        )
+        column_config[f"{item} - 说明"] = st.column_config.TextColumn(
+            f"{item} 说明", help="建议30个字内，会在生成的图表中每5个字符换行"
+        )
+    # 导入数据、题项或当前页的时间点变化后换用新的编辑器，丢弃旧表格上未提交的编辑
+    editor_key = f"grid_editor_{st.session_state.grid_editor_epoch}_{page}_{hash((tuple(items), tuple(page_points)))}"
+    edited = st.data_editor(
+        grid_frame(data, items, page_points),
+        column_config=column_config,
+        key=editor_key,
+        use_container_width=True
+    )
+    if apply_grid_edits(data, items, page_points, edited):
+        mark_changed('data')
 
 # 样式配置函数
 def generate_color_palette(n_items, palette_type='默认配色'):
-    """生成配色方案"""
-    default_palette = [
-        '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57',
-        '#FF9FF3', '#54A0FF', '#5F27CD', '#FF9F43', '#1DD1A1'
-    ]
-    
-    if palette_type == '默认配色':
-        # 循环使用默认调色板
-        return [default_palette[i % len(default_palette)] for i in range(n_items)]
-    else:
-        # 使用自定义颜色
-        custom_colors = st.session_state.style_config.get('custom_colors', [])
-        if len(custom_colors) >= n_items:
-            return custom_colors[:n_items]
-        else:
-            # 自定义颜色不足时，补充默认颜色
-            return custom_colors + [default_palette[i % len(default_palette)] for i in range(len(custom_colors), n_items)]
+    """生成配色方案，自定义配色取自会话中的样式配置"""
+    custom_colors = ()
+    if palette_type != '默认配色':
+        custom_colors = st.session_state.get('style_config', {}).get('custom_colors', [])
+    return palette.generate_color_palette(n_items, palette_type, custom_colors)
 
-# 主应用布局
-def main():
-    # 标题
-    st.title("🎨 MyDataTrace - 时光数绘轨迹图")
-    
-        # 使用指引
-    with st.expander("📖如何使用", expanded=True):
-        st.markdown("""
-        🖌️用数据当画笔，绘出独属于你的时光轨迹
-        1. **📅 选时间范围**：选择要总结的周期（支持季度/月度/年度），默认25年每个季度
-        2. **📋 写下想要回顾的问题**：对你的回顾最重要的几个问题。可以修改、删除默认问题，也能点击「➕ 添加问题」新增（建议4~12个）
-        3. **📝 开始回顾和评分**：给每个问题打0-100分。您可以**直接在页面手动填写**，也可以**上传Excel文件**自动读取。
-        4. **📷 一键生成与备份**：点击「🚀 立即生成并显示」即可看到图形；**建议完成后下载Excel备份**，因为网页刷新后数据会重置。
 
-        ✋️ 更多内容可关注 小红书 [@沐宁](https://www.xiaohongshu.com/user/profile/5a05b24ce8ac2b75beec5026)
-        
-        """)
+@st.fragment
+@autosaved
+@perf.timed('app.config_center')
+def config_center():
+    """
+    配置中心：时间范围和题项（独立重跑的片段）
+    时间点或题项变化后需要重跑整个页面，让录入和导出区域使用新的结构
+    """
+    before = config_snapshot()
     
     # 时间配置
     st.subheader("📅 选时间范围")
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         start_date = st.date_input(
@@ -221,18 +361,32 @@ def main():
     with col3:
         time_granularity = st.selectbox(
             "时间粒度",
-            options=["季度", "月份", "年度"],
-            index=["季度", "月份", "年度"].index(st.session_state.time_config['time_granularity']),
+            options=GRANULARITIES,
+            index=GRANULARITIES.index(st.session_state.time_config['time_granularity']),
             key="time_granularity"
         )
     
+    with col4:
+        aggregation = st.selectbox(
+            "切换粒度时的合并方式",
+            options=list(AGGREGATIONS),
+            index=list(AGGREGATIONS).index(st.session_state.time_config.get('aggregation', '平均')),
+            key="aggregation",
+            help="月份切换为季度/年度、季度切换为年度时，同一时间段内已录入的得分按此方式合并，说明依次拼接；"
+                 "切换为更细的粒度时沿用原来的得分"
+        )
+    
     # 更新时间配置
+    if (start_date, end_date, time_granularity, aggregation) != tuple(
+            st.session_state.time_config.get(key) for key in ('start_date', 'end_date', 'time_granularity', 'aggregation')):
+        mark_changed('time')
     st.session_state.time_config['start_date'] = start_date
     st.session_state.time_config['end_date'] = end_date
     st.session_state.time_config['time_granularity'] = time_granularity
+    st.session_state.time_config['aggregation'] = aggregation
     
     # 生成并显示时间点
-    time_points = generate_time_points(start_date, end_date, time_granularity)
+    time_points = current_time_axis().labels
     st.info(f"生成的时间点: {', '.join(time_points)}")
     
     # 题项配置
@@ -269,25 +423,56 @@ def main():
         add_item()
         st.rerun()
     
-    # 更新数据结构
-    update_data_structure()
-    
-    # 数据录入
-    st.header("📝 开始回顾和评分")
-    st.info("💡 如果很快就能评估完，您可以直接在下方填写您的得分。如果需要一些时间思考和填写，建议下载模版Excel填写后上传。")
+    # 时间点或题项变化：重跑整个页面
+    if config_snapshot() != before:
+        st.rerun()
 
-    
-    # 数据导入功能
+
+def config_snapshot():
+    """时间配置和题项列表的快照，用于判断配置是否变化"""
+    time_config = st.session_state.time_config
+    return (time_config['start_date'], time_config['end_date'], time_config['time_granularity'],
+            tuple(st.session_state.config_items))
+
+
+def reset_entry_widgets():
+    """丢弃逐项录入组件（得分、说明）的状态，否则组件中的旧值会覆盖新载入的数据"""
+    for key in list(st.session_state):
+        if isinstance(key, str) and key.endswith(('_input', '_note')):
+            del st.session_state[key]
+
+
+@st.fragment
+@autosaved
+@perf.timed('app.data_import_section')
+def data_import_section():
+    """导入/恢复数据与模板下载（独立重跑的片段）"""
     with st.expander("📤 导入/恢复数据 (Excel)", expanded=False):
         uploaded_file = st.file_uploader("上传Excel文件以自动填充数据", type=['xlsx'])
+        stream_import = st.checkbox(
+            "大文件模式（流式读取，节省内存）",
+            help=f"逐块读取多年份、多人的归档表格，已读取数据超过 {STREAM_MAX_MEMORY_MB} MB 时会中止导入"
+        )
         if uploaded_file is not None:
             if st.button("确认导入数据", type="primary"):
-                new_data, new_items, error = excel_to_data(uploaded_file)
+                if stream_import:
+                    progress_bar = st.progress(0, text="正在读取Excel...")
+                    
+                    def report_progress(done_rows, total_rows):
+                        fraction = min(done_rows / total_rows, 1.0) if total_rows else 0
+                        progress_bar.progress(fraction, text=f"已读取 {done_rows} 行")
+                    
+                    new_data, new_items, error = excel_to_data_streaming(uploaded_file, progress=report_progress)
+                else:
+                    new_data, new_items, error = excel_to_data(uploaded_file)
                 if error:
                     st.error(error)
                 else:
                     st.session_state.data = new_data
                     st.session_state.config_items = new_items
+                    st.session_state.grid_editor_epoch += 1
+                    reset_entry_widgets()
+                    mark_changed('data', 'items')
                     st.success(f"成功导入 {len(new_items)} 个题项的数据！")
                     st.rerun()
         
@@ -298,149 +483,268 @@ def main():
         
         # 生成模板（使用当前配置但数据为空或使用现有数据）
         # 这里直接使用当前数据作为模板，方便用户修改
-        template_time_points = generate_time_points(
-            st.session_state.time_config['start_date'],
-            st.session_state.time_config['end_date'],
-            st.session_state.time_config['time_granularity']
-        )
-        template_data = data_to_excel(st.session_state.data, st.session_state.config_items, template_time_points)
+        template_time_points = current_time_axis().labels
+        # 点击下载时才生成文件：片段之外的录入不会触发这里重跑，提前生成的文件可能已过期；
+        # 内容未变时直接复用上次生成的文件（按得分的版本号查找，不必遍历得分）
+        template_data, template_items = st.session_state.data, list(st.session_state.config_items)
+        export_cache, versions = get_export_cache(), st.session_state.state_versions
         
         st.download_button(
             label="💾 下载数据模板 (包含当前题项)",
-            data=template_data,
+            data=lambda: export_cached(export_cache, data_to_excel, 'xlsx', template_data, template_items,
+                                       template_time_points, versions.token('data')),
             file_name=f"MyDataTrace_Template_{datetime.now().strftime('%Y%m%d')}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
-
     
-    # 显示时间点
-    time_points = generate_time_points(
-        st.session_state.time_config['start_date'],
-        st.session_state.time_config['end_date'],
-        st.session_state.time_config['time_granularity']
-    )
-    
-    if not time_points:
-        st.warning("请先配置时间点")
-    else:
-        # 数据录入提示
-        st.info(f"✨画下你的成长曲线，每一笔都是时光的礼物\n\n📋 共 {len(time_points)} 个时间点×{len(st.session_state.config_items)} 个问题")
+    cohort_section()
+
+
+def cohort_section():
+    """团队数据：导入多人的表格，载入某位成员的数据，在图表中对比团队分布"""
+    with st.expander("👥 导入团队数据（多人）", expanded=False):
+        st.caption(f"每个工作表一名成员（表名即成员名），或在表格中增加「{MEMBER_COLUMN}」列区分成员；"
+                   "表头与个人模板相同")
+        cohort_file = st.file_uploader("上传团队Excel文件", type=['xlsx'], key="cohort_file")
+        if cohort_file is not None and st.button("确认导入团队数据", key="import_cohort"):
+            cohort, error = excel_to_cohort(cohort_file)
+            if error:
+                st.error(error)
+            else:
+                st.session_state.cohort = cohort
+                st.session_state.cohort_stats = cohort.stats()
+                mark_changed('style')
+                st.success(f"成功导入 {len(cohort)} 名成员、{len(cohort.items)} 个题项的数据！")
+        
+        cohort = st.session_state.cohort
+        if cohort is None:
+            return
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            member = st.selectbox("成员", options=cohort.members, key="cohort_member")
+        with col2:
+            # 与按钮对齐
+            st.write("")
+            if st.button("载入该成员的数据", key="load_cohort_member", use_container_width=True):
+                st.session_state.data = cohort.member(member)
+                st.session_state.config_items = list(cohort.items)
+                st.session_state.grid_editor_epoch += 1
+                reset_entry_widgets()
+                mark_changed('data', 'items')
+                st.rerun()
+        st.checkbox(
+            "在图表中显示团队分布带",
+            key="show_cohort_band",
+            on_change=mark_changed,
+            args=('style',),
+            help="灰色色带为团队 25%~75% 分位区间，虚线为中位数，便于对比个人与团队的轨迹"
+        )
+
+
+@st.fragment
+@autosaved
+@perf.timed('app.time_point_entry')
+def time_point_entry(tp):
+    """单个时间点的逐项录入（独立重跑的片段）"""
+    data = get_data_matrix()
+    with st.expander(f"{tp}", expanded=False):
+        # 时间点模块标题
+        st.markdown(f"### {tp}")
         
-        # 按时间点划分模块
-        for tp in time_points:
-            with st.expander(f"{tp}", expanded=False):
-                # 时间点模块标题
-                st.markdown(f"### {tp}")
+        # 每个时间点下显示所有题项
+        for item in st.session_state.config_items:
+            with st.container():
+                # 题项标题 - 加大字号
+                st.markdown(f"<h4 style='font-size: 20px;'>{item}</h4>", unsafe_allow_html=True)
+                
+                # 获取当前值作为基准
+                current_value = float(data.get_score(item, tp))
+                
+                # 只保留得分输入框
+                input_score = st.number_input(
+                    label="得分输入",
+                    min_value=0.0,
+                    max_value=100.0,
+                    step=0.1,
+                    value=current_value,
+                    key=f"{item}_{tp}_input"
+                )
                 
-                # 每个时间点下显示所有题项
-                for item in st.session_state.config_items:
-                    with st.container():
-                        # 题项标题 - 加大字号
-                        st.markdown(f"<h4 style='font-size: 20px;'>{item}</h4>", unsafe_allow_html=True)
-                        
-                        # 获取当前值作为基准
-                        current_value = st.session_state.data[item][tp]['得分']
-                        
-                        # 只保留得分输入框
-                        input_score = st.number_input(
-                            label="得分输入",
-                            min_value=0.0,
-                            max_value=100.0,
-                            step=0.1,
-                            value=current_value,
-                            key=f"{item}_{tp}_input"
-                        )
-                        
-                        # 更新得分
-                        if input_score != current_value:
-                            st.session_state.data[item][tp]['得分'] = input_score
-                        
-                        # 添加横柱状图实时显示当前得分
-                        col1, col2 = st.columns([4, 1])
-                        with col1:
-                            st.progress(int(st.session_state.data[item][tp]['得分']), text=f"{st.session_state.data[item][tp]['得分']:.1f}/100")
-                        with col2:
-                            st.text(f"{st.session_state.data[item][tp]['得分']:.1f}")
-                        
-                        # 说明录入区
-                        note = st.text_area(
-                            label="说明",
-                            value=st.session_state.data[item][tp]['说明'],
-                            key=f"{item}_{tp}_note",
-                            placeholder="为什么是这个得分呢？可以回顾相册、朋友圈、聊天记录，写写发生的事的关键词",
-                            height=80,
-                            help="建议30个字内，会在生成的图表中每5个字符换行"
-                        )
-                        st.session_state.data[item][tp]['说明'] = note
-                        
-                        # 分隔线
-                        st.markdown("---")
+                # 更新得分
+                if input_score != current_value:
+                    data.set_score(item, tp, input_score)
+                    mark_changed('data')
+                
+                # 添加横柱状图实时显示当前得分
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    st.progress(int(input_score), text=f"{input_score:.1f}/100")
+                with col2:
+                    st.text(f"{input_score:.1f}")
+                
+                # 说明录入区
+                note = st.text_area(
+                    label="说明",
+                    value=data.get_note(item, tp),
+                    key=f"{item}_{tp}_note",
+                    placeholder="为什么是这个得分呢？可以回顾相册、朋友圈、聊天记录，写写发生的事的关键词",
+                    height=80,
+                    help="建议30个字内，会在生成的图表中每5个字符换行"
+                )
+                if note != data.get_note(item, tp):
+                    data.set_note(item, tp, note)
+                    mark_changed('data')
+                
+                # 分隔线
+                st.markdown("---")
 
-    # 在数据录入页面添加生成图片按钮
+
+@st.fragment
+@perf.timed('app.export_section')
+def export_section():
+    """生成图表与备份数据（独立重跑的片段）"""
     st.subheader("📷 内容导出：生成图表与备份数据")
     
     col_out1, col_out2 = st.columns(2)
     with col_out1:
         output_format = st.selectbox(
             "图片格式",
-            options=["jpg", "png"],
-            key="quick_output_format"
+            options=["jpg", "png", "svg", "pdf"],
+            key="quick_output_format",
+            help="svg/pdf 为矢量图，任意放大都清晰，适合打印，生成速度也比高 DPI 位图快得多"
         )
+    vector = output_format in VECTOR_FORMATS
     with col_out2:
-        dpi = st.number_input("图片清晰度 (DPI)", min_value=100, max_value=600, value=300, step=50)
+        dpi = st.number_input("图片清晰度 (DPI)", min_value=100, max_value=600, value=300, step=50, key="quick_dpi",
+                              disabled=vector, help="矢量图与分辨率无关" if vector else None)
 
     # 操作按钮区域
     if st.button("🚀 立即生成轨迹图并开启导出", type="primary", use_container_width=True):
-        # 计算时间点
-        time_points = generate_time_points(
-            st.session_state.time_config['start_date'],
-            st.session_state.time_config['end_date'],
-            st.session_state.time_config['time_granularity']
-        )
-        
-        items = st.session_state.config_items
-        data = st.session_state.data
+        # 每次生成都放弃旧任务：命中缓存时不提交新任务，旧任务完成后不能覆盖新的结果
+        cancel_render_job()
+        chart_inputs = current_chart_inputs()
+        cohort_band = current_cohort_band()
+        key = chart_cache_key(*chart_inputs, output_format, dpi, cohort_band)
         
-        # 生成配色方案
-        colors = generate_color_palette(len(items), st.session_state.style_config['color_palette'])
-        item_colors = dict(zip(items, colors))
+        # 页面预览用位图：矢量格式用 png 预览
+        preview_format = 'png' if vector else output_format
         
-        # 调用图片生成函数并存入会话状态
-        st.session_state.last_chart_buf = generate_chart(data, items, time_points, item_colors, output_format, dpi)
-        st.session_state.show_results = True
+        # 相同输入直接复用缓存；否则立即显示低清预览，高清图交给后台进程池
+        cached = get_render_cache().get(key)
+        can_render = True
+        if cached is not None:
+            st.session_state.last_chart_buf = io.BytesIO(cached)
+            st.session_state.chart_is_preview = False
+        else:
+            # 渲染前估算内存：超出上限时自动降低清晰度，或直接提示无法生成（矢量图不需要栅格化）
+            plan = None
+            try:
+                if not vector:
+                    from mydatatrace.render import plan_chart
+                    plan = plan_chart(*chart_inputs[:3], output_format, dpi, RENDER_MAX_MB * 1024 * 1024,
+                                      RENDER_OVER_BUDGET)
+            except RasterBudgetError as e:
+                can_render = False
+                st.error(f"无法生成高清图: {e}")
+            if can_render:
+                if plan is not None and plan.downgraded:
+                    st.toast(f"图片过大，清晰度已从 {dpi} DPI 自动降为 {plan.dpi} DPI")
+                st.session_state.last_chart_buf = generate_chart_cached(
+                    get_render_cache(), *chart_inputs, preview_format, PREVIEW_DPI, cohort_band
+                )
+                st.session_state.chart_is_preview = True
+                submit_render_job(key, *chart_inputs, output_format, dpi, cohort_band)
+        # 拒绝生成时保留上一张图原来的格式和版本，结果区仍按旧输入提示已过期
+        if can_render:
+            if vector:
+                st.session_state.last_chart_preview = generate_chart_cached(
+                    get_render_cache(), *chart_inputs, preview_format, PREVIEW_DPI, cohort_band
+                )
+            st.session_state.last_chart_format = output_format
+            st.session_state.last_chart_versions = st.session_state.state_versions.snapshot()
+            st.session_state.show_results = True
+    
+    # 渲染任务状态：只在任务未完成时挂载轮询片段；任务结束后整页重跑，不再挂载，空闲会话不会每秒重跑
+    notice = st.session_state.render_job_notice
+    if notice is not None:
+        st.session_state.render_job_notice = None
+        level, message = notice
+        if level == 'error':
+            st.error(message)
+        else:
+            st.toast(message)
+    if st.session_state.render_job is not None:
+        render_job_status()
 
     # 结果显示区域（生成后才显示）
     if st.session_state.show_results and st.session_state.last_chart_buf:
         st.divider()
-        # 在页面上显示生成的图片
-        st.image(st.session_state.last_chart_buf, caption="""长按图片或右键保存
+        chart_format = st.session_state.last_chart_format
+        # 在页面上显示生成的图片（矢量图显示位图预览）
+        shown = st.session_state.last_chart_buf
+        if chart_format in VECTOR_FORMATS and not st.session_state.chart_is_preview:
+            shown = st.session_state.last_chart_preview
+        st.image(shown, caption="""长按图片或右键保存
         ✋️ 更多内容可关注 小红书 [@沐宁](https://www.xiaohongshu.com/user/profile/5a05b24ce8ac2b75beec5026)""", use_container_width=True)
+        stale = st.session_state.state_versions.changed_since(st.session_state.last_chart_versions)
+        if stale:
+            st.warning(f"图表生成后{'、'.join(SECTION_LABELS[section] for section in stale)}已修改，"
+                       f"当前显示的不是最新结果，点击上方按钮重新生成")
+        if st.session_state.chart_is_preview:
+            if chart_format in VECTOR_FORMATS:
+                st.caption(f"当前为 {PREVIEW_DPI} DPI 预览图，{chart_format.upper()} 矢量图生成完成后即可下载")
+            else:
+                st.caption(f"当前为 {PREVIEW_DPI} DPI 预览图，高清图生成完成后会自动替换")
+        else:
+            if chart_format in VECTOR_FORMATS:
+                st.caption(f"页面显示的是预览图，下载的 {chart_format.upper()} 为矢量图，任意缩放都清晰")
+            st.download_button(
+                label="📐 下载矢量图" if chart_format in VECTOR_FORMATS else "📷 下载高清图片",
+                data=st.session_state.last_chart_buf,
+                file_name=f"MyDataTrace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{chart_format}",
+                mime=CHART_MIME_TYPES[chart_format],
+                use_container_width=True
+            )
+        cache_stats = get_render_cache().stats()
+        st.caption(f"渲染缓存：命中 {cache_stats['hits']} 次 / 未命中 {cache_stats['misses']} 次，"
+                   f"已缓存 {cache_stats['entries']} 张图（{cache_stats['bytes'] / 1024 / 1024:.1f} MB）")
         
         # 提示用户保存数据
-        st.warning("⚠️ 网页刷新后数据会重置，记得点击下方按钮备份数据！")
+        if st.session_state.session_writer is not None:
+            st.info("💾 数据会自动保存，收藏当前网页链接，刷新或稍后打开即可恢复；也可以下载备份到本地")
+        else:
+            st.warning("⚠️ 网页刷新后数据会重置，记得点击下方按钮备份数据！")
         
         # 准备数据并提供下载
-        time_points_excel = generate_time_points(
-            st.session_state.time_config['start_date'],
-            st.session_state.time_config['end_date'],
-            st.session_state.time_config['time_granularity']
+        time_points_excel = current_time_axis().labels
+        backup_format = st.radio(
+            "备份格式",
+            options=list(EXPORT_FORMATS),
+            horizontal=True,
+            help="xlsx 可重新上传导入；csv/parquet 体积更小、生成更快，适合交给其他工具分析",
+            key="backup_format"
         )
-        excel_data = data_to_excel(st.session_state.data, st.session_state.config_items, time_points_excel)
+        export_func, export_mime = EXPORT_FORMATS[backup_format]
+        # 点击下载时才导出，录入片段中的修改无需重跑这里也能包含在备份中；得分版本未变时复用上次的文件
+        backup_data, backup_items = st.session_state.data, list(st.session_state.config_items)
+        export_cache, versions = get_export_cache(), st.session_state.state_versions
         
         st.download_button(
-            label="💾 点击下载Excel",
-            data=excel_data,
-            file_name=f"MyDataTrace_Data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            label="💾 点击下载Excel" if backup_format == 'xlsx' else f"💾 点击下载{backup_format.upper()}",
+            data=lambda: export_cached(export_cache, export_func, backup_format, backup_data, backup_items,
+                                       time_points_excel, versions.token('data')),
+            file_name=f"MyDataTrace_Data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{backup_format}",
+            mime=export_mime,
             use_container_width=True
         )
 
 
-
-    # 样式配置 - 移到最后
-    st.divider()
-    st.subheader("🎨 布局和颜色配置")
-    
+@st.fragment
+@autosaved
+@perf.timed('app.style_config_section')
+def style_config_section():
+    """布局和颜色配置（独立重跑的片段，只影响下次生成的图表）"""
+    before = style_snapshot()
     # 高级选项折叠面板
     with st.expander("高级样式选项", expanded=False):
         col1, col2 = st.columns(2)
@@ -491,241 +795,258 @@ def main():
         st.session_state.style_config['ncol'] = int(ncol)
         st.session_state.style_config['nrow'] = int(nrow)
         st.session_state.style_config['color_palette'] = color_palette
+    
+    if style_snapshot() != before:
+        mark_changed('style')
 
-# Excel 处理函数
-def data_to_excel(data, items, time_points):
-    """将数据转换为Excel文件字节流"""
-    rows = []
-    for tp in time_points:
-        row = {'时间点': tp}
-        for item in items:
-            item_data = data.get(item, {}).get(tp, {})
-            row[f"{item} - 得分"] = item_data.get('得分', 0.0)
-            row[f"{item} - 说明"] = item_data.get('说明', '')
-        rows.append(row)
-    
-    # 构建有序的列名列表，确保Excel易读性
-    columns = ['时间点']
-    for item in items:
-        columns.append(f"{item} - 得分")
-        columns.append(f"{item} - 说明")
-        
-    df = pd.DataFrame(rows, columns=columns)
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='数据')
-    output.seek(0)
-    return output
-
-def excel_to_data(file):
-    """读取Excel文件并返回数据字典和题项列表"""
-    try:
-        df = pd.read_excel(file)
-        
-        data = {}
-        items = []
-        
-        # 验证必需的列
-        if '时间点' not in df.columns:
-            return None, None, "Excel文件缺少'时间点'列"
-        
-        # 识别题项，并保持列出现的顺序
-        columns = [c for c in df.columns if c != '时间点' and ' - ' in c]
-        if not columns:
-            return None, None, "未找到有效的数据列 (格式应为 '题项名 - 得分' 或 '题项名 - 说明')"
-            
-        extracted_items = []
-        seen_items = set()
-        
-        for col in columns:
-            item_name = col.rsplit(' - ', 1)[0]
-            if item_name not in seen_items:
-                extracted_items.append(item_name)
-                seen_items.add(item_name)
-        
-        items = extracted_items
-        
-        # 初始化数据结构
-        for item in items:
-            data[item] = {}
-            
-        # 遍历每行数据
-        for index, row in df.iterrows():
-            tp = str(row['时间点'])
-            for item in items:
-                score_col = f"{item} - 得分"
-                note_col = f"{item} - 说明"
-                
-                # 容错处理：如果列不存在（比如只写了得分没写说明），给默认值
-                score = row.get(score_col, 0.0)
-                note = row.get(note_col, "")
-                
-                # 处理空值
-                if pd.isna(note):
-                    note = ""
-                if pd.isna(score):
-                    score = 0.0
-                    
-                data[item][tp] = {
-                    '得分': float(score),
-                    '说明': str(note)
-                }
-                
-        return data, items, None
-    except Exception as e:
-        return None, None, f"解析Excel失败: {str(e)}"
 
+def style_snapshot():
+    """样式配置的快照，用于判断样式是否变化"""
+    style_config = st.session_state.style_config
+    return tuple((key, tuple(value) if isinstance(value, list) else value) for key, value in style_config.items())
 
-# 图片生成函数
-def generate_chart(data, items, time_points, item_colors, output_format="png", dpi=400):
-    """
-    从Streamlit会话状态获取动态数据生成可视化图表
-    :param data: 字典，格式{题项: {时间点: {得分: float, 说明: str}}}
-    :param items: 列表，动态配置的题项列表
-    :param time_points: 列表，动态配置的时间点列表（如['25年Q1', '25年Q2']）
-    :param item_colors: 字典，题项对应的颜色值（从配置模块获取）
-    :param output_format: 输出格式，png/jpg
-    :param dpi: 图片分辨率
-    :return: 生成的图片对象（供Streamlit下载）
-    """
-    # 明确设置中文字体，使用指定的字体文件
-    plt.rcParams['axes.unicode_minus'] = False
-    plt.rcParams['text.usetex'] = False  # 禁用LaTeX，避免字体冲突
-
-    # 显式创建字体属性对象，使用指定的字体文件
-    from matplotlib.font_manager import FontProperties, fontManager
-    import os
-    
-    # 指定字体文件路径（使用相对路径，确保在GitHub和Streamlit远程运行时可用）
-    font_path = os.path.join(os.path.dirname(__file__), 'STKAITI.TTF')
-    # 检查字体文件是否存在
-    if os.path.exists(font_path):
-        # 添加字体到字体管理器
-        fontManager.addfont(font_path)
-        # 创建字体属性对象
-        font_props = FontProperties(fname=font_path)
-    else:
-        # 如果字体文件不存在，使用默认字体列表
-        font_props = FontProperties(family=['STKaiti', 'SimHei', 'SimSun', 'Microsoft YaHei', 'SimKai', 'FangSong'])
-    
-    # 设置全局字体
-    plt.rcParams['font.family'] = ['STKaiti']
-    plt.rcParams['font.sans-serif'] = ['STKaiti']
-
-    # 计算子图布局 - 双列布局，适合手机观看
-    n_items = len(items)
-    n_cols = 2
-    n_rows = (n_items + 1) // n_cols  # 自动计算行数适配题项数量
-
-    # 创建画布 - 紧凑布局，适配手机尺寸
-    fig, axes = plt.subplots(n_rows, n_cols, figsize=(8, 3.5 * n_rows), sharex=False, sharey=True)
-    # 处理只有一个子图的情况
-    if n_rows == 1 and n_cols == 1:
-        axes = np.array([axes])  # 转为一维数组
-    else:
-        axes = axes.flatten()  # 转为一维数组，方便索引
+# 主应用布局
+def main():
+    # 设置页面配置
+    st.set_page_config(
+        page_title="时光数绘轨迹图 MyDataTrace",
+        page_icon="🎨",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    # 性能埋点（设置环境变量 MYDATATRACE_PERF=1 启用）：记录整页重跑的各阶段耗时，显示在侧边栏
+    if not perf.enabled():
+        render_page()
+        return
+    perf.log_to_stderr()
+    with perf.recording() as records:
+        with perf.stage('app.rerun'):
+            render_page()
+    perf_panel(records)
 
-    # 设置整体风格
-    fig.patch.set_facecolor('#FFFFFF')  # 画布背景色纯白
 
-    # 绘制每个子图（适配动态题项）
-    for i, item in enumerate(items):
-        ax = axes[i]
-        
-        # 设置子图背景色
-        ax.set_facecolor('#FFFFFF')
-        
-        # 从动态数据中提取当前题项的得分和说明
-        scores = [data[item][tp]['得分'] for tp in time_points]
-        notes = [data[item][tp]['说明'] if data[item][tp]['说明'] else "" for tp in time_points]
-        
-        # 获取当前题项的配置颜色
-        item_color = item_colors.get(item, '#4FC3F7')  # 默认天蓝
-        
-        # 绘制背景阴影 - 低透明度，提升层次感
-        ax.fill_between(range(len(time_points)), scores, alpha=0.1, color=item_color, zorder=1)
-        
-        # 绘制折线图
-        line, = ax.plot(range(len(time_points)), scores, linewidth=2, color=item_color, zorder=2, 
-                       marker='o', markersize=8, linestyle='-', alpha=0.9, 
-                       markerfacecolor=item_color, markeredgecolor='white', markeredgewidth=2)
-        
-        # 添加数据点、得分和说明（适配动态时间点）
-        for j, (x, y, note) in enumerate(zip(range(len(time_points)), scores, notes)):
-            # 数据点光晕效果
-            ax.scatter(x, y, s=150, color=item_color, alpha=0.2, zorder=3, edgecolor='none')
-            # 得分标注
-            ax.text(x, y + 2, f'{int(y)}', ha='center', va='bottom', fontsize=10, fontweight='bold', 
-                    color=item_color, zorder=5, bbox=dict(facecolor='white', alpha=0.7, 
-                    edgecolor=item_color, boxstyle='round,pad=0.25', linewidth=1), 
-                    fontproperties=font_props)
-            
-            # 说明标注：5字符换行，空说明不显示
-            if note:
-                wrapped_note = '\n'.join([note[k:k+5] for k in range(0, len(note), 5)])
-                note_y = y - 2  # 固定在数据点下方
-                ax.text(x, note_y, wrapped_note, ha='center', va='top', 
-                        fontsize=11, color='#555555', alpha=0.9, zorder=6, rotation=0, 
-                        bbox=dict(facecolor='white', alpha=0.4, edgecolor=item_color, 
-                                  boxstyle='round,pad=0.2', linewidth=1),
-                        fontproperties=font_props)
+def render_page():
+    """整页内容"""
+    init_session_state()
+    
+    # 标题
+    st.title("🎨 MyDataTrace - 时光数绘轨迹图")
+    
+        # 使用指引
+    with st.expander("📖如何使用", expanded=True):
+        st.markdown("""
+        🖌️用数据当画笔，绘出独属于你的时光轨迹
+        1. **📅 选时间范围**：选择要总结的周期（支持周/月度/季度/半年度/年度），默认25年每个季度
+        2. **📋 写下想要回顾的问题**：对你的回顾最重要的几个问题。可以修改、删除默认问题，也能点击「➕ 添加问题」新增（建议4~12个）
+        3. **📝 开始回顾和评分**：给每个问题打0-100分。您可以**直接在页面手动填写**，也可以**上传Excel文件**自动读取。
+        4. **📷 一键生成与备份**：点击「🚀 立即生成并显示」即可看到图形；**建议完成后下载Excel备份**，因为网页刷新后数据会重置。
+
+        ✋️ 更多内容可关注 小红书 [@沐宁](https://www.xiaohongshu.com/user/profile/5a05b24ce8ac2b75beec5026)
         
-        # 设置子图标题（题项名称）
-        ax.set_title(item, fontsize=18, fontweight='bold', color=item_color, pad=15)
+        """)
+    
+    # 配置中心
+    config_center()
+    
+    # 更新数据结构
+    update_data_structure()
+    
+    # 数据录入
+    st.header("📝 开始回顾和评分")
+    st.info("💡 如果很快就能评估完，您可以直接在下方填写您的得分。如果需要一些时间思考和填写，建议下载模版Excel填写后上传。")
+
+    
+    # 数据导入功能
+    data_import_section()
+    
+    # 显示时间点
+    time_points = current_time_axis().labels
+    
+    if not time_points:
+        st.warning("请先配置时间点")
+    else:
+        # 数据录入提示
+        st.info(f"✨画下你的成长曲线，每一笔都是时光的礼物\n\n📋 共 {len(time_points)} 个时间点×{len(st.session_state.config_items)} 个问题")
         
-        # 设置Y轴范围（适配0-100分得分范围）
-        ax.set_ylim(0, 110)
+        data = get_data_matrix()
         
-        # 设置网格线 - 仅保留Y轴主要网格
-        ax.grid(True, which='major', axis='y', linestyle='--', alpha=0.2, color='#E0E0E0', zorder=0)
-        ax.grid(False, which='minor')
-        ax.minorticks_off()
+        n_cells = len(time_points) * len(st.session_state.config_items)
+        entry_mode = st.radio(
+            "录入方式",
+            options=["逐项录入", "表格录入"],
+            index=1 if n_cells > GRID_DEFAULT_MIN_CELLS else 0,
+            horizontal=True,
+            key="entry_mode",
+            help="表格录入在一个表格中批量编辑得分和说明，按时间范围分页，题项和时间点较多时更流畅"
+        )
         
-        # 设置X轴刻度（仅第一行显示时间标签）
-        ax.xaxis.tick_top()
-        if i < n_cols:  # 第一行图显示时间标签
-            ax.set_xticks(range(len(time_points)))
-            ax.set_xticklabels(time_points, fontsize=8, color=item_color, fontweight='bold', 
-                              fontproperties=font_props, rotation=20)
+        if entry_mode == "表格录入":
+            grid_editor(data, st.session_state.config_items, time_points)
         else:
-            ax.set_xticks([])
-            ax.set_xticklabels([])
-        ax.xaxis.set_label_position('top')
-        
-        # 设置Y轴刻度
-        ax.set_yticks(range(0, 120, 20))
-        ax.set_yticklabels([f'{i}' for i in range(0, 120, 20)], fontsize=8, color='#555555', 
-                         fontproperties=font_props, fontweight='500', alpha=0.4)
+            # 按时间点划分模块，每个时间点是独立重跑的片段，修改得分只重跑所在的时间点
+            for tp in time_points:
+                time_point_entry(tp)
+
+    # 在数据录入页面添加生成图片按钮
+    export_section()
+
+    # 样式配置 - 移到最后
+    st.divider()
+    st.subheader("🎨 布局和颜色配置")
+    
+    style_config_section()
+    
+    # 会话持久化：每次重跑结束时把本次的改动合并为一个事务写入，片段单独重跑时由片段自己写入
+    persist_session()
+
+def widget_count():
+    """本次重跑创建的组件数，无法获取时返回 None"""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    
+    ctx = get_script_run_ctx()
+    shared = getattr(ctx, 'shared', None)
+    widget_ids = getattr(shared, 'widget_ids_this_run', None)
+    if widget_ids is None:
+        return None
+    # 新版本中为线程安全的集合，需要先取快照
+    return len(widget_ids.snapshot() if hasattr(widget_ids, 'snapshot') else widget_ids)
+
+
+def perf_panel(records):
+    """侧边栏性能面板：上次整页重跑各阶段的耗时、组件数和会话状态大小"""
+    with st.sidebar.expander("⏱️ 性能面板（上次整页重跑）", expanded=True):
+        rows = [
+            {'阶段': '\u3000' * row['depth'] + row['stage'], '次数': row['calls'],
+             '总耗时(ms)': round(row['total_ms'], 1), '自身耗时(ms)': round(row['self_ms'], 1)}
+            for row in perf.summarize(records)
+        ]
+        st.dataframe(rows, hide_index=True, use_container_width=True)
         
-        # 添加边框线
-        for spine in ax.spines.values():
-            spine.set_color('#E0E0E0')
-            spine.set_linewidth(1.5)
-        # 底部边框用题项专属色加粗
-        ax.spines['bottom'].set_color(item_color)
-        ax.spines['bottom'].set_linewidth(2)
-    
-    # 隐藏未使用的子图（当题项数量为奇数时）
-    for i in range(n_items, len(axes)):
-        axes[i].set_visible(False)
-    
-    # 调整子图间距，提升紧凑性
-    plt.tight_layout()
-    
-    # 保存图片到Streamlit缓存（避免本地文件依赖）
-    buf = io.BytesIO()
-    if output_format.lower() == "jpg":
-        # 使用pil_kwargs传递quality参数，兼容不同Matplotlib版本
-        plt.savefig(buf, format='jpg', dpi=dpi, bbox_inches='tight')
-    else:
-        plt.savefig(buf, format='png', dpi=dpi, bbox_inches='tight')
-    buf.seek(0)
+        state_sizes = {key: perf.estimate_size(value) for key, value in st.session_state.items()}
+        widgets = widget_count()
+        st.caption(f"组件数: {'-' if widgets is None else widgets}；"
+                   f"会话状态: {len(state_sizes)} 项，约 {sum(state_sizes.values()) / 1024:.0f} KB")
+        largest = sorted(state_sizes.items(), key=lambda entry: entry[1], reverse=True)[:5]
+        st.caption("最大的会话状态: " + "，".join(f"{key} {size / 1024:.0f} KB" for key, size in largest))
+
+
+# 图表渲染缓存
+# 缓存总字节上限（MB），超出后按最近最少使用淘汰
+RENDER_CACHE_MAX_MB = 256
+
+@st.cache_resource
+def get_render_cache():
+    """进程内所有会话共享同一个渲染缓存"""
+    return RenderCache(RENDER_CACHE_MAX_MB * 1024 * 1024)
+
+
+# 导出文件缓存：模板和备份按内容寻址，内容未变时重复下载不再重新生成
+EXPORT_CACHE_MAX_MB = 64
+
+@st.cache_resource
+def get_export_cache():
+    """进程内所有会话共享同一个导出文件缓存"""
+    return RenderCache(EXPORT_CACHE_MAX_MB * 1024 * 1024)
+
+
+# 渲染任务
+# 后台渲染工作进程数
+RENDER_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+# 点击生成后立即显示的预览图分辨率
+PREVIEW_DPI = 72
+# 题项数达到该值时按子图分块渲染，多个工作进程并行绘制
+TILED_RENDER_MIN_ITEMS = 8
+# 单张高清图渲染的峰值内存上限（MB）；整图超出时按条带渲染，仍超出时按 RENDER_OVER_BUDGET 处理
+RENDER_MAX_MB = 256
+# 超出内存上限时的处理方式：downgrade 自动降低清晰度，refuse 拒绝生成
+RENDER_OVER_BUDGET = 'downgrade'
+
+@st.cache_resource
+def get_render_pool():
+    """进程内所有会话共享同一个渲染进程池"""
+    from mydatatrace.jobs import RenderPool
+    return RenderPool(max_workers=RENDER_WORKERS)
+
+
+def current_cohort_band():
+    """开启团队分布带时返回与当前题项、时间点对齐的分布带，否则返回 None"""
+    stats = st.session_state.get('cohort_stats')
+    if stats is None or not st.session_state.get('show_cohort_band'):
+        return None
+    return stats.band(st.session_state.config_items, current_time_axis().labels)
+
+
+def current_chart_inputs():
+    """根据会话状态整理生成图表所需的数据、题项、时间点和配色"""
+    time_points = current_time_axis().labels
+    items = st.session_state.config_items
+    colors = generate_color_palette(len(items), st.session_state.style_config['color_palette'])
+    return st.session_state.data, items, time_points, dict(zip(items, colors))
+
+
+def submit_render_job(key, data, items, time_points, item_colors, output_format, dpi, cohort_band=None):
+    """提交渲染任务（替换会话中未完成的旧任务），完成的结果写入渲染缓存"""
+    cancel_render_job()
     
-    # 关闭图片，释放资源
-    plt.close()
+    pool = get_render_pool()
+    submit = pool.submit_tiled if len(items) >= TILED_RENDER_MIN_ITEMS else pool.submit
+    job = submit(key, data, items, time_points, item_colors, output_format, dpi,
+                 RENDER_MAX_MB * 1024 * 1024, RENDER_OVER_BUDGET, cohort_band)
+    # 即使任务在完成前被会话放弃，渲染结果仍可供相同输入复用
+    cache = get_render_cache()
+    job.add_done_callback(lambda job: cache.put(key, job.result()) if job.status == 'done' else None)
+    st.session_state.render_job = job
+    st.session_state.render_job_output = (output_format, dpi)
+
+
+def cancel_render_job():
+    """放弃会话中未完成的渲染任务：排队中的任务被取消，已在渲染中的任务结果不再显示"""
+    job = st.session_state.render_job
+    if job is not None:
+        job.cancel()
+        st.session_state.render_job = None
+
+
+@st.fragment(run_every=1)
+def render_job_status():
+    """轮询渲染任务状态，任务结束（完成、失败或取消）后刷新整个页面"""
+    job = st.session_state.render_job
+    if job is None:
+        st.rerun()
+    # 录入、配置片段中的修改不会重跑导出片段，由轮询检查输入是否变化
+    output = (st.session_state.quick_output_format, st.session_state.quick_dpi)
+    if not job.finished and (
+            st.session_state.state_versions.changed_since(st.session_state.last_chart_versions)
+            or output != st.session_state.render_job_output):
+        cancel_render_job()
+        st.session_state.render_job_notice = ('toast', "输入已变化，已取消未完成的生成任务")
+        st.rerun()
     
-    return buf
+    status = job.status
+    if status == 'done':
+        st.session_state.last_chart_buf = io.BytesIO(job.result())
+        st.session_state.chart_is_preview = False
+        st.session_state.show_results = True
+        st.session_state.render_job = None
+        st.rerun()
+    elif status == 'failed':
+        st.session_state.render_job_notice = ('error', f"高清图生成失败: {job.error()}")
+        st.session_state.render_job = None
+        st.rerun()
+    elif status == 'cancelled':
+        st.session_state.render_job = None
+        st.rerun()
+    else:
+        waited = time.time() - job.submitted_at
+        label = "⏳ 排队中" if status == 'queued' else "🎨 正在生成"
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.info(f"{label}高清图，可以继续编辑，完成后会自动替换预览图（已等待 {waited:.0f} 秒）")
+        with col2:
+            if st.button("取消生成", key="cancel_render_job", use_container_width=True):
+                cancel_render_job()
+                st.rerun()
+
 
 # 运行主应用
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+"""
+excel_to_data 解析耗时对比：逐行 iterrows（旧实现）vs 按列向量化（frame_to_matrix）
+
+用法：python benchmarks/bench_excel_to_data.py [--rows 1000,10000,100000] [--items 50]
+只计时 DataFrame → 得分存储 的解析阶段，不包含 pd.read_excel 本身的耗时。
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace.excel_io import frame_to_matrix
+from mydatatrace.store import ScoreMatrix
+
+
+def legacy_parse(df, items):
+    """旧版 excel_to_data 的逐行解析逻辑，作为对照"""
+    data = {item: {} for item in items}
+    for index, row in df.iterrows():
+        tp = str(row['时间点'])
+        for item in items:
+            score = row.get(f"{item} - 得分", 0.0)
+            note = row.get(f"{item} - 说明", "")
+            if pd.isna(note):
+                note = ""
+            if pd.isna(score):
+                score = 0.0
+            data[item][tp] = {'得分': float(score), '说明': str(note)}
+    return ScoreMatrix.from_dict(data)
+
+
+def make_frame(n_rows, n_items, seed=0):
+    """构造与导出模板同布局的数据表，约三成说明为空"""
+    rng = np.random.default_rng(seed)
+    items = [f"题项{i + 1}" for i in range(n_items)]
+    frame = {'时间点': [f"{2000 + r // 12}-{r % 12 + 1:02d}" for r in range(n_rows)]}
+    for item in items:
+        frame[f"{item} - 得分"] = rng.uniform(0, 100, n_rows).round(1)
+        notes = np.array([f"说明{r}" for r in range(n_rows)], dtype=object)
+        notes[rng.random(n_rows) < 0.3] = np.nan
+        frame[f"{item} - 说明"] = notes
+    return pd.DataFrame(frame), items
+
+
+def best_of(func, repeat):
+    """多次运行取最短耗时（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1000,10000,100000', help='逗号分隔的行数')
+    parser.add_argument('--items', type=int, default=50, help='题项数量')
+    parser.add_argument('--repeat', type=int, default=3, help='向量化版本的重复次数')
+    args = parser.parse_args()
+
+    print(f"{'行数':>8} {'题项':>4} {'iterrows(s)':>12} {'向量化(s)':>10} {'加速比':>8}")
+    for n_rows in [int(r) for r in args.rows.split(',')]:
+        df, items = make_frame(n_rows, args.items)
+        # 旧实现很慢，只运行一次
+        legacy_time, expected = best_of(lambda: legacy_parse(df, items), 1)
+        fast_time, actual = best_of(lambda: frame_to_matrix(df, items), args.repeat)
+        assert actual.to_dict() == expected.to_dict(), f"{n_rows} 行时解析结果不一致"
+        print(f"{n_rows:>8} {args.items:>4} {legacy_time:>12.3f} {fast_time:>10.3f} {legacy_time / fast_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+冷启动导入耗时：每次在新的 Python 进程中导入目标模块，记录耗时和被加载的重量级依赖
+
+用法：python benchmarks/bench_import.py [--modules app,mydatatrace.render] [--repeat 5]
+app 是 Streamlit 界面（导入时不应加载 Matplotlib/pandas）；批处理任务和渲染工作进程只需导入 mydatatrace 中的模块。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY_MODULES = ['streamlit', 'matplotlib', 'pandas', 'pyarrow', 'openpyxl', 'PIL']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [name for name in {heavy!r} if name in sys.modules]]))
+"""
+
+
+def measure(module):
+    """在新进程中导入模块，返回 (耗时秒数, 已加载的重量级依赖)"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', default='app,mydatatrace.store,mydatatrace.excel_io,mydatatrace.render,'
+                                             'mydatatrace.jobs', help='逗号分隔的模块名')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'模块':<24} {'导入(s)':>8}  已加载的依赖")
+    for module in args.modules.split(','):
+        runs = [measure(module) for _ in range(args.repeat)]
+        elapsed = min(run[0] for run in runs)
+        print(f"{module:<24} {elapsed:>8.3f}  {', '.join(runs[0][1]) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
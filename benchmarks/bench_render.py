@@ -0,0 +1,82 @@
+"""
+generate_chart 渲染耗时（绘制 + savefig）随 题项数 × 时间点数 的变化
+
+用法：python benchmarks/bench_render.py [--items 4,12] [--time-points 12,60] [--dpi 100] [--format png]
+                                      [--layout tight,engine] [--tiled --workers 4]
+每个时间点都带说明文字，模拟注释较多的真实图表。
+--layout 对比排版方式：tight 为 tight_layout + bbox_inches='tight'（多次绘制测量文本），engine 为预先计算的确定性排版。
+"""
+import argparse
+import multiprocessing
+import logging
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace.palette import generate_color_palette
+from mydatatrace.render import generate_chart, generate_chart_tiled
+from mydatatrace.store import ScoreMatrix
+
+
+def make_chart_inputs(n_items, n_time_points, seed=0):
+    """构造随机得分、每个点都有说明的图表输入"""
+    rng = np.random.default_rng(seed)
+    items = [f"题项{i + 1}" for i in range(n_items)]
+    time_points = [f"{2020 + j // 12}-{j % 12 + 1:02d}" for j in range(n_time_points)]
+    data = ScoreMatrix.from_arrays(
+        items, time_points,
+        rng.uniform(0, 100, (n_items, n_time_points)).round(1),
+        np.full((n_items, n_time_points), '回顾说明文字', dtype=object),
+    )
+    item_colors = dict(zip(items, generate_color_palette(n_items, '默认配色')))
+    return data, items, time_points, item_colors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', default='4,12', help='逗号分隔的题项数量')
+    parser.add_argument('--time-points', default='12,36,60', help='逗号分隔的时间点数量')
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--format', default='png')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--layout', default='tight,engine', help='逗号分隔的排版方式（tight/engine）')
+    parser.add_argument('--tiled', action='store_true', help='按子图分块渲染并在进程池中并行')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='分块渲染的工作进程数')
+    args = parser.parse_args()
+
+    # 没有安装中文字体的机器上会大量输出缺字警告，避免它们干扰计时
+    warnings.simplefilter('ignore')
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+    renderers = {layout: lambda *inputs, layout=layout, **kwargs: generate_chart(*inputs, layout=layout, **kwargs)
+                 for layout in args.layout.split(',')}
+    if args.tiled:
+        pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn'))
+        renderers['tiled'] = lambda *inputs, **kwargs: generate_chart_tiled(*inputs, map_func=pool.map, **kwargs)
+
+    print(f"{'题项':>4} {'时间点':>6}" + ''.join(f" {name + '(s)':>10}" for name in renderers))
+    for n_items in [int(n) for n in args.items.split(',')]:
+        for n_time_points in [int(n) for n in args.time_points.split(',')]:
+            inputs = make_chart_inputs(n_items, n_time_points)
+            row = f"{n_items:>4} {n_time_points:>6}"
+            for render in renderers.values():
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    render(*inputs, output_format=args.format, dpi=args.dpi)
+                    timings.append(time.perf_counter() - start)
+                row += f" {min(timings):>10.3f}"
+            print(row)
+    if args.tiled:
+        pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+页面重跑耗时：整页重跑 vs 各片段（st.fragment）单独重跑
+
+用法：python benchmarks/bench_rerun.py [--items 4,12] [--months 12,36] [--repeat 3]
+逐项录入模式下每个时间点 × 题项都有得分和说明输入框，整页重跑要重建全部组件；
+修改某个时间点的得分只重跑该时间点的片段，配置中心、导出区域等同理。
+AppTest 的 run() 总是整页重跑，这里在重跑请求中指定片段 ID，模拟浏览器中片段内的组件交互。
+"""
+import argparse
+import functools
+import logging
+import os
+import time
+import warnings
+from datetime import datetime
+
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+APP_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app.py'))
+
+
+def fragment_names(app):
+    """片段 ID -> 被装饰的函数名；同一函数的多个片段（如各时间点）只取第一个"""
+    names = {}
+    for fragment_id, wrapped in app._fragment_storage._fragments.items():
+        func = next(cell.cell_contents for cell in wrapped.__closure__ if callable(cell.cell_contents))
+        if func.__name__ not in names.values():
+            names[fragment_id] = func.__name__
+    return names
+
+
+def timed_run(app, fragment_id=None, repeat=3):
+    """重跑页面（给定 fragment_id 时只重跑该片段），返回最短耗时"""
+    local_script_runner.RerunData = (
+        functools.partial(RerunData, fragment_id_queue=[fragment_id]) if fragment_id else RerunData
+    )
+    timings = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            app.run()
+            timings.append(time.perf_counter() - start)
+            assert not app.exception, app.exception
+    finally:
+        local_script_runner.RerunData = RerunData
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', default='4,12', help='逗号分隔的题项数量')
+    parser.add_argument('--months', default='12,36', help='逗号分隔的月份数量')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+    for n_items in [int(n) for n in args.items.split(',')]:
+        for n_months in [int(n) for n in args.months.split(',')]:
+            app = AppTest.from_file(APP_PATH, default_timeout=300)
+            app.session_state['config_items'] = [f"题项{i + 1}" for i in range(n_items)]
+            app.session_state['time_config'] = {
+                'start_date': datetime(2020, 1, 1),
+                'end_date': datetime(2020 + (n_months - 1) // 12, (n_months - 1) % 12 + 1, 1),
+                'time_granularity': '月份',
+            }
+            app.session_state['entry_mode'] = '逐项录入'
+            app.run()
+
+            print(f"题项 {n_items} × 月份 {n_months}")
+            print(f"  {'整页重跑':<24} {timed_run(app, repeat=args.repeat):>8.3f}s")
+            for fragment_id, name in fragment_names(app).items():
+                print(f"  {name:<28} {timed_run(app, fragment_id, args.repeat):>8.3f}s")
+
+
+if __name__ == '__main__':
+    main()
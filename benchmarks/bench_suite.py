@@ -0,0 +1,270 @@
+"""
+核心流程的规模基准：时间轴生成、得分存储同步、Excel 导入/导出、团队统计、图表渲染（各格式 × DPI）随 题项数 × 时间点数 的耗时和峰值内存
+
+用法：python benchmarks/bench_suite.py [--sizes 4x4,12x36,50x120,100x240] [--chart-sizes 4x4,12x36] [--cases all]
+                                     [--formats png,jpg,svg,pdf] [--dpi 100,300] [--repeat 3] [--isolate]
+                                     [--output result.json]
+      python benchmarks/bench_suite.py --baseline baseline.json [--threshold 0.25]   # 回归检查
+
+图表渲染比其他用例慢几个数量级（12x36 约 4 秒），默认只测 --chart-sizes 中的规模，需要时可传入更大的规模。
+结果以 JSON 输出（--output 写入文件，否则打印到标准输出），每条记录包含：
+  seconds_min / seconds_median：多次运行的最短、中位耗时
+  traced_peak_mb：tracemalloc 统计的峰值（Python 对象和 NumPy 数组，不含 Matplotlib 的 C++ 画布缓冲区）
+  rss_peak_mb：--isolate 时每个用例在新进程中运行，记录进程常驻内存的峰值（包含导入的依赖）
+--baseline 与之前保存的结果比较，中位耗时或峰值内存超出基准 threshold 比例的用例视为回归，以退出码 1 结束，
+可在部署新版本前运行；耗时低于 --min-seconds、内存低于 1 MB 的指标不比较，避免噪声造成误报。
+"""
+import argparse
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# 添加项目根目录到Python路径
+sys.path.insert(0, ROOT)
+
+from mydatatrace.cohort import Cohort
+from mydatatrace.excel_io import data_to_excel, excel_to_data
+from mydatatrace.palette import generate_color_palette
+from mydatatrace.reconcile import Reconciler
+from mydatatrace.store import ScoreMatrix
+from mydatatrace.timeaxis import _cached_axis, get_time_axis
+
+CASES = ['generate_time_points', 'update_data_structure', 'data_to_excel', 'excel_to_data', 'cohort_stats',
+         'generate_chart']
+# cohort_stats 用例的团队人数
+COHORT_MEMBERS = 200
+DEFAULT_SIZES = '4x4,12x36,50x120,100x240'
+DEFAULT_CHART_SIZES = '4x4,12x36'
+# 峰值内存低于该值（MB）的用例不比较内存
+MIN_COMPARED_MB = 1.0
+
+
+def make_inputs(n_items, n_time_points, seed=0):
+    """构造随机得分、每个单元格都带说明的月度数据"""
+    rng = np.random.default_rng(seed)
+    items = [f"题项{i + 1}" for i in range(n_items)]
+    time_points = [f"{2000 + j // 12}-{j % 12 + 1:02d}" for j in range(n_time_points)]
+    data = ScoreMatrix.from_arrays(
+        items, time_points,
+        rng.uniform(0, 100, (n_items, n_time_points)).round(1),
+        np.full((n_items, n_time_points), '回顾说明文字', dtype=object),
+    )
+    return data, items, time_points
+
+
+def prepare(case, n_items, n_time_points, output_format=None, dpi=None):
+    """
+    准备用例的输入，返回每次运行调用的无参函数；输入的构造不计入耗时
+    update_data_structure 对应界面中的同步逻辑（Reconciler）：新会话把空存储填满，再把月份换算为季度；
+    cohort_stats 为 COHORT_MEMBERS 名成员（约 10% 的单元格未填写）的均值、中位数和分位数
+    """
+    data, items, time_points = make_inputs(n_items, n_time_points)
+    if case == 'generate_time_points':
+        start = datetime.date(2000, 1, 1)
+        end = datetime.date(2000 + (n_time_points - 1) // 12, (n_time_points - 1) % 12 + 1, 1)
+
+        def run():
+            # 清空缓存，测量实际生成的耗时
+            _cached_axis.cache_clear()
+            return get_time_axis(start, end, '月份').labels
+        return run
+    if case == 'update_data_structure':
+        quarters = list(dict.fromkeys(f"{tp[:4]}Q{(int(tp[5:]) - 1) // 3 + 1}" for tp in time_points))
+
+        def run():
+            matrix = ScoreMatrix(items)
+            Reconciler().reconcile(matrix, items, time_points)
+            Reconciler().reconcile(matrix, items, quarters, aggregation='平均')
+            return matrix
+        return run
+    if case == 'data_to_excel':
+        return lambda: data_to_excel(data, items, time_points)
+    if case == 'excel_to_data':
+        content = data_to_excel(data, items, time_points).getvalue()
+        return lambda: excel_to_data(io.BytesIO(content))
+    if case == 'cohort_stats':
+        rng = np.random.default_rng(0)
+        scores = rng.uniform(0, 100, (COHORT_MEMBERS, n_items, n_time_points))
+        scores[rng.random(scores.shape) < 0.1] = np.nan
+        cohort = Cohort(range(COHORT_MEMBERS), items, time_points, scores)
+        return cohort.stats
+    if case == 'generate_chart':
+        from mydatatrace.render import generate_chart
+        item_colors = dict(zip(items, generate_color_palette(n_items, '默认配色')))
+        return lambda: generate_chart(data, items, time_points, item_colors, output_format, dpi)
+    raise ValueError(f"未知的用例: {case}")
+
+
+def measure(spec, repeat):
+    """运行一个用例：先计时 repeat 次，再单独运行一次统计 tracemalloc 峰值（开启跟踪会拖慢运行）"""
+    run = prepare(**spec)
+    run()  # 预热：首次调用的导入、字体加载等不计入
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'seconds_min': min(timings),
+        'seconds_median': statistics.median(timings),
+        'traced_peak_mb': peak / 1024 / 1024,
+    }
+
+
+def measure_isolated(spec, repeat):
+    """在新进程中运行用例，另外记录进程常驻内存的峰值"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--run-spec', json.dumps(spec), '--repeat', str(repeat)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def peak_rss_mb():
+    """当前进程常驻内存的峰值（MB）"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def case_specs(cases, sizes, chart_sizes, formats, dpis):
+    """展开所有用例；与规模无关的维度只测一次，矢量格式与 DPI 无关只测一次"""
+    specs = []
+    for case in cases:
+        seen_time_points = set()
+        for n_items, n_time_points in (chart_sizes if case == 'generate_chart' else sizes):
+            if case == 'generate_time_points':
+                if n_time_points in seen_time_points:
+                    continue
+                seen_time_points.add(n_time_points)
+            if case != 'generate_chart':
+                specs.append({'case': case, 'n_items': n_items, 'n_time_points': n_time_points})
+                continue
+            for output_format in formats:
+                for dpi in (dpis[:1] if output_format in ('svg', 'pdf') else dpis):
+                    specs.append({'case': case, 'n_items': n_items, 'n_time_points': n_time_points,
+                                  'output_format': output_format, 'dpi': dpi})
+    return specs
+
+
+def spec_id(spec):
+    """用例的唯一名称，用于与基准结果对应"""
+    name = f"{spec['case']}[{spec['n_items']}x{spec['n_time_points']}"
+    if spec.get('output_format'):
+        name += f",{spec['output_format']},{spec['dpi']}dpi"
+    return name + ']'
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """
+    与基准结果比较
+    :return: 回归的用例列表 [(用例, 指标, 基准值, 当前值)]
+    """
+    previous = {record['id']: record for record in baseline['results']}
+    regressions = []
+    for record in results:
+        before = previous.get(record['id'])
+        if before is None:
+            continue
+        floors = {'seconds_median': min_seconds, 'traced_peak_mb': MIN_COMPARED_MB, 'rss_peak_mb': MIN_COMPARED_MB}
+        for metric, floor in floors.items():
+            if metric not in record or metric not in before or max(record[metric], before[metric]) < floor:
+                continue
+            if record[metric] > before[metric] * (1 + threshold):
+                regressions.append((record['id'], metric, before[metric], record[metric]))
+    return regressions
+
+
+def parse_sizes(text):
+    return [tuple(int(n) for n in size.split('x')) for size in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='逗号分隔的 题项数x时间点数')
+    parser.add_argument('--chart-sizes', default=DEFAULT_CHART_SIZES, help='generate_chart 的 题项数x时间点数')
+    parser.add_argument('--cases', default='all', help=f"逗号分隔的用例，可选 {','.join(CASES)}")
+    parser.add_argument('--formats', default='png,jpg,svg,pdf', help='generate_chart 的图片格式')
+    parser.add_argument('--dpi', default='100,300', help='generate_chart 位图的 DPI')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--isolate', action='store_true', help='每个用例在新进程中运行并记录常驻内存峰值')
+    parser.add_argument('--output', help='结果 JSON 的保存路径（默认打印到标准输出）')
+    parser.add_argument('--baseline', help='基准结果 JSON，给出时检查回归')
+    parser.add_argument('--threshold', type=float, default=0.25, help='超出基准的比例上限')
+    parser.add_argument('--min-seconds', type=float, default=0.005, help='低于该耗时的用例不比较耗时')
+    parser.add_argument('--run-spec', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # 没有安装中文字体的机器上会大量输出缺字警告，避免它们干扰计时
+    warnings.simplefilter('ignore')
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+    if args.run_spec:
+        result = measure(json.loads(args.run_spec), args.repeat)
+        result['rss_peak_mb'] = peak_rss_mb()
+        print(json.dumps(result))
+        return
+
+    cases = CASES if args.cases == 'all' else args.cases.split(',')
+    specs = case_specs(cases, parse_sizes(args.sizes), parse_sizes(args.chart_sizes), args.formats.split(','),
+                       [int(dpi) for dpi in args.dpi.split(',')])
+    results = []
+    for spec in specs:
+        record = {'id': spec_id(spec), **spec}
+        record.update(measure_isolated(spec, args.repeat) if args.isolate else measure(spec, args.repeat))
+        results.append(record)
+        print(f"{record['id']:<48} {record['seconds_median']:>9.4f}s {record['traced_peak_mb']:>8.1f}MB"
+              + (f" rss {record['rss_peak_mb']:.0f}MB" if 'rss_peak_mb' in record else ''), file=sys.stderr)
+
+    import matplotlib
+    import pandas
+    report = {
+        'meta': {
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pandas.__version__,
+            'matplotlib': matplotlib.__version__,
+            'repeat': args.repeat,
+            'isolate': args.isolate,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        for name, metric, before, after in regressions:
+            print(f"回归: {name} {metric} {before:.4f} -> {after:.4f} (+{after / before - 1:.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"未发现超过 {args.threshold:.0%} 的回归", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
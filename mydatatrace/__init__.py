@@ -0,0 +1,4 @@
+"""
+MyDataTrace 核心库：得分存储、时间轴、配色、表格导入导出、团队统计、图表渲染和渲染任务池，不依赖 Streamlit
+可在批处理任务和工作进程中直接导入；Matplotlib 只在导入 render/jobs 时加载，pandas 等只在读写表格时加载
+"""
@@ -0,0 +1,113 @@
+"""渲染和导出缓存：按输入内容寻址的图片、导出文件字节缓存"""
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .store import ScoreMatrix
+
+
+class RenderCache:
+    """按输入内容寻址的图片缓存，线程安全，按字节预算做LRU淘汰"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """命中时返回图片字节并标记为最近使用，未命中返回 None"""
+        with self._lock:
+            image = self._entries.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image):
+        """写入图片字节，超出预算时淘汰最久未使用的条目；单张超过预算的图片不缓存"""
+        if len(image) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = image
+            self._size += len(image)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self):
+        """返回命中/未命中次数、条目数和占用字节数"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self._size}
+
+
+def _parts_digest(parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update('\x1f'.join(map(str, part)).encode('utf-8'))
+        digest.update(b'\x1e')
+    return digest
+
+
+def content_digest(data, items, time_points, *parts):
+    """对题项、时间点、其余参数和对应的得分/说明子矩阵计算稳定的哈希值"""
+    scores, notes = ScoreMatrix.coerce(data).block(items, time_points)
+    digest = _parts_digest((items, time_points, *parts))
+    digest.update(np.ascontiguousarray(scores, dtype=np.float64).tobytes())
+    digest.update('\x1f'.join(map(str, notes.ravel())).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def chart_cache_key(data, items, time_points, item_colors, output_format, dpi, cohort_band=None):
+    """对图表的全部输入（包括可选的团队分布带）计算稳定的哈希值"""
+    parts = [[item_colors.get(item, '') for item in items], [output_format.lower(), str(dpi)]]
+    if cohort_band is not None:
+        band = np.ascontiguousarray(cohort_band, dtype=np.float64)
+        parts.append(['cohort', band.shape, hashlib.sha256(band.tobytes()).hexdigest()])
+    return content_digest(data, items, time_points, *parts)
+
+
+def export_cache_key(data, items, time_points, export_format, data_version=None):
+    """
+    对导出文件（模板、备份）的全部输入计算稳定的哈希值
+    :param data_version: 得分存储的版本标识（StateVersions.token('data')）；给出时用它代替得分内容，不再遍历存储
+    """
+    if data_version is not None:
+        return _parts_digest((items, time_points, ['export', export_format.lower()], data_version)).hexdigest()
+    return content_digest(data, items, time_points, ['export', export_format.lower()])
+
+
+def generate_chart_cached(cache, data, items, time_points, item_colors, output_format="png", dpi=400,
+                          cohort_band=None):
+    """先查渲染缓存，未命中时调用 generate_chart 并写入缓存"""
+    key = chart_cache_key(data, items, time_points, item_colors, output_format, dpi, cohort_band)
+    image = cache.get(key)
+    if image is None:
+        from .render import generate_chart
+        image = generate_chart(data, items, time_points, item_colors, output_format, dpi,
+                               cohort_band=cohort_band).getvalue()
+        cache.put(key, image)
+    return io.BytesIO(image)
+
+
+def export_cached(cache, export_func, export_format, data, items, time_points, data_version=None):
+    """
+    先查缓存，未命中时调用 export_func 生成导出文件并写入缓存
+    :param data_version: 见 export_cache_key
+    :return: 文件字节
+    """
+    key = export_cache_key(data, items, time_points, export_format, data_version)
+    content = cache.get(key)
+    if content is None:
+        content = export_func(data, items, time_points).getvalue()
+        cache.put(key, content)
+    return content
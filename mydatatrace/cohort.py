@@ -0,0 +1,141 @@
+"""
+团队数据：多名成员的得分堆叠为 (成员 × 题项 × 时间点) 数组，
+按 题项 × 时间点 向量化计算人数、均值、中位数和分位数，用于在个人轨迹图后绘制团队分布带
+"""
+import warnings
+
+import numpy as np
+
+from .excel_io import BLANK_SCORE
+from .store import ScoreMatrix
+
+# 分布带默认使用的分位数
+DEFAULT_PERCENTILES = (25, 75)
+
+
+class Cohort:
+    """
+    团队得分：scores 为 (成员 × 题项 × 时间点) 的浮点数组，成员未填写的单元格为 NaN；
+    notes 为同形状的说明数组
+    """
+
+    def __init__(self, members, items, time_points, scores, notes=None):
+        self.members = list(members)
+        self.items = list(items)
+        self.time_points = list(time_points)
+        self.scores = np.asarray(scores, dtype=float).reshape(len(self.members), len(self.items),
+                                                               len(self.time_points))
+        self.notes = np.full(self.scores.shape, '', dtype=object) if notes is None else np.asarray(notes, dtype=object)
+
+    def __len__(self):
+        return len(self.members)
+
+    @classmethod
+    def from_rows(cls, members, labels, items, scores, notes):
+        """
+        从长表构建：每行为一名成员在一个时间点的数据
+        :param members: 各行的成员名；labels: 各行的时间点
+        :param scores: (行 × 题项) 得分数组，未填写为 NaN；notes: 同形状的说明数组
+        成员和时间点按首次出现的顺序排列；同一成员、同一时间点出现多次时取最后一行（与 ScoreMatrix.from_rows 一致）
+        """
+        member_order = list(dict.fromkeys(members))
+        tp_order = list(dict.fromkeys(labels))
+        member_index = {member: k for k, member in enumerate(member_order)}
+        tp_index = {tp: j for j, tp in enumerate(tp_order)}
+        # 先去重再散布写入：重复下标的赋值顺序 NumPy 不作保证
+        last_row = dict(zip(zip(members, labels), range(len(labels))))
+        rows = np.fromiter(last_row.values(), dtype=np.intp, count=len(last_row))
+        member_codes = np.fromiter((member_index[member] for member, _ in last_row), dtype=np.intp, count=len(rows))
+        tp_codes = np.fromiter((tp_index[tp] for _, tp in last_row), dtype=np.intp, count=len(rows))
+
+        cohort = cls(member_order, items, tp_order, np.full((len(member_order), len(items), len(tp_order)), np.nan))
+        # 一次散布写入所有行：高级索引的结果形状为 (行 × 题项)
+        cohort.scores[member_codes, :, tp_codes] = np.asarray(scores, dtype=float)[rows]
+        cohort.notes[member_codes, :, tp_codes] = np.asarray(notes, dtype=object)[rows]
+        return cohort
+
+    @classmethod
+    def from_matrices(cls, matrices):
+        """从 {成员: ScoreMatrix} 构建，题项和时间点取所有成员的并集"""
+        matrices = {member: ScoreMatrix.coerce(data) for member, data in matrices.items()}
+        items = list(dict.fromkeys(item for matrix in matrices.values() for item in matrix.items))
+        time_points = list(dict.fromkeys(tp for matrix in matrices.values() for tp in matrix.time_points))
+        cohort = cls(matrices, items, time_points, np.full((len(matrices), len(items), len(time_points)), np.nan))
+        for k, matrix in enumerate(matrices.values()):
+            cohort.scores[k], cohort.notes[k] = matrix.block(items, time_points, default_score=np.nan)
+        return cohort
+
+    def member(self, name):
+        """
+        取出一名成员的得分存储（只包含该成员填写过的时间点）
+        这些时间点中未填写的得分与单人导入（excel_to_data）一致，记为 BLANK_SCORE
+        """
+        k = self.members.index(name)
+        filled = ~np.isnan(self.scores[k]).all(axis=0)
+        time_points = [tp for tp, keep in zip(self.time_points, filled) if keep]
+        scores = np.nan_to_num(self.scores[k][:, filled], nan=BLANK_SCORE)
+        return ScoreMatrix.from_arrays(self.items, time_points, scores, self.notes[k][:, filled])
+
+    def stats(self, percentiles=DEFAULT_PERCENTILES):
+        """按 题项 × 时间点 计算统计量（忽略未填写的单元格）"""
+        return CohortStats(self.items, self.time_points, self.scores, percentiles)
+
+
+def nan_percentiles(scores, percentiles):
+    """
+    沿第一个轴（成员）计算忽略 NaN 的分位数，插值方式与 np.nanpercentile 默认的 linear 一致
+    只排序一次再按下标取值；np.nanpercentile/np.nanmedian 遇到 NaN 时会逐单元格计算，人数和单元格多时很慢
+    :return: 与 percentiles 对应的数组列表，形状为 scores.shape[1:]，没有有效值的位置为 NaN
+    """
+    count = (~np.isnan(scores)).sum(axis=0)
+    if scores.shape[0] == 0:
+        return [np.full(count.shape, np.nan) for _ in percentiles]
+    # NaN 排在最后，前 count 个为有效值
+    ordered = np.sort(scores, axis=0)
+    last = np.maximum(count - 1, 0)
+    result = []
+    for q in percentiles:
+        position = last * (q / 100)
+        lower = np.floor(position).astype(np.intp)
+        upper = np.minimum(lower + 1, last)
+        lower_values = np.take_along_axis(ordered, lower[None], axis=0)[0]
+        upper_values = np.take_along_axis(ordered, upper[None], axis=0)[0]
+        values = lower_values + (upper_values - lower_values) * (position - lower)
+        values[count == 0] = np.nan
+        result.append(values)
+    return result
+
+
+class CohortStats:
+    """
+    团队统计量，各数组形状均为 (题项 × 时间点)，没有人填写的单元格为 NaN
+    count: 填写人数；mean/median: 均值、中位数；percentiles: {分位数: 数组}
+    """
+
+    def __init__(self, items, time_points, scores, percentiles=DEFAULT_PERCENTILES):
+        self.items = list(items)
+        self.time_points = list(time_points)
+        self.item_index = {item: i for i, item in enumerate(self.items)}
+        self.tp_index = {tp: j for j, tp in enumerate(self.time_points)}
+        self.count = (~np.isnan(scores)).sum(axis=0)
+        with warnings.catch_warnings():
+            # 全为 NaN 的单元格返回 NaN，不输出空切片警告
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.mean = np.nanmean(scores, axis=0)
+        self.median, *values = nan_percentiles(scores, [50, *percentiles])
+        self.percentiles = dict(zip(percentiles, values))
+
+    def band(self, items, time_points, low=DEFAULT_PERCENTILES[0], high=DEFAULT_PERCENTILES[1]):
+        """
+        按给定顺序取出分布带，可直接传给 generate_chart(cohort_band=...)
+        :return: (3 × 题项 × 时间点) 数组，依次为下分位、中位数、上分位；团队中没有的题项/时间点为 NaN
+        """
+        rows = np.array([self.item_index.get(item, -1) for item in items], dtype=np.intp)
+        cols = np.array([self.tp_index.get(tp, -1) for tp in time_points], dtype=np.intp)
+        band = np.full((3, len(rows), len(cols)), np.nan)
+        present = (rows >= 0)[:, None] & (cols >= 0)[None, :]
+        region = np.ix_(np.maximum(rows, 0), np.maximum(cols, 0))
+        for k, values in enumerate((self.percentiles[low], self.median, self.percentiles[high])):
+            if values.size:
+                band[k][present] = values[region][present]
+        return band
@@ -0,0 +1,329 @@
+"""
+表格导入导出：Excel/CSV/Parquet 备份与模板、Excel 导入（整表读取或流式分块读取）
+pandas、openpyxl、pyarrow 在用到时才导入，导入本模块不加载它们
+"""
+import io
+import sys
+
+import numpy as np
+
+from . import perf
+from .store import ScoreMatrix
+
+# 导入时未填写的得分记为该值（整表、流式和团队成员导入一致）
+BLANK_SCORE = 0.0
+# 流式导入：每块解析的行数，以及已解析数据的内存上限（MB）
+STREAM_CHUNK_ROWS = 500
+STREAM_MAX_MEMORY_MB = 64
+
+
+def export_table(data, items, time_points):
+    """
+    按导出布局整理数据：时间点 / 题项 - 得分 / 题项 - 说明
+    :return: (表头列表, 得分数组, 说明数组)，数组形状为 (题项 × 时间点)
+    """
+    scores, notes = ScoreMatrix.coerce(data).block(items, time_points)
+    header = ['时间点']
+    for item in items:
+        header.append(f"{item} - 得分")
+        header.append(f"{item} - 说明")
+    return header, scores, notes
+
+
+def export_rows(data, items, time_points):
+    """
+    按导出布局逐行生成数据，不构建中间 DataFrame，也不一次性物化整张表
+    :return: (表头列表, 逐行产出的生成器)，空说明写为 None
+    """
+    header, scores, notes = export_table(data, items, time_points)
+
+    def rows():
+        for j, label in enumerate(time_points):
+            row = [label]
+            for score, note in zip(scores[:, j].tolist(), notes[:, j].tolist()):
+                row.append(score)
+                row.append(note if note != '' else None)
+            yield row
+
+    return header, rows()
+
+
+def data_to_excel(data, items, time_points):
+    """将数据转换为Excel文件字节流（openpyxl 只写模式，逐行流式写入）"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font
+    
+    # 这里只取出得分、说明块；各行在写入时才逐行生成，计入 excel.write
+    with perf.stage('excel.rows', items=len(items), time_points=len(time_points)):
+        header, rows = export_rows(data, items, time_points)
+    
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('数据')
+    # 表头加粗居中，确保Excel易读性
+    header_cells = []
+    for name in header:
+        cell = WriteOnlyCell(sheet, value=name)
+        cell.font = Font(bold=True)
+        cell.alignment = Alignment(horizontal='center')
+        header_cells.append(cell)
+    sheet.append(header_cells)
+    
+    output = io.BytesIO()
+    # 逐行写入和打包保存一起计时
+    with perf.stage('excel.write'):
+        for row in rows:
+            sheet.append(row)
+        workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def data_to_csv(data, items, time_points):
+    """将数据转换为CSV文件字节流（带BOM的UTF-8，Excel可直接打开中文）"""
+    import csv
+    
+    header, rows = export_rows(data, items, time_points)
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return io.BytesIO(text.getvalue().encode('utf-8-sig'))
+
+
+def data_to_parquet(data, items, time_points):
+    """将数据转换为Parquet文件字节流（按列写入）"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    header, scores, notes = export_table(data, items, time_points)
+    columns = [pa.array(list(time_points), type=pa.string())]
+    for i in range(len(items)):
+        columns.append(pa.array(scores[i], type=pa.float64()))
+        columns.append(pa.array(notes[i], type=pa.string()))
+    
+    output = io.BytesIO()
+    pq.write_table(pa.Table.from_arrays(columns, names=header), output)
+    output.seek(0)
+    return output
+
+
+# 导出格式：格式 -> (转换函数, MIME类型)
+EXPORT_FORMATS = {
+    'xlsx': (data_to_excel, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'csv': (data_to_csv, "text/csv"),
+    'parquet': (data_to_parquet, "application/vnd.apache.parquet"),
+}
+
+
+def extract_items(columns):
+    """从 '题项名 - 得分' / '题项名 - 说明' 列名中识别题项，并保持列出现的顺序"""
+    return list(dict.fromkeys(
+        col.rsplit(' - ', 1)[0] for col in columns if col != '时间点' and ' - ' in col
+    ))
+
+
+def excel_to_data(file):
+    """读取Excel文件并返回得分存储和题项列表"""
+    import pandas as pd
+    
+    try:
+        with perf.stage('excel.read'):
+            df = pd.read_excel(file)
+        
+        # 验证必需的列
+        if '时间点' not in df.columns:
+            return None, None, "Excel文件缺少'时间点'列"
+        
+        # 识别题项，并保持列出现的顺序
+        items = extract_items(df.columns)
+        if not items:
+            return None, None, "未找到有效的数据列 (格式应为 '题项名 - 得分' 或 '题项名 - 说明')"
+        
+        with perf.stage('excel.parse', rows=len(df), items=len(items)):
+            return frame_to_matrix(df, items), items, None
+    except Exception as e:
+        return None, None, f"解析Excel失败: {str(e)}"
+
+
+def frame_columns(df, items):
+    """
+    按列取出导入的DataFrame中的时间点、得分和说明（不逐行遍历）
+    :return: (时间点列表, (题项 × 行) 得分数组, 同形状的说明数组)，未填写的得分为 NaN
+    """
+    import pandas as pd
+    
+    labels = df['时间点'].map(str).tolist()
+    
+    # 一次性取出得分列和说明列；容错处理：缺失的列（比如只写了得分没写说明）给默认值
+    score_frame = df.reindex(columns=[f"{item} - 得分" for item in items])
+    note_frame = df.reindex(columns=[f"{item} - 说明" for item in items])
+    
+    # 批量处理空值并转换类型
+    scores = score_frame.to_numpy(dtype=float, na_value=np.nan).T
+    # pandas 3 写时复制：未重新索引的列可能返回只读视图，显式复制后再填充空值
+    notes = note_frame.to_numpy(dtype=object, copy=True).T
+    notes[pd.isna(notes)] = ''
+    notes = np.frompyfunc(str, 1, 1)(notes)
+    return labels, scores, notes
+
+
+def frame_to_matrix(df, items):
+    """按列将导入的DataFrame解析为得分存储（不逐行遍历），未填写的得分记为 BLANK_SCORE"""
+    labels, scores, notes = frame_columns(df, items)
+    return ScoreMatrix.from_rows(items, labels, np.nan_to_num(scores, nan=BLANK_SCORE), notes)
+
+
+# 团队数据中区分成员的列名
+MEMBER_COLUMN = '成员'
+
+
+def excel_to_cohort(file):
+    """
+    读取团队数据：每个工作表一名成员（表名即成员名），或在表格中用 '成员' 列区分成员的长表，
+    所有成员的得分堆叠为一个 (成员 × 题项 × 时间点) 数组，未填写的单元格为 NaN
+    :return: (Cohort, 错误信息)
+    """
+    import pandas as pd
+    
+    from .cohort import Cohort
+    
+    try:
+        with perf.stage('excel.read'):
+            sheets = pd.read_excel(file, sheet_name=None)
+        frames = {str(name): df for name, df in sheets.items() if '时间点' in df.columns}
+        if not frames:
+            return None, "Excel文件缺少'时间点'列"
+        
+        # 没有成员列的工作表以表名作为成员名，统一拼成长表
+        df = pd.concat(
+            [frame if MEMBER_COLUMN in frame.columns else frame.assign(**{MEMBER_COLUMN: name})
+             for name, frame in frames.items()],
+            ignore_index=True
+        )
+        df = df[df[MEMBER_COLUMN].notna() & df['时间点'].notna()]
+        items = extract_items(column for column in df.columns if column != MEMBER_COLUMN)
+        if not items:
+            return None, "未找到有效的数据列 (格式应为 '题项名 - 得分' 或 '题项名 - 说明')"
+        
+        with perf.stage('excel.parse', rows=len(df), items=len(items)):
+            labels, scores, notes = frame_columns(df, items)
+            members = df[MEMBER_COLUMN].map(str).tolist()
+            return Cohort.from_rows(members, labels, items, scores.T, notes.T), None
+    except Exception as e:
+        return None, f"解析Excel失败: {str(e)}"
+
+
+def excel_to_data_streaming(file, chunk_rows=STREAM_CHUNK_ROWS, max_memory_mb=STREAM_MAX_MEMORY_MB, progress=None):
+    """
+    流式读取Excel文件（openpyxl 只读模式），先校验表头再分块解析，内存占用有上限
+    :param chunk_rows: 每块解析的行数
+    :param max_memory_mb: 已解析数据的内存上限（MB），包括最终得分存储的数组，超出时中止导入
+    :param progress: 可选回调 progress(已读行数, 总行数)，总行数未知时为 None
+    :return: 与 excel_to_data 相同的 (得分存储, 题项列表, 错误信息)
+    """
+    import pandas as pd
+    from openpyxl import load_workbook
+    
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            rows = sheet.iter_rows(values_only=True)
+            
+            # 先校验表头，不合格的文件无需读取数据行
+            header = list(next(rows, None) or [])
+            if '时间点' not in header:
+                return None, None, "Excel文件缺少'时间点'列"
+            items = extract_items(c for c in header if isinstance(c, str))
+            if not items:
+                return None, None, "未找到有效的数据列 (格式应为 '题项名 - 得分' 或 '题项名 - 说明')"
+            
+            # 各列在表头中的位置，缺失的列记为 None
+            width = len(header)
+            tp_col = header.index('时间点')
+            score_cols = [header.index(f"{item} - 得分") if f"{item} - 得分" in header else None for item in items]
+            note_cols = [header.index(f"{item} - 说明") if f"{item} - 说明" in header else None for item in items]
+            total_rows = sheet.max_row - 1 if sheet.max_row else None
+            
+            max_bytes = max_memory_mb * 1024 * 1024
+            # 得分和说明直接写入按行排列的 (行 × 题项) 数组，解析完成后不再拼接复制：
+            # 行数未知或超出时用 ndarray.resize 扩容，读完后原地截去多余的行；
+            # 数组按容量计入内存上限，扩容时按新旧数组同时存在计入
+            cell_bytes = len(items) * (np.dtype(float).itemsize + np.dtype(object).itemsize)
+            expected_rows = total_rows if total_rows and total_rows * cell_bytes <= max_bytes else 0
+            scores = np.empty((0, len(items)))
+            notes = np.empty((0, len(items)), dtype=object)
+            n_rows = string_bytes = 0
+            labels = []
+            chunk = []
+            
+            def check(array_bytes):
+                if array_bytes + string_bytes > max_bytes:
+                    raise MemoryError(f"导入数据超过内存上限 {max_memory_mb} MB，请拆分文件后分批导入")
+            
+            def reserve(extra_rows):
+                """保证数组还能写入 extra_rows 行，不够时扩容"""
+                capacity = len(scores)
+                if n_rows + extra_rows <= capacity:
+                    return
+                new_capacity = max(n_rows + extra_rows, int(capacity * 1.5), expected_rows)
+                check((capacity + new_capacity) * cell_bytes)
+                scores.resize((new_capacity, len(items)))
+                notes.resize((new_capacity, len(items)))
+            
+            def flush(chunk):
+                """解析一块数据行，写入数组并累计内存占用"""
+                nonlocal n_rows, string_bytes
+                reserve(len(chunk))
+                end = n_rows + len(chunk)
+                values = np.array([row + (None,) * (width - len(row)) for row in chunk], dtype=object)
+                scores[n_rows:end] = BLANK_SCORE
+                notes[n_rows:end] = ''
+                for i, (score_col, note_col) in enumerate(zip(score_cols, note_cols)):
+                    if score_col is not None:
+                        column = values[:, score_col]
+                        column[pd.isna(column)] = BLANK_SCORE
+                        scores[n_rows:end, i] = column.astype(float)
+                    if note_col is not None:
+                        column = values[:, note_col]
+                        column[pd.isna(column)] = ''
+                        notes[n_rows:end, i] = np.frompyfunc(str, 1, 1)(column)
+                chunk_labels = [str(v) if v is not None else 'nan' for v in values[:, tp_col]]
+                
+                string_bytes += sum(sys.getsizeof(v) for v in chunk_labels)
+                string_bytes += sum(sys.getsizeof(v) for v in notes[n_rows:end].ravel() if v)
+                check(len(scores) * cell_bytes)
+                labels.extend(chunk_labels)
+                n_rows = end
+            
+            for row in rows:
+                # 跳过完全空白的行
+                if all(v is None for v in row):
+                    continue
+                chunk.append(row[:width])
+                if len(chunk) >= chunk_rows:
+                    flush(chunk)
+                    chunk = []
+                    if progress:
+                        progress(n_rows, total_rows)
+            if chunk:
+                flush(chunk)
+            if progress:
+                progress(n_rows, n_rows)
+        finally:
+            workbook.close()
+        
+        if not labels:
+            return ScoreMatrix(items), items, None
+        scores.resize((n_rows, len(items)))
+        notes.resize((n_rows, len(items)))
+        # 重复的时间点去重时要复制一份，同样计入内存上限
+        unique_rows = len(set(labels))
+        if unique_rows < n_rows:
+            check((n_rows + unique_rows) * cell_bytes)
+        return ScoreMatrix.from_rows(items, labels, scores.T, notes.T), items, None
+    except MemoryError as e:
+        return None, None, str(e)
+    except Exception as e:
+        return None, None, f"解析Excel失败: {str(e)}"
@@ -0,0 +1,16 @@
+"""图表输出格式：不依赖 Matplotlib，界面层判断格式时无需加载渲染模块"""
+
+# 矢量格式与对应的文件元数据：去掉创建时间，相同输入生成完全相同的文件，便于缓存
+# 文字按 Matplotlib 默认方式嵌入：PDF 为 Type 3 字体、SVG 为字形路径，都只包含图中用到的字形（子集化）
+VECTOR_FORMATS = {
+    'svg': {'Date': None},
+    'pdf': {'CreationDate': None},
+}
+
+# 图片格式对应的下载类型
+CHART_MIME_TYPES = {
+    'jpg': 'image/jpeg',
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'pdf': 'application/pdf',
+}
@@ -0,0 +1,173 @@
+"""渲染任务池：把图表渲染交给独立的工作进程，不阻塞 Streamlit 的脚本线程"""
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from .render import VECTOR_FORMATS, assemble_chart, panel_tasks, plan_chart, render_chart_bytes, render_panel
+from .store import ScoreMatrix
+
+
+class RenderJob:
+    """
+    一次已提交的渲染任务，按输入内容的哈希值标识
+    分块渲染时一个任务包含多个子图的 future，全部完成后由 assemble 拼接成最终图片
+    """
+
+    def __init__(self, key, futures, assemble=None):
+        self.key = key
+        self.futures = list(futures)
+        self.assemble = assemble
+        self.submitted_at = time.time()
+        self._result = None
+        self._assemble_error = None
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._pending = len(self.futures)
+        self._settled = False
+        for future in self.futures:
+            future.add_done_callback(self._future_done)
+
+    @property
+    def future(self):
+        """第一个子任务（整图渲染时就是唯一的任务）"""
+        return self.futures[0]
+
+    @property
+    def status(self):
+        """任务状态：queued / running / done / failed / cancelled（拼接中的分块任务仍为 running）"""
+        if any(future.cancelled() for future in self.futures):
+            return 'cancelled'
+        if self._settled:
+            return 'failed' if self.error() is not None else 'done'
+        if any(future.running() or future.done() for future in self.futures):
+            return 'running'
+        return 'queued'
+
+    @property
+    def finished(self):
+        return self._settled
+
+    def result(self):
+        """渲染好的图片字节（任务失败时抛出渲染或拼接中的异常）"""
+        results = [future.result() for future in self.futures]
+        if self.assemble is None:
+            return results[0]
+        with self._lock:
+            if self._assemble_error is not None:
+                raise self._assemble_error
+            if self._result is None:
+                try:
+                    self._result = self.assemble(results)
+                except Exception as e:
+                    self._assemble_error = e
+                    raise
+            return self._result
+
+    def error(self):
+        for future in self.futures:
+            if not future.cancelled() and future.exception() is not None:
+                return future.exception()
+        return self._assemble_error
+
+    def cancel(self):
+        """取消尚未开始的任务；已在渲染中的任务无法中断，结果会被丢弃"""
+        cancelled = [future.cancel() for future in self.futures]
+        return any(cancelled)
+
+    def add_done_callback(self, fn):
+        """任务结束（完成并拼接好、失败或取消）后调用 fn(job)，只调用一次"""
+        with self._lock:
+            if not self._settled:
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _future_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if self._pending:
+                return
+        if self.assemble is not None and not any(f.cancelled() or f.exception() is not None for f in self.futures):
+            # 子任务的回调运行在进程池的管理线程上，拼接放到单独的线程，避免阻塞其他任务的结果回传
+            threading.Thread(target=self._settle, daemon=True).start()
+        else:
+            self._settle()
+
+    def _settle(self):
+        if self.assemble is not None and self.error() is None:
+            try:
+                self.result()
+            except Exception:
+                pass  # 异常记录在 _assemble_error 中，由 error() 报告
+        with self._lock:
+            self._settled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn(self)
+
+
+class RenderPool:
+    """
+    渲染进程池，进程内所有会话共享
+    工作进程以 spawn 方式启动，不继承 Streamlit 服务进程中的线程和锁
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            try:
+                return self._get_executor().submit(fn, *args)
+            except BrokenProcessPool:
+                # 工作进程异常退出（例如内存不足被杀）后重建进程池
+                self._executor = None
+                return self._get_executor().submit(fn, *args)
+
+    def submit(self, key, data, items, time_points, item_colors, output_format="png", dpi=400, max_bytes=None,
+               over_budget="downgrade", cohort_band=None):
+        """提交渲染任务，只把需要绘制的子矩阵传给工作进程"""
+        rows, cols = list(dict.fromkeys(items)), list(dict.fromkeys(time_points))
+        payload = ScoreMatrix.from_arrays(rows, cols, *ScoreMatrix.coerce(data).block(rows, cols))
+        args = (payload, list(items), list(time_points), dict(item_colors), output_format, dpi, max_bytes, over_budget,
+                cohort_band)
+        return RenderJob(key, [self._submit(render_chart_bytes, *args)])
+
+    def submit_tiled(self, key, data, items, time_points, item_colors, output_format="png", dpi=400, max_bytes=None,
+                     over_budget="downgrade", cohort_band=None):
+        """
+        分块提交：每个题项的子图各自在工作进程中渲染，全部完成后在主进程拼接
+        所有分块要同时保存在主进程中（计入内存预算），超出预算时改为单个进程内按条带渲染；矢量图不分块
+        """
+        if output_format.lower() in VECTOR_FORMATS:
+            return self.submit(key, data, items, time_points, item_colors, output_format, dpi, max_bytes, over_budget,
+                               cohort_band)
+        plan = plan_chart(data, items, time_points, output_format, dpi, max_bytes, over_budget, tiled=True)
+        if plan.strips:
+            return self.submit(key, data, items, time_points, item_colors, output_format, dpi, max_bytes, over_budget,
+                               cohort_band)
+        futures = [self._submit(render_panel, *task)
+                   for task in panel_tasks(data, items, time_points, item_colors, plan.dpi,
+                                           None if cohort_band is None else np.asarray(cohort_band, dtype=float))]
+        return RenderJob(key, futures, lambda tiles: assemble_chart(tiles, output_format, plan.dpi).getvalue())
+
+    def shutdown(self):
+        """关闭进程池并取消排队中的任务"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,191 @@
+"""
+确定性排版：根据题项数、时间点数、说明长度和缓存的字形宽度预先算出子图位置和画布尺寸，
+渲染时只需一次绘制，不再依赖 tight_layout 和 bbox_inches='tight' 反复测量文本
+"""
+import math
+
+import numpy as np
+
+# 长度单位：英寸；1pt = 1/72 英寸
+PT = 1 / 72
+# 多行文本的行高（字号的倍数，与 Matplotlib 默认行距一致）
+LINE_SPACING = 1.2
+# 刻度线长度和刻度标签间距（pt，Matplotlib 默认值）
+TICK_SIZE = 3.5
+TICK_PAD = 3.5
+# 时间标签旋转角度
+TIME_LABEL_ROTATION = 20
+# 横轴两端的留白比例（Matplotlib 默认 axes.xmargin）
+X_MARGIN = 0.05
+
+
+class ChartLayout:
+    """
+    双列轨迹图的排版结果：各子图坐标轴的大小固定，四周按标题、时间标签、
+    Y轴刻度和超出坐标轴的得分/说明标注留出空间，画布尺寸随之确定
+    """
+    # 坐标轴区域的尺寸（英寸）
+    AXES_SIZE = (3.3, 2.6)
+    # 画布外边距（与 bbox_inches='tight' 的默认 0.1 英寸一致）和子图间距
+    OUTER_PAD = 0.1
+    GAP = 0.15
+    N_COLS = 2
+
+    def __init__(self, fonts, items, time_points, scores, notes, dpi=None):
+        """
+        :param fonts: FontRegistry，提供缓存的字形宽度
+        :param scores: 题项 × 时间点的得分数组
+        :param notes: 题项 × 时间点的说明数组
+        :param dpi: 给定时画布尺寸取整到整像素，分块渲染的拼接边界与整图逐像素对齐
+        """
+        self.dpi = dpi
+        self.fonts = fonts
+        self.n_items = len(items)
+        self.n_rows = (self.n_items + self.N_COLS - 1) // self.N_COLS
+        # 只有一个题项时不保留空的第二列
+        self.n_cols = max(1, min(self.N_COLS, self.n_items))
+        n_tp = len(time_points)
+        self.xlim = (-X_MARGIN * (n_tp - 1), (n_tp - 1) * (1 + X_MARGIN)) if n_tp > 1 else (-0.5, 0.5)
+        ax_width, ax_height = self.AXES_SIZE
+
+        # 每列的左右留白、每行的上下留白
+        self.left = [0.0] * self.n_cols
+        self.right = [0.0] * self.n_cols
+        self.top = [0.0] * self.n_rows
+        self.bottom = [0.0] * self.n_rows
+
+        time_label = self._time_label_extent(time_points)
+        ytick_width = (self.fonts.text_width('100', 8) + TICK_SIZE + TICK_PAD) * PT
+        title_height = (18 * LINE_SPACING + 15) * PT
+
+        for i, item in enumerate(items):
+            row, col = divmod(i, self.N_COLS)
+            left, right = self._label_overhang(scores[i], notes[i], n_tp)
+            title_overhang = (self.fonts.text_width(str(item), 18) * PT - ax_width) / 2
+            top = title_height
+            if row == 0 and n_tp:
+                # 第一行的时间标签位于坐标轴上方，标题在其上方
+                top += time_label[1]
+                left = max(left, time_label[0] / 2 - self._x_fraction(0) * ax_width)
+                right = max(right, time_label[0] / 2 - (1 - self._x_fraction(n_tp - 1)) * ax_width)
+            if col == 0:
+                left = max(left, ytick_width)
+            self.left[col] = max(self.left[col], left, title_overhang)
+            self.right[col] = max(self.right[col], right, title_overhang)
+            self.top[row] = max(self.top[row], top, self._score_overflow(scores[i]))
+            self.bottom[row] = max(self.bottom[row], self._note_overflow(scores[i], notes[i]))
+
+        self.col_widths = [l + ax_width + r for l, r in zip(self.left, self.right)]
+        self.row_heights = [t + ax_height + b for t, b in zip(self.top, self.bottom)]
+        self.figsize = (
+            2 * self.OUTER_PAD + sum(self.col_widths) + self.GAP * (self.n_cols - 1),
+            2 * self.OUTER_PAD + sum(self.row_heights) + self.GAP * max(self.n_rows - 1, 0),
+        )
+        if dpi:
+            self.figsize = tuple(math.ceil(size * dpi - 1e-6) / dpi for size in self.figsize)
+
+    def _x_fraction(self, x):
+        """数据横坐标在坐标轴宽度中的位置（0~1）"""
+        lo, hi = self.xlim
+        return (x - lo) / (hi - lo)
+
+    def _y_fraction(self, y):
+        """得分在坐标轴高度中的位置（Y轴固定为 0~110）"""
+        return np.clip(np.asarray(y, dtype=float), 0, 110) / 110
+
+    def _time_label_extent(self, time_points):
+        """旋转后的时间标签占用的（宽, 高），含刻度线和间距"""
+        if not time_points:
+            return 0.0, 0.0
+        width = max(self.fonts.text_width(str(tp), 8) for tp in time_points)
+        height = 8 * LINE_SPACING
+        angle = math.radians(TIME_LABEL_ROTATION)
+        return (
+            (width * math.cos(angle) + height * math.sin(angle)) * PT,
+            (width * math.sin(angle) + height * math.cos(angle) + TICK_SIZE + TICK_PAD) * PT,
+        )
+
+    def _note_box(self, note):
+        """说明标注框的（宽, 高）：5字符换行，字号11，边框内边距 0.2 倍字号"""
+        lines = [note[k:k + 5] for k in range(0, len(note), 5)]
+        width = max(self.fonts.text_width(line, 11) for line in lines)
+        height = len(lines) * 11 * LINE_SPACING
+        return (width + 2 * 0.2 * 11 + 2) * PT, (height + 2 * 0.2 * 11 + 2) * PT
+
+    def _score_box(self, score):
+        """得分标注框的（宽, 高）：字号10，边框内边距 0.25 倍字号"""
+        width = self.fonts.text_width(f'{int(score)}', 10)
+        return (width + 2 * 0.25 * 10 + 2) * PT, (10 * LINE_SPACING + 2 * 0.25 * 10 + 2) * PT
+
+    def _label_overhang(self, scores, notes, n_tp):
+        """首尾数据点的标注超出坐标轴左右边界的宽度"""
+        ax_width = self.AXES_SIZE[0]
+        left = right = 0.0
+        for x in {0, n_tp - 1} if n_tp else ():
+            half = self._score_box(scores[x])[0] / 2
+            if notes[x]:
+                half = max(half, self._note_box(notes[x])[0] / 2)
+            left = max(left, half - self._x_fraction(x) * ax_width)
+            right = max(right, half - (1 - self._x_fraction(x)) * ax_width)
+        return left, right
+
+    def _score_overflow(self, scores):
+        """得分标注（数据点上方）超出坐标轴顶部的高度"""
+        ax_height = self.AXES_SIZE[1]
+        overflow = 0.0
+        for score in scores:
+            height = self._score_box(score)[1]
+            overflow = max(overflow, height - (1 - self._y_fraction(score + 2)) * ax_height)
+        return overflow
+
+    def _note_overflow(self, scores, notes):
+        """说明标注（数据点下方）超出坐标轴底部的高度"""
+        ax_height = self.AXES_SIZE[1]
+        overflow = 0.0
+        for score, note in zip(scores, notes):
+            if note:
+                height = self._note_box(note)[1]
+                overflow = max(overflow, height - self._y_fraction(score - 2) * ax_height)
+        return overflow
+
+    def cell(self, i):
+        """第 i 个子图所在单元格的（左, 下, 宽, 高），画布坐标，单位英寸"""
+        row, col = divmod(i, self.N_COLS)
+        x = self.OUTER_PAD + sum(self.col_widths[:col]) + self.GAP * col
+        y = self.figsize[1] - self.OUTER_PAD - sum(self.row_heights[:row + 1]) - self.GAP * row
+        return x, y, self.col_widths[col], self.row_heights[row]
+
+    def tile_bounds(self, i):
+        """
+        分块渲染时第 i 个子图负责的画布区域（左, 下, 宽, 高）：
+        单元格向四周扩展到相邻单元格间距的一半，外侧包含画布边距，所有分块恰好铺满画布
+        """
+        row, col = divmod(i, self.N_COLS)
+        x, y, width, height = self.cell(i)
+        pad_left = self.OUTER_PAD if col == 0 else self.GAP / 2
+        pad_right = self.OUTER_PAD if col == self.n_cols - 1 else self.GAP / 2
+        pad_top = self.OUTER_PAD if row == 0 else self.GAP / 2
+        pad_bottom = self.OUTER_PAD if row == self.n_rows - 1 else self.GAP / 2
+        left, right = x - pad_left, x + width + pad_right
+        top, bottom = self.figsize[1] - (y + height + pad_top), self.figsize[1] - (y - pad_bottom)
+        # 最后一行/列延伸到画布边缘（取整到整像素时多出的部分）
+        if col == self.n_cols - 1:
+            right = self.figsize[0]
+        if row == self.n_rows - 1:
+            bottom = self.figsize[1]
+        if self.dpi:
+            # 边界取整到像素，相邻分块共用同一条边界
+            left, right, top, bottom = (round(v * self.dpi) / self.dpi for v in (left, right, top, bottom))
+        return left, self.figsize[1] - bottom, right - left, bottom - top
+
+    def axes_rect(self, i, bounds=None):
+        """
+        第 i 个子图坐标轴的位置，按 fig.add_axes 的比例坐标给出
+        :param bounds: 画布区域（左, 下, 宽, 高），默认整张画布；分块渲染时传入 tile_bounds(i)
+        """
+        row, col = divmod(i, self.N_COLS)
+        x, y, _, _ = self.cell(i)
+        left, bottom = x + self.left[col], y + self.bottom[row]
+        origin_x, origin_y, width, height = bounds or (0.0, 0.0) + self.figsize
+        ax_width, ax_height = self.AXES_SIZE
+        return ((left - origin_x) / width, (bottom - origin_y) / height, ax_width / width, ax_height / height)
@@ -0,0 +1,35 @@
+"""配色方案：默认调色板和按题项数生成配色"""
+
+# 默认调色板，题项多于调色板颜色数时循环使用
+DEFAULT_PALETTE = [
+    '#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57',
+    '#FF9FF3', '#54A0FF', '#5F27CD', '#FF9F43', '#1DD1A1'
+]
+
+# 自定义配色的初始颜色（精简版）
+DEFAULT_CUSTOM_COLORS = [
+    '#66BB6A',  # 我增进了多少成长和智慧？ - 鲜草绿
+    '#FFA000',  # 我有多少自我觉察、理解和同情？ - 亮橙黄
+    '#F06292',  # 我感到多少爱与被爱？ - 亮粉
+    '#BA68C8',  # 我做了多少满意的善行？ - 亮紫
+    '#26C6DA',  # 我体验了丰富的风景和故事？ - 亮青蓝
+    '#1DE9B6',  # 我的身体有多健康？ - 亮青柠绿
+    '#4DD0E1',  # 我有多少自在闲暇？ - 亮浅蓝
+    '#29B6F6'   # 我的内心有多安宁平和？ - 亮天蓝
+]
+
+
+def generate_color_palette(n_items, palette_type='默认配色', custom_colors=()):
+    """
+    生成配色方案
+    :param palette_type: '默认配色' 循环使用默认调色板，其他值使用 custom_colors
+    :param custom_colors: 自定义颜色，不足时用默认调色板补齐
+    """
+    if palette_type == '默认配色':
+        # 循环使用默认调色板
+        return [DEFAULT_PALETTE[i % len(DEFAULT_PALETTE)] for i in range(n_items)]
+    custom_colors = list(custom_colors)
+    if len(custom_colors) >= n_items:
+        return custom_colors[:n_items]
+    # 自定义颜色不足时，补充默认颜色
+    return custom_colors + [DEFAULT_PALETTE[i % len(DEFAULT_PALETTE)] for i in range(len(custom_colors), n_items)]
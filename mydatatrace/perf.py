@@ -0,0 +1,167 @@
+"""
+性能埋点：按阶段计时的上下文管理器和记录器
+设置环境变量 MYDATATRACE_PERF=1（或调用 enable()）后启用：每个阶段结束时写一条结构化日志（logger mydatatrace.perf），
+在 recording() 中运行的代码（如 Streamlit 的一次重跑）还会收集各阶段的耗时；
+关闭时 stage() 直接返回共享的空上下文管理器，几乎没有开销
+"""
+import contextlib
+import contextvars
+import functools
+import io
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_enabled = os.environ.get('MYDATATRACE_PERF', '') not in ('', '0')
+_NULL_STAGE = contextlib.nullcontext()
+# 当前上下文的记录列表和阶段嵌套深度；线程池、工作进程中的阶段只写日志
+_records = contextvars.ContextVar('perf_records', default=None)
+_depth = contextvars.ContextVar('perf_depth', default=0)
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    """打开或关闭埋点"""
+    global _enabled
+    _enabled = on
+
+
+class StageRecord:
+    """一个阶段的计时结果：名称、开始时间、耗时（秒）、嵌套深度和附加字段"""
+    __slots__ = ('name', 'start', 'seconds', 'depth', 'fields')
+
+    def __init__(self, name, start, seconds, depth, fields):
+        self.name = name
+        self.start = start
+        self.seconds = seconds
+        self.depth = depth
+        self.fields = fields
+
+
+class _Stage:
+    __slots__ = ('name', 'fields', 'start', 'depth', 'token')
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.depth = _depth.get()
+        self.token = _depth.set(self.depth + 1)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        _depth.reset(self.token)
+        records = _records.get()
+        if records is not None:
+            records.append(StageRecord(self.name, self.start, seconds, self.depth, self.fields))
+        logger.info("stage=%s ms=%.2f depth=%d%s", self.name, seconds * 1000, self.depth,
+                    ''.join(f" {key}={value}" for key, value in self.fields.items()),
+                    extra={'perf_stage': self.name, 'perf_ms': seconds * 1000, 'perf_depth': self.depth,
+                           'perf_fields': self.fields})
+        return False
+
+
+def stage(name, **fields):
+    """
+    对一个阶段计时：with stage('chart.savefig', format='png'): ...
+    :param fields: 写入日志的附加字段
+    """
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name, fields)
+
+
+def timed(name):
+    """函数装饰器：每次调用作为一个阶段计时"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def recording():
+    """收集其中各阶段的记录（按开始时间排序的 StageRecord 列表在退出时整理好）"""
+    records = []
+    token = _records.set(records)
+    try:
+        yield records
+    finally:
+        _records.reset(token)
+        records.sort(key=lambda record: record.start)
+
+
+def estimate_size(obj, _seen=None):
+    """
+    粗略估算对象占用的内存（字节）：递归计入容器元素、对象属性、NumPy 数组和字节缓冲区，
+    同一对象只计一次；用于在调试面板中比较会话状态的大小，不追求精确
+    """
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        size = obj.nbytes
+        if obj.dtype == object:
+            size += sum(estimate_size(value, seen) for value in obj.ravel())
+        return size
+    if isinstance(obj, io.BytesIO):
+        with obj.getbuffer() as view:
+            return sys.getsizeof(obj) + view.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        return size + sum(estimate_size(key, seen) + estimate_size(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(estimate_size(value, seen) for value in obj)
+    if hasattr(obj, '__dict__'):
+        size += estimate_size(vars(obj), seen)
+    return size
+
+
+def summarize(records):
+    """
+    按（名称, 深度）汇总记录，保持首次出现的顺序
+    :return: [{'stage', 'depth', 'calls', 'total_ms', 'self_ms'}]，self_ms 为扣除直接子阶段后的耗时
+    """
+    rows = {}
+    stack = []
+    for record in sorted(records, key=lambda record: record.start):
+        while stack and stack[-1].depth >= record.depth:
+            stack.pop()
+        if stack and stack[-1].depth == record.depth - 1:
+            rows[(stack[-1].name, stack[-1].depth)]['self_ms'] -= record.seconds * 1000
+        row = rows.setdefault((record.name, record.depth), {
+            'stage': record.name, 'depth': record.depth, 'calls': 0, 'total_ms': 0.0, 'self_ms': 0.0
+        })
+        row['calls'] += 1
+        row['total_ms'] += record.seconds * 1000
+        row['self_ms'] += record.seconds * 1000
+        stack.append(record)
+    return list(rows.values())
+
+
+def log_to_stderr(level=logging.INFO):
+    """把阶段日志输出到标准错误（只添加一次处理器）"""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(level)
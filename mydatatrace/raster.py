@@ -0,0 +1,156 @@
+"""
+栅格预算与流式编码：渲染前估算图片像素和峰值内存，超出预算时自动降低分辨率或拒绝渲染；
+大图按行条带渲染，逐条写入 PNG，整张图的像素不必同时驻留内存
+"""
+import math
+import struct
+import zlib
+
+import numpy as np
+
+# 单次渲染允许的峰值内存（字节），可在调用时覆盖
+RASTER_MAX_BYTES = 256 * 1024 * 1024
+# 自动降低分辨率时的下限
+MIN_DPI = 50
+
+
+class RasterBudgetError(MemoryError):
+    """渲染所需内存超出预算且不允许自动降低分辨率"""
+
+
+class RasterPlan:
+    """一次渲染的栅格方案：最终分辨率、像素尺寸、是否按条带渲染及估算的峰值内存"""
+
+    def __init__(self, requested_dpi, dpi, width, height, strips, peak_bytes):
+        self.requested_dpi = requested_dpi
+        self.dpi = dpi
+        self.width = width
+        self.height = height
+        self.strips = strips
+        self.peak_bytes = peak_bytes
+
+    @property
+    def downgraded(self):
+        return self.dpi < self.requested_dpi
+
+
+def estimate_peak_bytes(figsize, strip_size, output_format, dpi, strips, tiled=False):
+    """
+    估算渲染峰值内存
+    整图渲染：Agg 画布 RGBA 4 字节/像素，JPEG 编码前还要转换一份 RGB
+    条带渲染：同一时刻只有一个子图画布（RGBA）、一行分块（RGB）和一条拼好的 RGB 条带
+    分块渲染（tiled）：子图在工作进程中渲染，拼接的进程同时持有全部分块（RGB）和一条条带
+    条带和分块模式另计编码：JPEG 不能流式编码，要加上整张图的缓冲区（RGBX 4 字节/像素，PIL 直接引用不再复制）；
+    PNG 加上每次滤波的一段像素行；编码结果按原始 RGB 的 1/8 估算（图表大面积为纯色，压缩率通常更高）
+    :param strip_size: 最大条带的（宽, 高），英寸
+    """
+    width, height = (math.ceil(size * dpi) for size in figsize)
+    jpg = output_format.lower() == 'jpg'
+    if not strips and not tiled:
+        return width * height * (7 if jpg else 4)
+    strip_pixels = math.ceil(strip_size[0] * dpi) * math.ceil(strip_size[1] * dpi)
+    if jpg:
+        encode = width * height * 4
+    else:
+        encode = PngStreamWriter.BLOCK_ROWS * (width * 3 + 1) * 2
+    encode += width * height * 3 // 8
+    if strips:
+        # 子图画布不超过一条条带，一行分块合起来也不超过一条条带
+        return strip_pixels * (4 + 3 + 3) + encode
+    return width * height * 3 + strip_pixels * 3 + encode
+
+
+def plan_raster(figsize, output_format, dpi, max_bytes=None, over_budget="downgrade", strip_size=None,
+                tiled=False):
+    """
+    根据画布尺寸和预算确定渲染方案：整图渲染超出预算时改为条带渲染（需提供 strip_size），
+    仍超出时按 over_budget 自动降低分辨率（downgrade）或抛出 RasterBudgetError（refuse）
+    :param figsize: 画布（宽, 高），英寸
+    :param strip_size: 条带（宽, 高），英寸；为 None 时不支持条带渲染
+    :param tiled: 按分块渲染估算（需提供 strip_size），超出预算时同样改为条带渲染
+    """
+    max_bytes = RASTER_MAX_BYTES if max_bytes is None else max_bytes
+    strips = False
+    tiled = tiled and strip_size is not None
+    peak = estimate_peak_bytes(figsize, strip_size, output_format, dpi, strips, tiled)
+    if peak > max_bytes and strip_size is not None:
+        strips = True
+        peak = estimate_peak_bytes(figsize, strip_size, output_format, dpi, strips)
+
+    plan_dpi = dpi
+    if peak > max_bytes:
+        if over_budget != "downgrade":
+            raise RasterBudgetError(
+                f"图片约需 {peak / 1024 / 1024:.0f} MB 内存，超出上限 {max_bytes / 1024 / 1024:.0f} MB，"
+                f"请降低分辨率或减少题项"
+            )
+        # 峰值内存与 dpi 的平方成正比，先按比例估算再逐步下调
+        plan_dpi = max(MIN_DPI, int(dpi * math.sqrt(max_bytes / peak)))
+        while plan_dpi > MIN_DPI and estimate_peak_bytes(figsize, strip_size, output_format, plan_dpi, strips) > max_bytes:
+            plan_dpi -= 1
+        peak = estimate_peak_bytes(figsize, strip_size, output_format, plan_dpi, strips)
+        if peak > max_bytes:
+            raise RasterBudgetError(
+                f"即使降到 {MIN_DPI} dpi，图片仍需约 {peak / 1024 / 1024:.0f} MB 内存，"
+                f"超出上限 {max_bytes / 1024 / 1024:.0f} MB，请减少题项"
+            )
+
+    width, height = (math.ceil(size * plan_dpi) for size in figsize)
+    return RasterPlan(dpi, plan_dpi, width, height, strips, peak)
+
+
+def _png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+
+class PngStreamWriter:
+    """
+    逐条写入 RGB 像素行的 PNG 编码器：每条像素行用 Sub 滤波后送入 zlib，
+    压缩结果随时写出为 IDAT 块，内存中只保留当前条带
+    """
+    # 每次滤波、压缩的像素行数
+    BLOCK_ROWS = 64
+
+    def __init__(self, out, width, height, dpi=None, level=6):
+        self.out = out
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(level)
+        out.write(b'\x89PNG\r\n\x1a\n')
+        # 8 位 RGB，不隔行
+        out.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        if dpi:
+            # 物理像素密度：每米像素数
+            ppm = int(round(dpi / 0.0254))
+            out.write(_png_chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1)))
+
+    def write_rows(self, rows):
+        """写入 (行数, 宽, 3) 的 uint8 像素条带"""
+        rows = np.asarray(rows, dtype=np.uint8)
+        n_rows = rows.shape[0]
+        if rows.shape[1:] != (self.width, 3):
+            raise ValueError(f"条带宽度 {rows.shape[1]} 与图片宽度 {self.width} 不一致")
+        if self.rows_written + n_rows > self.height:
+            raise ValueError("写入的像素行超过图片高度")
+        # 每次滤波、压缩一小段像素行，临时数组不随条带变大
+        for start in range(0, n_rows, self.BLOCK_ROWS):
+            flat = rows[start:start + self.BLOCK_ROWS].reshape(-1, self.width * 3)
+            # 每行前加滤波类型字节 1（Sub）：每个字节减去左侧同通道的字节，纯色区域压缩率更高
+            filtered = np.empty((flat.shape[0], self.width * 3 + 1), dtype=np.uint8)
+            filtered[:, 0] = 1
+            filtered[:, 1:4] = flat[:, :3]
+            np.subtract(flat[:, 3:], flat[:, :-3], out=filtered[:, 4:])
+            self._write_idat(self._compressor.compress(filtered))
+        self.rows_written += n_rows
+
+    def _write_idat(self, data):
+        if data:
+            self.out.write(_png_chunk(b'IDAT', data))
+
+    def close(self):
+        """写出剩余压缩数据和文件结尾"""
+        if self.rows_written != self.height:
+            raise ValueError(f"只写入了 {self.rows_written}/{self.height} 行像素")
+        self._write_idat(self._compressor.flush())
+        self.out.write(_png_chunk(b'IEND', b''))
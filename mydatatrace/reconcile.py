@@ -0,0 +1,125 @@
+"""
+增量同步：时间范围、时间粒度或题项变化后，只处理新增和删除的行列，让得分存储与当前配置一致；
+切换时间粒度时把已有得分换算到新的时间点（细粒度合并为粗粒度时按所选方式合并，反向时沿用上一级的得分）
+"""
+import warnings
+
+import numpy as np
+
+from .timeaxis import GRANULARITY_ORDER, coarsen, parse_time_point
+
+# 合并多个时间点的说明时使用的分隔符
+NOTE_SEPARATOR = '；'
+
+
+def _last(values):
+    """每行最后一个已录入的得分"""
+    filled = ~np.isnan(values)
+    last = values.shape[1] - 1 - np.argmax(filled[:, ::-1], axis=1)
+    result = values[np.arange(len(values)), last]
+    result[~filled.any(axis=1)] = np.nan
+    return result
+
+
+def _ignore_empty(func):
+    """全为 NaN 的行返回 NaN，不输出空切片警告"""
+    def aggregate(values):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return func(values, axis=1)
+    return aggregate
+
+
+# 细粒度的多个时间点合并为一个粗粒度时间点时得分的合并方式
+AGGREGATIONS = {
+    '平均': _ignore_empty(np.nanmean),
+    '最后': _last,
+    '最高': _ignore_empty(np.nanmax),
+    '最低': _ignore_empty(np.nanmin),
+}
+
+
+class Reconciler:
+    """
+    记住上次同步后的得分存储结构，配置和存储都未变化时直接跳过；
+    变化时只对新增、删除的题项和时间点操作
+    """
+
+    def __init__(self, default_score=70.0):
+        self.default_score = default_score
+        self._signature = None
+
+    def reconcile(self, matrix, items, time_points, aggregation='平均'):
+        """
+        同步得分存储的行列
+        :param items: 当前题项列表
+        :param time_points: 当前时间点列表
+        :param aggregation: 细粒度合并为粗粒度时的得分合并方式，AGGREGATIONS 的键
+        :return: 存储结构是否有变化
+        """
+        signature = (id(matrix), tuple(matrix.items), tuple(matrix.time_points), tuple(items), tuple(time_points))
+        if signature == self._signature:
+            return False
+
+        for item in items:
+            if item not in matrix:
+                matrix.add_item(item)
+
+        wanted = set(time_points)
+        added = [tp for tp in dict.fromkeys(time_points) if tp not in matrix.tp_index]
+        removed = [tp for tp in matrix.time_points if tp not in wanted]
+        if added:
+            matrix.add_time_points(added)
+            if removed:
+                self._convert(matrix, added, removed, AGGREGATIONS[aggregation])
+        if removed:
+            # 其他粒度的时间点已换算到新的时间点，删除；相同粒度、只是不在当前范围内的时间点保留，
+            # 缩小时间范围后再扩大时得分仍在
+            granularities = {parse_time_point(tp)[0] for tp in time_points if parse_time_point(tp)}
+            matrix.delete_time_points(
+                [tp for tp in removed if (parse_time_point(tp) or (None,))[0] not in granularities]
+            )
+
+        # 新增的行列以及导入数据中未录入的单元格填入默认得分
+        matrix.fill_missing(items, time_points, self.default_score)
+        self._signature = (id(matrix), tuple(matrix.items), tuple(matrix.time_points), tuple(items),
+                           tuple(time_points))
+        return True
+
+    @staticmethod
+    def _convert(matrix, added, removed, aggregate):
+        """用待删除的其他粒度时间点的得分填充新增的时间点"""
+        parsed = {tp: parse_time_point(tp) for tp in removed}
+        # (粗粒度, 所属时间点) -> 其中的细粒度时间点
+        children = {}
+        for old, info in parsed.items():
+            if info is None:
+                continue
+            for coarser in GRANULARITY_ORDER[:GRANULARITY_ORDER.index(info[0])]:
+                children.setdefault((coarser, coarsen(old, coarser)), []).append(old)
+        noted = set()
+        for tp in added:
+            target = parse_time_point(tp)
+            if target is None:
+                continue
+            granularity = target[0]
+            level = GRANULARITY_ORDER.index(granularity)
+            j = matrix.tp_index[tp]
+            # 更细的时间点：按时间顺序合并得分，说明依次拼接
+            finer = sorted(children.get((granularity, tp), ()))
+            if finer:
+                cols = [matrix.tp_index[old] for old in finer]
+                matrix.scores[:, j] = aggregate(matrix.scores[:, cols])
+                matrix.notes[:, j] = [NOTE_SEPARATOR.join(note for note in row if note)
+                                      for row in matrix.notes[:, cols]]
+                continue
+            # 更粗的时间点：沿用所在时间段的得分，说明只保留在其中第一个时间点上
+            for old_granularity in reversed(GRANULARITY_ORDER[:level]):
+                parent = coarsen(tp, old_granularity)
+                if parent in parsed:
+                    k = matrix.tp_index[parent]
+                    matrix.scores[:, j] = matrix.scores[:, k]
+                    if parent not in noted:
+                        matrix.notes[:, j] = matrix.notes[:, k]
+                        noted.add(parent)
+                    break
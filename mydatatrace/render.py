@@ -0,0 +1,502 @@
+"""图表渲染：字体注册表、批量标注层和轨迹图生成"""
+import functools
+import gc
+import io
+import os
+import threading
+
+import numpy as np
+from matplotlib.artist import Artist, allow_rasterization
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.text import Text
+from matplotlib.transforms import Bbox
+
+from . import perf
+from .formats import VECTOR_FORMATS
+from .layout import ChartLayout
+from .raster import PngStreamWriter, plan_raster
+from .store import ScoreMatrix
+
+
+# 字体注册表
+# 预置中文字体文件（使用相对路径，确保在GitHub和Streamlit远程运行时可用）
+FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'STKAITI.TTF')
+
+class FontRegistry:
+    """
+    字体注册表：每个进程只向字体管理器注册一次字体文件，
+    并缓存字体属性对象和字形宽度，供渲染和排版复用
+    """
+    # 字体文件不存在时使用的字体列表
+    FALLBACK_FAMILIES = ['STKaiti', 'SimHei', 'SimSun', 'Microsoft YaHei', 'SimKai', 'FangSong']
+
+    def __init__(self, font_path):
+        self.font_path = font_path
+        self.families = None
+        self._properties = {}
+        self._advances = {}
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        """首次使用时注册字体（线程安全，只执行一次）"""
+        if self.families is not None:
+            return
+        from matplotlib.font_manager import FontProperties, fontManager
+        
+        with self._lock:
+            if self.families is not None:
+                return
+            if os.path.exists(self.font_path):
+                # 添加字体到字体管理器，并以字体文件中的名称引用
+                fontManager.addfont(self.font_path)
+                self._base = FontProperties(fname=self.font_path)
+                self.families = [self._base.get_name()]
+            else:
+                # 如果字体文件不存在，使用默认字体列表
+                self._base = FontProperties(family=self.FALLBACK_FAMILIES)
+                self.families = list(self.FALLBACK_FAMILIES)
+
+    def properties(self, size=None, weight=None):
+        """获取（缓存的）字体属性对象；Text 会复制传入的属性，共享同一对象是安全的"""
+        self._ensure_loaded()
+        key = (size, weight)
+        props = self._properties.get(key)
+        if props is None:
+            props = self._base.copy()
+            if size is not None:
+                props.set_size(size)
+            if weight is not None:
+                props.set_weight(weight)
+            self._properties[key] = props
+        return props
+
+    def char_advance(self, char):
+        """单个字符在 1pt 字号下的宽度（pt），按字符缓存"""
+        advance = self._advances.get(char)
+        if advance is None:
+            from matplotlib.textpath import TextToPath
+            
+            width, _, _ = TextToPath().get_text_width_height_descent(char, self.properties(size=100), ismath=False)
+            advance = self._advances[char] = width / 100
+        return advance
+
+    def text_width(self, text, size):
+        """估算单行文本在指定字号下的宽度（pt），由缓存的字形宽度累加"""
+        return sum(self.char_advance(char) for char in text) * size
+
+
+@functools.lru_cache(maxsize=None)
+def get_font_registry():
+    """进程内共享的字体注册表"""
+    return FontRegistry(FONT_PATH)
+
+
+# 批量标注层
+class LabelLayer(Artist):
+    """
+    一组同样式的文本标注合并为一个艺术家：复用同一个 Text 对象逐个定位、绘制，
+    避免为每个数据点创建独立的 Text 和边框对象；绘制结果与逐个调用 ax.text 一致
+    """
+
+    def __init__(self, ax, xs, ys, texts, **text_kwargs):
+        super().__init__()
+        self._labels = list(zip(np.asarray(xs, dtype=float), np.asarray(ys, dtype=float), texts))
+        # 与 ax.text 相同的默认设置：数据坐标、不裁剪
+        self._text = Text(0, 0, '', transform=ax.transData, clip_on=False, **text_kwargs)
+        self._text.set_figure(ax.figure)
+        self._text.axes = ax
+        self.set_zorder(self._text.get_zorder())
+        self.set_clip_on(False)
+        ax.add_artist(self)
+
+    def _each_label(self):
+        """依次把复用的 Text 对象移动到每个标注的位置"""
+        for x, y, text in self._labels:
+            self._text.set_position((x, y))
+            self._text.set_text(text)
+            yield self._text
+
+    @allow_rasterization
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        for text in self._each_label():
+            text.draw(renderer)
+        self.stale = False
+
+    def get_window_extent(self, renderer=None):
+        """所有标注文本范围的并集，供 tight_layout / bbox_inches='tight' 计算边距"""
+        extents = [text.get_window_extent(renderer) for text in self._each_label()]
+        if not extents:
+            return Bbox.null()
+        return Bbox.union(extents)
+
+
+# 图片生成函数
+# 团队分布带的颜色
+COHORT_BAND_COLOR = '#9E9E9E'
+
+
+def draw_panel(ax, fonts, item, scores, notes, time_points, item_color, show_time_labels, band=None):
+    """
+    绘制单个题项的子图
+    :param scores: 该题项在各时间点的得分数组
+    :param notes: 该题项在各时间点的说明数组
+    :param show_time_labels: 是否在顶部显示时间标签（仅第一行子图显示）
+    :param band: 可选的团队分布带 (下分位, 中位数, 上分位)，各为该题项在各时间点的数组，缺失处为 NaN
+    """
+    font_props = fonts.properties()
+    
+    # 设置子图背景色
+    ax.set_facecolor('#FFFFFF')
+    
+    # 团队分布带：分位区间为灰色色带，中位数为虚线，画在个人折线后面
+    if band is not None:
+        low, center, high = band
+        ax.fill_between(range(len(time_points)), low, high, color=COHORT_BAND_COLOR, alpha=0.25, linewidth=0,
+                        zorder=0.5)
+        ax.plot(range(len(time_points)), center, color=COHORT_BAND_COLOR, linewidth=1.2, linestyle='--',
+                alpha=0.8, zorder=0.6)
+    
+    # 绘制背景阴影 - 低透明度，提升层次感
+    ax.fill_between(range(len(time_points)), scores, alpha=0.1, color=item_color, zorder=1)
+    
+    # 绘制折线图
+    line, = ax.plot(range(len(time_points)), scores, linewidth=2, color=item_color, zorder=2, 
+                   marker='o', markersize=8, linestyle='-', alpha=0.9, 
+                   markerfacecolor=item_color, markeredgecolor='white', markeredgewidth=2)
+    
+    # 数据点光晕效果：整条折线的光晕合并为一个集合
+    x_positions = np.arange(len(time_points))
+    ax.scatter(x_positions, scores, s=150, color=item_color, alpha=0.2, zorder=3, edgecolor='none')
+        
+    # 得分标注：同一子图的标注由一个批量标注层绘制
+    LabelLayer(ax, x_positions, scores + 2, [f'{int(y)}' for y in scores],
+               ha='center', va='bottom', fontsize=10, fontweight='bold', 
+               color=item_color, zorder=5, bbox=dict(facecolor='white', alpha=0.7, 
+               edgecolor=item_color, boxstyle='round,pad=0.25', linewidth=1), 
+               fontproperties=font_props)
+        
+    # 说明标注：5字符换行，空说明不显示，固定在数据点下方
+    noted = np.flatnonzero([bool(note) for note in notes])
+    wrapped_notes = ['\n'.join([note[k:k+5] for k in range(0, len(note), 5)]) for note in notes[noted]]
+    LabelLayer(ax, x_positions[noted], scores[noted] - 2, wrapped_notes,
+               ha='center', va='top', 
+               fontsize=11, color='#555555', alpha=0.9, zorder=6, rotation=0, 
+               bbox=dict(facecolor='white', alpha=0.4, edgecolor=item_color, 
+                         boxstyle='round,pad=0.2', linewidth=1),
+               fontproperties=font_props)
+    
+    # 设置子图标题（题项名称）
+    ax.set_title(item, color=item_color, pad=15, fontproperties=fonts.properties(size=18, weight='bold'))
+    
+    # 设置Y轴范围（适配0-100分得分范围）
+    ax.set_ylim(0, 110)
+    
+    # 设置网格线 - 仅保留Y轴主要网格
+    ax.grid(True, which='major', axis='y', linestyle='--', alpha=0.2, color='#E0E0E0', zorder=0)
+    ax.grid(False, which='minor')
+    ax.minorticks_off()
+    
+    # 设置X轴刻度（仅第一行显示时间标签）
+    ax.xaxis.tick_top()
+    if show_time_labels:  # 第一行图显示时间标签
+        ax.set_xticks(range(len(time_points)))
+        ax.set_xticklabels(time_points, fontsize=8, color=item_color, fontweight='bold', 
+                          fontproperties=font_props, rotation=20)
+    else:
+        ax.set_xticks([])
+        ax.set_xticklabels([])
+    ax.xaxis.set_label_position('top')
+    
+    # 设置Y轴刻度
+    ax.set_yticks(range(0, 120, 20))
+    ax.set_yticklabels([f'{i}' for i in range(0, 120, 20)], fontsize=8, color='#555555', 
+                     fontproperties=font_props, fontweight='500', alpha=0.4)
+    
+    # 添加边框线
+    for spine in ax.spines.values():
+        spine.set_color('#E0E0E0')
+        spine.set_linewidth(1.5)
+    # 底部边框用题项专属色加粗
+    ax.spines['bottom'].set_color(item_color)
+    ax.spines['bottom'].set_linewidth(2)
+
+
+def build_chart_figure(data, items, time_points, item_colors, dpi=400, layout="engine", cohort_band=None):
+    """
+    构建轨迹图的 Figure（参数同 generate_chart），tight 模式下已完成 tight_layout
+    :return: 绑定了 Agg 画布的 Figure
+    """
+    # 字体每个进程只加载一次，并显式传给每个文本，不读写全局 rcParams
+    fonts = get_font_registry()
+
+    # 计算子图布局 - 双列布局，适合手机观看
+    n_items = len(items)
+    n_cols = 2
+    n_rows = (n_items + 1) // n_cols  # 自动计算行数适配题项数量
+
+    # 一次性取出所有题项×时间点的得分和说明
+    score_block, note_block = ScoreMatrix.coerce(data).block(items, time_points)
+
+    # 使用独立的 Figure + Agg 画布，不经过 pyplot 的全局状态，多个会话可同时渲染
+    with perf.stage('chart.setup', layout=layout):
+        if layout == "tight":
+            # 创建画布 - 紧凑布局，适配手机尺寸
+            fig = TimedFigure(figsize=(8, 3.5 * n_rows))
+            axes = fig.subplots(n_rows, n_cols, sharex=False, sharey=True, squeeze=False).flatten()  # 转为一维数组，方便索引
+            # 隐藏未使用的子图（当题项数量为奇数时）
+            for i in range(n_items, len(axes)):
+                axes[i].set_visible(False)
+        else:
+            # 子图位置和画布尺寸由排版结果确定，未使用的位置直接留白
+            chart_layout = ChartLayout(fonts, items, time_points, score_block, note_block, dpi)
+            fig = TimedFigure(figsize=chart_layout.figsize, dpi=dpi)
+            axes = [fig.add_axes(chart_layout.axes_rect(i)) for i in range(n_items)]
+        FigureCanvasAgg(fig)
+
+        # 设置整体风格
+        fig.patch.set_facecolor('#FFFFFF')  # 画布背景色纯白
+
+    # 绘制每个子图（适配动态题项）
+    with perf.stage('chart.artists'):
+        for i, item in enumerate(items):
+            # 获取当前题项的配置颜色，默认天蓝
+            draw_panel(axes[i], fonts, item, score_block[i], note_block[i], time_points,
+                       item_colors.get(item, '#4FC3F7'), show_time_labels=i < n_cols,
+                       band=None if cohort_band is None else cohort_band[:, i])
+            if layout != "tight":
+                axes[i].set_xlim(chart_layout.xlim)
+                # 与共享Y轴一致，只有第一列显示刻度值
+                axes[i].tick_params(labelleft=i % n_cols == 0)
+
+    if layout == "tight":
+        # 调整子图间距，提升紧凑性
+        with perf.stage('chart.tight_layout'):
+            fig.tight_layout()
+    return fig
+
+
+class TimedFigure(Figure):
+    """绘制时记录 chart.draw 阶段的 Figure，用于区分 savefig 中绘制（栅格化）和编码的耗时"""
+
+    def draw(self, renderer):
+        with perf.stage('chart.draw'):
+            super().draw(renderer)
+
+
+def plan_chart(data, items, time_points, output_format="png", dpi=400, max_bytes=None, over_budget="downgrade",
+               layout="engine", tiled=False):
+    """
+    渲染前估算图片尺寸和峰值内存，确定实际分辨率以及是否按条带渲染（参数同 generate_chart）
+    :param tiled: 按分块渲染（RenderPool.submit_tiled）估算，拼接的进程要同时持有全部分块
+    :return: RasterPlan；超出预算且 over_budget='refuse' 时抛出 RasterBudgetError
+    """
+    if layout == "tight":
+        # 旧排版的画布尺寸只能在绘制后确定，按裁边前的画布估算，不支持条带渲染
+        n_rows = (len(items) + 1) // 2
+        return plan_raster((8, 3.5 * n_rows), output_format, dpi, max_bytes, over_budget)
+    score_block, note_block = ScoreMatrix.coerce(data).block(items, time_points)
+    chart_layout = ChartLayout(get_font_registry(), items, time_points, score_block, note_block)
+    strip_height = max(chart_layout.row_heights, default=0) + chart_layout.OUTER_PAD + chart_layout.GAP / 2
+    return plan_raster(chart_layout.figsize, output_format, dpi, max_bytes, over_budget,
+                       strip_size=(chart_layout.figsize[0], strip_height), tiled=tiled)
+
+
+def generate_chart(data, items, time_points, item_colors, output_format="png", dpi=400, layout="engine",
+                   max_bytes=None, over_budget="downgrade", cohort_band=None):
+    """
+    从Streamlit会话状态获取动态数据生成可视化图表
+    :param data: ScoreMatrix，或格式为{题项: {时间点: {得分: float, 说明: str}}}的字典
+    :param items: 列表，动态配置的题项列表
+    :param time_points: 列表，动态配置的时间点列表（如['25年Q1', '25年Q2']）
+    :param item_colors: 字典，题项对应的颜色值（从配置模块获取）
+    :param output_format: 输出格式，png/jpg，或矢量格式 svg/pdf
+    :param dpi: 图片分辨率（矢量格式与分辨率无关，忽略此参数）
+    :param layout: engine 使用预先计算的确定性排版，只绘制一次；
+                   tight 使用 tight_layout + bbox_inches='tight'（旧实现，需多次绘制测量文本，供基准对比）
+    :param max_bytes: 渲染峰值内存上限（字节），默认 raster.RASTER_MAX_BYTES；
+                      整图超出时按行条带渲染并流式编码，仍超出时按 over_budget 处理
+    :param over_budget: downgrade 自动降低分辨率；refuse 抛出 RasterBudgetError
+    :param cohort_band: 可选的团队分布带，(3 × 题项 × 时间点) 数组（见 CohortStats.band），画在个人折线后面
+    :return: 生成的图片对象（供Streamlit下载）
+    """
+    if cohort_band is not None:
+        cohort_band = np.asarray(cohort_band, dtype=float)
+    with perf.stage('chart', format=output_format, dpi=dpi, items=len(items), time_points=len(time_points)):
+        if output_format.lower() in VECTOR_FORMATS:
+            return generate_vector_chart(data, items, time_points, item_colors, output_format, layout, cohort_band)
+
+        with perf.stage('chart.plan'):
+            plan = plan_chart(data, items, time_points, output_format, dpi, max_bytes, over_budget, layout)
+        if plan.strips:
+            with perf.stage('chart.tiled', dpi=plan.dpi):
+                return generate_chart_tiled(data, items, time_points, item_colors, output_format, plan.dpi,
+                                            cohort_band=cohort_band)
+
+        fig = build_chart_figure(data, items, time_points, item_colors, plan.dpi, layout, cohort_band)
+        
+        # 保存图片到Streamlit缓存（避免本地文件依赖）：绘制计入 chart.draw，其余为编码耗时
+        buf = io.BytesIO()
+        savefig_kwargs = dict(bbox_inches='tight') if layout == "tight" else {}
+        with perf.stage('chart.savefig'):
+            fig.savefig(buf, format='jpg' if output_format.lower() == "jpg" else 'png', dpi=plan.dpi,
+                        **savefig_kwargs)
+        buf.seek(0)
+        
+        return buf
+
+
+# 矢量输出（格式与元数据见 formats.VECTOR_FORMATS）
+def generate_vector_chart(data, items, time_points, item_colors, output_format="svg", layout="engine",
+                          cohort_band=None):
+    """
+    生成 SVG/PDF 矢量图：与分辨率无关，不需要栅格化整张画布，耗时和内存都远低于高 DPI 位图
+    :return: 生成的图片对象（供Streamlit下载）
+    """
+    output_format = output_format.lower()
+    fig = build_chart_figure(data, items, time_points, item_colors, None, layout, cohort_band)
+    buf = io.BytesIO()
+    savefig_kwargs = dict(bbox_inches='tight') if layout == "tight" else {}
+    with perf.stage('chart.savefig'):
+        fig.savefig(buf, format=output_format, metadata=VECTOR_FORMATS[output_format], **savefig_kwargs)
+    buf.seek(0)
+    return buf
+
+
+# 分块渲染：每个题项的子图按排版结果单独渲染，再用 NumPy 拼接成整张图
+def render_panel(item, scores, notes, time_points, item_color, dpi, show_time_labels, show_value_labels,
+                 tile_size, axes_rect, xlim, band=None):
+    """
+    单独渲染一个题项的子图（可在工作进程中执行）
+    :param show_value_labels: 是否显示Y轴刻度值（与共享Y轴的整图一致，只有第一列显示）
+    :param tile_size: 分块的（宽, 高），英寸
+    :param axes_rect: 坐标轴在分块中的比例坐标
+    :param xlim: 横轴范围
+    :param band: 可选的团队分布带（见 draw_panel）
+    :return: (高, 宽, 3) 的 RGB 像素数组
+    """
+    tile = _draw_tile(item, scores, notes, time_points, item_color, dpi, show_time_labels, show_value_labels,
+                      tile_size, axes_rect, xlim, band)
+    # 文本对象缓存了渲染器，Figure 与它们互相引用，要等垃圾回收才会释放 RGBA 缓冲区；
+    # 逐个渲染大图的子图时立即回收，避免缓冲区在两次自动回收之间不断累积
+    gc.collect()
+    return tile
+
+
+def _draw_tile(item, scores, notes, time_points, item_color, dpi, show_time_labels, show_value_labels,
+               tile_size, axes_rect, xlim, band=None):
+    fig = Figure(figsize=tile_size, dpi=dpi, facecolor='#FFFFFF')
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes(axes_rect)
+    draw_panel(ax, get_font_registry(), item, scores, notes, time_points, item_color, show_time_labels, band)
+    ax.set_xlim(xlim)
+    ax.tick_params(labelleft=show_value_labels)
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba())[:, :, :3].copy()
+
+
+def panel_tasks(data, items, time_points, item_colors, dpi, cohort_band=None):
+    """排版后为每个题项整理 render_panel 的参数（cohort_band 见 generate_chart）"""
+    score_block, note_block = ScoreMatrix.coerce(data).block(items, time_points)
+    chart_layout = ChartLayout(get_font_registry(), items, time_points, score_block, note_block, dpi)
+    n_cols = chart_layout.N_COLS
+    tasks = []
+    for i, item in enumerate(items):
+        bounds = chart_layout.tile_bounds(i)
+        tasks.append((item, score_block[i], note_block[i], list(time_points), item_colors.get(item, '#4FC3F7'),
+                      dpi, i < n_cols, i % n_cols == 0, bounds[2:], chart_layout.axes_rect(i, bounds),
+                      chart_layout.xlim, None if cohort_band is None else cohort_band[:, i]))
+    return tasks
+
+
+def tile_rows(tiles, n_cols=2):
+    """把依次产出的子图分块按行分组（惰性，不会提前取出后面的分块）"""
+    row = []
+    for tile in tiles:
+        row.append(tile)
+        del tile
+        if len(row) == n_cols:
+            yield row
+            row = []
+    if row:
+        yield row
+
+
+def tile_strips(rows, width):
+    """
+    把每行分块拼成整宽的像素条带：同一行的分块等高、同一列的分块等宽，
+    题项数为奇数时最后一行的空位留白
+    """
+    for row in rows:
+        strip = np.full((row[0].shape[0], width, 3), 255, dtype=np.uint8)
+        left = 0
+        for tile in row:
+            tile = tile[:strip.shape[0], :width - left]
+            strip[:tile.shape[0], left:left + tile.shape[1]] = tile
+            left += tile.shape[1]
+        del tile
+        yield strip
+        # 释放引用，渲染下一行时不再保留上一行的分块和条带
+        del strip, row
+
+
+def encode_strips(strips, width, height, output_format, dpi):
+    """
+    把逐条产出的像素条带编码为图片：PNG 边渲染边流式写入，
+    JPEG 需要整张图：条带逐条复制进预先分配的缓冲区，不保留条带本身，也不再拼接出第二份整图
+    """
+    buf = io.BytesIO()
+    if output_format.lower() == 'jpg':
+        from PIL import Image
+        
+        # RGBX 每像素 4 字节，PIL 可直接引用这块内存；RGB 数组会被 PIL 再复制一份
+        pixels = np.empty((height, width, 4), dtype=np.uint8)
+        top = 0
+        for strip in strips:
+            pixels[top:top + strip.shape[0], :, :3] = strip
+            top += strip.shape[0]
+            del strip
+        if top != height:
+            raise ValueError(f"只写入了 {top}/{height} 行像素")
+        image = Image.frombuffer('RGBX', (width, height), pixels, 'raw', 'RGBX', 0, 1)
+        image.save(buf, format='JPEG', dpi=(dpi, dpi))
+    else:
+        writer = PngStreamWriter(buf, width, height, dpi)
+        for strip in strips:
+            writer.write_rows(strip)
+            del strip
+        writer.close()
+    buf.seek(0)
+    return buf
+
+
+def assemble_chart(tiles, output_format, dpi, n_cols=2):
+    """拼接已渲染好的子图并编码为最终图片"""
+    width = sum(tile.shape[1] for tile in tiles[:n_cols])
+    height = sum(tiles[k].shape[0] for k in range(0, len(tiles), n_cols))
+    return encode_strips(tile_strips(tile_rows(tiles, n_cols), width), width, height, output_format, dpi)
+
+
+def generate_chart_tiled(data, items, time_points, item_colors, output_format="png", dpi=400, map_func=map,
+                         cohort_band=None):
+    """
+    分块渲染：各题项的子图独立渲染后按行拼接并流式编码，布局与 generate_chart 相同，适合题项很多的大图
+    默认的 map 逐个渲染子图，同一时刻只保留一行分块；传入进程池的 executor.map 即可多核并行
+    """
+    tasks = panel_tasks(data, items, time_points, item_colors, dpi,
+                        None if cohort_band is None else np.asarray(cohort_band, dtype=float))
+    n_cols = 2
+    # 分块尺寸已取整到整像素
+    width = sum(int(round(task[8][0] * dpi)) for task in tasks[:n_cols])
+    height = sum(int(round(tasks[k][8][1] * dpi)) for k in range(0, len(tasks), n_cols))
+    tiles = map_func(render_panel, *zip(*tasks))
+    return encode_strips(tile_strips(tile_rows(tiles, n_cols), width), width, height, output_format, dpi)
+
+
+def render_chart_bytes(data, items, time_points, item_colors, output_format="png", dpi=400, max_bytes=None,
+                       over_budget="downgrade", cohort_band=None):
+    """渲染任务的进程入口：返回编码后的图片字节，便于在进程间传递"""
+    return generate_chart(data, items, time_points, item_colors, output_format, dpi,
+                          max_bytes=max_bytes, over_budget=over_budget, cohort_band=cohort_band).getvalue()
@@ -0,0 +1,160 @@
+"""
+会话持久化：把会话的配置和得分保存到本地 SQLite 文件，按会话令牌恢复，
+刷新页面或服务重启后数据不丢失；不依赖外部服务
+"""
+import copy
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from .store import ScoreMatrix
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    token TEXT PRIMARY KEY,
+    config TEXT NOT NULL DEFAULT '{}',
+    items TEXT NOT NULL DEFAULT '[]',
+    time_points TEXT NOT NULL DEFAULT '[]',
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cells (
+    token TEXT NOT NULL,
+    item TEXT NOT NULL,
+    time_point TEXT NOT NULL,
+    score REAL,
+    note TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (token, item, time_point)
+) WITHOUT ROWID;
+"""
+
+
+class SessionStore:
+    """
+    SQLite 会话存储，进程内所有会话共享一个连接，写入加锁串行执行
+    每个会话一行配置（JSON）和得分矩阵的行列顺序，得分和说明按单元格存储，便于只写入改动的部分
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL 模式下写入不阻塞读取，多个服务进程可共用同一个文件
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def load(self, token):
+        """
+        读取会话的配置和得分
+        :return: (配置字典, ScoreMatrix)；会话不存在时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT config, items, time_points FROM sessions WHERE token = ?", (token,)
+            ).fetchone()
+            if row is None:
+                return None
+            cells = self._conn.execute(
+                "SELECT item, time_point, score, note FROM cells WHERE token = ?", (token,)
+            ).fetchall()
+        config, items, time_points = (json.loads(value) for value in row)
+        matrix = ScoreMatrix(items, time_points)
+        for item, tp, score, note in cells:
+            if item in matrix.item_index and tp in matrix.tp_index:
+                matrix.set_score(item, tp, np.nan if score is None else score)
+                matrix.set_note(item, tp, note)
+        return config, matrix
+
+    def write(self, token, config=None, items=None, time_points=None, cells=(), deleted_items=(),
+              deleted_time_points=()):
+        """
+        在一个事务内写入一批改动
+        :param config: 新的配置字典，None 表示不变
+        :param items: 得分矩阵的题项顺序，None 表示不变（time_points 同理）
+        :param cells: (题项, 时间点, 得分, 说明) 的序列，得分为 NaN 时存为 NULL
+        :param deleted_items: 需要删除全部单元格的题项（deleted_time_points 同理）
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sessions (token, updated_at) VALUES (?, ?) "
+                "ON CONFLICT (token) DO UPDATE SET updated_at = excluded.updated_at",
+                (token, time.time())
+            )
+            for column, value in (('config', config), ('items', items), ('time_points', time_points)):
+                if value is not None:
+                    self._conn.execute(f"UPDATE sessions SET {column} = ? WHERE token = ?",
+                                       (json.dumps(value, ensure_ascii=False), token))
+            self._conn.executemany("DELETE FROM cells WHERE token = ? AND item = ?",
+                                   [(token, item) for item in deleted_items])
+            self._conn.executemany("DELETE FROM cells WHERE token = ? AND time_point = ?",
+                                   [(token, tp) for tp in deleted_time_points])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cells (token, item, time_point, score, note) VALUES (?, ?, ?, ?, ?)",
+                [(token, item, tp, None if np.isnan(score) else float(score), note)
+                 for item, tp, score, note in cells]
+            )
+
+    def purge(self, max_age):
+        """删除超过 max_age 秒未更新的会话，返回删除的会话数"""
+        cutoff = time.time() - max_age
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM cells WHERE token IN (SELECT token FROM sessions WHERE updated_at < ?)", (cutoff,)
+            )
+            return self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SessionWriter:
+    """
+    单个会话的延迟写入：编辑只修改内存中的得分矩阵，flush 时与上次写入的快照对比，
+    把改动的单元格、删除的行列和变化的配置合并为一个事务写入；
+    距上次写入不足 interval 秒时跳过，频繁的编辑合并为一次写入
+    """
+
+    def __init__(self, store, token, snapshot=None, config=None, interval=2.0):
+        """
+        :param snapshot: 存储中已有的得分矩阵（从存储恢复的会话），None 表示存储中还没有数据
+        :param config: 存储中已有的配置
+        """
+        self.store = store
+        self.token = token
+        self.interval = interval
+        self._snapshot = snapshot.copy() if snapshot is not None else ScoreMatrix()
+        self._config = copy.deepcopy(config)
+        self._last_flush = float('-inf')
+
+    def flush(self, matrix, config, force=False):
+        """
+        写入自上次 flush 以来的改动
+        :return: 写入的单元格数；未到写入间隔时返回 None
+        """
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.interval:
+            return None
+        self._last_flush = now
+        old = self._snapshot
+
+        old_scores, old_notes = old.block(matrix.items, matrix.time_points, default_score=np.nan)
+        same_score = (matrix.scores == old_scores) | (np.isnan(matrix.scores) & np.isnan(old_scores))
+        r, c = np.nonzero(~same_score | (matrix.notes != old_notes))
+        cells = [(matrix.items[i], matrix.time_points[j], matrix.scores[i, j], matrix.notes[i, j])
+                 for i, j in zip(r, c)]
+        deleted_items = [item for item in old.items if item not in matrix.item_index]
+        deleted_time_points = [tp for tp in old.time_points if tp not in matrix.tp_index]
+        items = list(matrix.items) if matrix.items != old.items else None
+        time_points = list(matrix.time_points) if matrix.time_points != old.time_points else None
+        config = config if config != self._config else None
+
+        if cells or deleted_items or deleted_time_points or items is not None or time_points is not None \
+                or config is not None:
+            self.store.write(self.token, config, items, time_points, cells, deleted_items, deleted_time_points)
+            self._snapshot = matrix.copy()
+            if config is not None:
+                self._config = copy.deepcopy(config)
+        return len(cells)
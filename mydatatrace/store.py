@@ -0,0 +1,200 @@
+"""得分存储：以 (题项 × 时间点) 数组保存得分和说明"""
+import numpy as np
+
+
+class ScoreMatrix:
+    """
+    紧凑的得分存储，替代 {题项: {时间点: {'得分', '说明'}}} 嵌套字典
+    得分为 (题项 × 时间点) 的浮点数组，说明为同形状的对象数组，未录入的单元格得分为 NaN
+    """
+
+    def __init__(self, items=(), time_points=()):
+        self.items = list(dict.fromkeys(items))
+        self.time_points = list(dict.fromkeys(time_points))
+        self._reindex()
+        self.scores = np.full((len(self.items), len(self.time_points)), np.nan)
+        self.notes = np.full((len(self.items), len(self.time_points)), '', dtype=object)
+
+    def _reindex(self):
+        """重建 题项→行、时间点→列 的索引"""
+        self.item_index = {item: i for i, item in enumerate(self.items)}
+        self.tp_index = {tp: j for j, tp in enumerate(self.time_points)}
+
+    def __contains__(self, item):
+        return item in self.item_index
+
+    def __len__(self):
+        return len(self.items)
+
+    # 与旧版嵌套字典之间的适配
+    @classmethod
+    def from_dict(cls, data):
+        """从嵌套字典构建"""
+        time_points = dict.fromkeys(tp for cells in data.values() for tp in cells)
+        matrix = cls(data.keys(), time_points)
+        for item, cells in data.items():
+            i = matrix.item_index[item]
+            for tp, cell in cells.items():
+                j = matrix.tp_index[tp]
+                matrix.scores[i, j] = cell.get('得分', np.nan)
+                matrix.notes[i, j] = cell.get('说明', '')
+        return matrix
+
+    @classmethod
+    def from_arrays(cls, items, time_points, scores, notes):
+        """直接从 (题项 × 时间点) 的得分数组和说明数组构建（不复制传入的数组，也不预先分配空数组）"""
+        matrix = cls()
+        matrix.items = list(dict.fromkeys(items))
+        matrix.time_points = list(dict.fromkeys(time_points))
+        matrix._reindex()
+        shape = (len(matrix.items), len(matrix.time_points))
+        matrix.scores = np.asarray(scores, dtype=float).reshape(shape)
+        matrix.notes = np.asarray(notes, dtype=object).reshape(shape)
+        return matrix
+
+    @classmethod
+    def from_rows(cls, items, labels, scores, notes):
+        """
+        从按行（时间点）排列的导入数据构建，scores/notes 形状为 (题项 × 行)
+        同一时间点出现多次时，与逐行覆盖的结果一致：保持首次出现的顺序，取最后一行的数值
+        没有重复的时间点时直接使用传入的数组，不再复制
+        """
+        last_row = dict(zip(labels, range(len(labels))))
+        if len(last_row) == len(labels):
+            return cls.from_arrays(items, labels, scores, notes)
+        rows = np.fromiter(last_row.values(), dtype=np.intp, count=len(last_row))
+        return cls.from_arrays(items, list(last_row), scores[:, rows], notes[:, rows])
+
+    def copy(self):
+        """深拷贝，之后对任一方的修改互不影响"""
+        return ScoreMatrix.from_arrays(self.items, self.time_points, self.scores.copy(), self.notes.copy())
+
+    @staticmethod
+    def coerce(data):
+        """接受嵌套字典或 ScoreMatrix，统一返回 ScoreMatrix"""
+        if isinstance(data, dict):
+            return ScoreMatrix.from_dict(data)
+        return data
+
+    def to_dict(self):
+        """导出为嵌套字典（跳过未录入的单元格）"""
+        data = {}
+        for i, item in enumerate(self.items):
+            filled = ~np.isnan(self.scores[i])
+            data[item] = {
+                self.time_points[j]: {'得分': float(self.scores[i, j]), '说明': self.notes[i, j]}
+                for j in np.flatnonzero(filled)
+            }
+        return data
+
+    # 行操作：题项的增删改
+    def add_item(self, item):
+        """在末尾添加一行空数据"""
+        if item in self.item_index:
+            return
+        self.item_index[item] = len(self.items)
+        self.items.append(item)
+        self.scores = np.vstack([self.scores, np.full((1, len(self.time_points)), np.nan)])
+        self.notes = np.vstack([self.notes, np.full((1, len(self.time_points)), '', dtype=object)])
+
+    def delete_item(self, item):
+        """删除题项所在的行"""
+        if item not in self.item_index:
+            return
+        row = self.item_index[item]
+        del self.items[row]
+        self.scores = np.delete(self.scores, row, axis=0)
+        self.notes = np.delete(self.notes, row, axis=0)
+        self._reindex()
+
+    def rename_item(self, old_name, new_name):
+        """重命名题项，若新名称已存在则覆盖其数据（与字典键替换的行为一致）"""
+        if old_name not in self.item_index or old_name == new_name:
+            return
+        self.delete_item(new_name)
+        self.items[self.item_index[old_name]] = new_name
+        self._reindex()
+
+    # 列操作：时间点
+    def add_time_points(self, time_points):
+        """追加尚不存在的时间点列"""
+        new_points = [tp for tp in dict.fromkeys(time_points) if tp not in self.tp_index]
+        if not new_points:
+            return
+        for tp in new_points:
+            self.tp_index[tp] = len(self.time_points)
+            self.time_points.append(tp)
+        n_rows = len(self.items)
+        self.scores = np.hstack([self.scores, np.full((n_rows, len(new_points)), np.nan)])
+        self.notes = np.hstack([self.notes, np.full((n_rows, len(new_points)), '', dtype=object)])
+
+    def delete_time_points(self, time_points):
+        """删除时间点所在的列"""
+        cols = [self.tp_index[tp] for tp in dict.fromkeys(time_points) if tp in self.tp_index]
+        if not cols:
+            return
+        removed = set(cols)
+        self.time_points = [tp for j, tp in enumerate(self.time_points) if j not in removed]
+        self.scores = np.delete(self.scores, cols, axis=1)
+        self.notes = np.delete(self.notes, cols, axis=1)
+        self._reindex()
+
+    def fill_missing(self, items, time_points, score):
+        """将指定区域内未录入的得分填为默认值"""
+        rows = [self.item_index[item] for item in items if item in self.item_index]
+        cols = [self.tp_index[tp] for tp in time_points if tp in self.tp_index]
+        if not rows or not cols:
+            return
+        region = np.ix_(rows, cols)
+        block = self.scores[region]
+        self.scores[region] = np.where(np.isnan(block), score, block)
+
+    # 单元格读写
+    def get_score(self, item, tp):
+        return self.scores[self.item_index[item], self.tp_index[tp]]
+
+    def set_score(self, item, tp, score):
+        self.scores[self.item_index[item], self.tp_index[tp]] = score
+
+    def get_note(self, item, tp):
+        return self.notes[self.item_index[item], self.tp_index[tp]]
+
+    def set_note(self, item, tp, note):
+        self.notes[self.item_index[item], self.tp_index[tp]] = note
+
+    def block(self, items, time_points, default_score=0.0):
+        """
+        按给定顺序取出 (题项 × 时间点) 子矩阵
+        :return: (得分数组, 说明数组)，缺失的题项/时间点/单元格得分为 default_score，说明为空
+        """
+        rows = np.array([self.item_index.get(item, -1) for item in items], dtype=np.intp)
+        cols = np.array([self.tp_index.get(tp, -1) for tp in time_points], dtype=np.intp)
+        present = (rows >= 0)[:, None] & (cols >= 0)[None, :]
+        region = np.ix_(np.maximum(rows, 0), np.maximum(cols, 0))
+        scores = np.full(present.shape, default_score)
+        notes = np.full(present.shape, '', dtype=object)
+        if self.scores.size:
+            picked = self.scores[region]
+            filled = present & ~np.isnan(picked)
+            scores[filled] = picked[filled]
+            notes[present] = self.notes[region][present]
+        return scores, notes
+
+    def update_block(self, items, time_points, scores, notes, default_score=0.0):
+        """
+        把编辑后的 (题项 × 时间点) 子矩阵批量写回，只写入与 block() 取出的值不同的单元格，
+        未改动的未录入单元格仍保持 NaN；不存在的题项/时间点被忽略
+        :return: 写入的单元格数
+        """
+        current_scores, current_notes = self.block(items, time_points, default_score)
+        scores = np.asarray(scores, dtype=float)
+        notes = np.asarray(notes, dtype=object)
+        rows = np.array([self.item_index.get(item, -1) for item in items], dtype=np.intp)
+        cols = np.array([self.tp_index.get(tp, -1) for tp in time_points], dtype=np.intp)
+        changed = (scores != current_scores) | (notes != current_notes)
+        changed &= (rows >= 0)[:, None] & (cols >= 0)[None, :]
+        r, c = np.nonzero(changed)
+        # 改动的单元格得分和说明一起写入，只改说明时得分取编辑器中显示的值
+        self.scores[rows[r], cols[c]] = scores[r, c]
+        self.notes[rows[r], cols[c]] = notes[r, c]
+        return len(r)
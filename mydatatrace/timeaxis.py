@@ -0,0 +1,134 @@
+"""
+时间轴：由（开始日期, 结束日期, 时间粒度）确定的时间点标签、标签→下标索引和各时间点的起始日期数组，
+相同配置只生成一次；另外负责解析时间点标签、在不同粒度之间换算
+"""
+import functools
+import re
+from datetime import date, timedelta
+
+import numpy as np
+
+# 界面中可选的时间粒度（保持原有顺序，新粒度追加在后面）
+GRANULARITIES = ['季度', '月份', '年度', '半年度', '周']
+# 由粗到细；周不一定落在同一个月内，按 ISO 规则归入其周四所在的月份
+GRANULARITY_ORDER = ['年度', '半年度', '季度', '月份', '周']
+# 时间点标签的格式：年度 2025、半年度 2025H1、季度 2025Q1、月份 2025-01、周 2025-W01（ISO 周）
+GRANULARITY_PATTERNS = {
+    '年度': re.compile(r'(\d{4})'),
+    '半年度': re.compile(r'(\d{4})H([12])'),
+    '季度': re.compile(r'(\d{4})Q([1-4])'),
+    '月份': re.compile(r'(\d{4})-(\d{2})'),
+    '周': re.compile(r'(\d{4})-W(\d{2})'),
+}
+# 每个时间点包含的月数（周除外）
+PERIOD_MONTHS = {'年度': 12, '半年度': 6, '季度': 3, '月份': 1}
+
+
+def _month_label(granularity, year, month):
+    """起始月份为 year 年 month 月的时间点标签"""
+    if granularity == '年度':
+        return f"{year}"
+    if granularity == '半年度':
+        return f"{year}H{(month - 1) // 6 + 1}"
+    if granularity == '季度':
+        return f"{year}Q{(month - 1) // 3 + 1}"
+    return f"{year}-{month:02d}"
+
+
+def _week_label(day):
+    iso_year, week, _ = day.isocalendar()
+    return f"{iso_year}-W{week:02d}"
+
+
+class TimeAxis:
+    """
+    一条时间轴，创建后不再修改，可在会话之间共享
+    labels: 时间点标签（元组）；index: 标签→下标；starts: 各时间点起始日期（datetime64[D] 数组）；
+    years: 各时间点所属年份（周按 ISO 年）
+    """
+
+    def __init__(self, start_date, end_date, granularity):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.granularity = granularity
+        if granularity == '周':
+            # 从开始日期所在周的周一起，每 7 天一个时间点
+            first = start_date - timedelta(days=start_date.weekday())
+            last = end_date - timedelta(days=end_date.weekday())
+            self.starts = np.arange(np.datetime64(first), np.datetime64(last) + 1, 7, dtype='datetime64[D]')
+            mondays = self.starts.tolist()
+            self.labels = tuple(_week_label(day) for day in mondays)
+            self.years = np.array([(day + timedelta(days=3)).year for day in mondays], dtype=int)
+        elif granularity in PERIOD_MONTHS:
+            step = PERIOD_MONTHS[granularity]
+            # 月份序号 = 年 × 12 + 月 - 1，开始/结束月份对齐到所在时间段的第一个月
+            first = start_date.year * 12 + (start_date.month - 1) // step * step
+            last = end_date.year * 12 + (end_date.month - 1) // step * step
+            month_numbers = np.arange(first, last + 1, step) if last >= first else np.arange(0)
+            self.years, months = np.divmod(month_numbers, 12)
+            self.starts = (month_numbers - 1970 * 12).astype('datetime64[M]').astype('datetime64[D]')
+            self.labels = tuple(_month_label(granularity, int(year), int(month) + 1)
+                                for year, month in zip(self.years, months))
+        else:
+            raise ValueError(f"不支持的时间粒度: {granularity}")
+        self.index = {label: i for i, label in enumerate(self.labels)}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def __contains__(self, label):
+        return label in self.index
+
+    def positions(self, labels):
+        """标签在时间轴上的下标数组，不在时间轴上的标签为 -1"""
+        return np.array([self.index.get(label, -1) for label in labels], dtype=np.intp)
+
+
+@functools.lru_cache(maxsize=64)
+def _cached_axis(start_date, end_date, granularity):
+    return TimeAxis(start_date, end_date, granularity)
+
+
+def get_time_axis(start_date, end_date, granularity):
+    """按（开始日期, 结束日期, 粒度）缓存的时间轴；date 和 datetime 按日期部分共用缓存"""
+    return _cached_axis(date(start_date.year, start_date.month, start_date.day),
+                        date(end_date.year, end_date.month, end_date.day), granularity)
+
+
+def parse_time_point(tp):
+    """
+    解析时间点标签
+    :return: (粒度, 年, 月)：月为该时间段的第一个月，周取其周四所在的年、月；无法识别时返回 None
+    """
+    for granularity, pattern in GRANULARITY_PATTERNS.items():
+        match = pattern.fullmatch(tp)
+        if not match:
+            continue
+        year = int(match.group(1))
+        if granularity == '周':
+            try:
+                thursday = date.fromisocalendar(year, int(match.group(2)), 4)
+            except ValueError:
+                return None
+            return granularity, thursday.year, thursday.month
+        if granularity == '月份':
+            month = int(match.group(2))
+            return (granularity, year, month) if 1 <= month <= 12 else None
+        if granularity in ('半年度', '季度'):
+            return granularity, year, (int(match.group(2)) - 1) * PERIOD_MONTHS[granularity] + 1
+        return granularity, year, 1
+    return None
+
+
+def coarsen(tp, granularity):
+    """把时间点换算为更粗粒度（或相同粒度）的标签；tp 比目标粒度更粗或无法识别时返回 None"""
+    parsed = parse_time_point(tp)
+    if parsed is None or GRANULARITY_ORDER.index(parsed[0]) < GRANULARITY_ORDER.index(granularity):
+        return None
+    if granularity == '周':
+        return tp
+    _, year, month = parsed
+    return _month_label(granularity, year, month)
@@ -0,0 +1,44 @@
+"""状态版本：会话状态各部分（得分、题项、时间配置、样式）的修改计数，用于判断派生结果是否过期"""
+import itertools
+
+# 被跟踪的状态部分及其在界面上的名称
+SECTIONS = ('data', 'items', 'time', 'style')
+SECTION_LABELS = {'data': '得分和说明', 'items': '题项', 'time': '时间范围', 'style': '样式'}
+
+_uids = itertools.count(1)
+
+
+class StateVersions:
+    """
+    每个部分一个单调递增的版本号，修改对应状态时调用 bump()；
+    派生结果（图表、导出文件）记录生成时的 snapshot()，之后用 changed_since() 判断是否过期
+    """
+
+    def __init__(self):
+        # 进程内唯一的编号，不同会话的版本号可以安全地放进同一个缓存
+        self.uid = next(_uids)
+        self._versions = dict.fromkeys(SECTIONS, 0)
+
+    def __getitem__(self, section):
+        return self._versions[section]
+
+    def bump(self, *sections):
+        """标记这些部分已修改"""
+        for section in sections:
+            if section not in self._versions:
+                raise ValueError(f"未知的状态部分: {section}")
+            self._versions[section] += 1
+
+    def snapshot(self, sections=SECTIONS):
+        """当前各部分的版本号"""
+        return tuple(self._versions[section] for section in sections)
+
+    def changed_since(self, snapshot, sections=SECTIONS):
+        """与快照相比修改过的部分；快照为 None 时视为全部修改过"""
+        if snapshot is None:
+            return list(sections)
+        return [section for section, version in zip(sections, snapshot) if self._versions[section] != version]
+
+    def token(self, *sections):
+        """进程内唯一的版本标识，可代替对应状态的内容作为缓存键的一部分"""
+        return (self.uid, *self.snapshot(sections or SECTIONS))
@@ -0,0 +1,214 @@
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace.cache import RenderCache, chart_cache_key, export_cached, generate_chart_cached
+from mydatatrace.excel_io import data_to_excel
+from mydatatrace.render import FontRegistry, LabelLayer, generate_chart
+
+ITEMS = ['题项1', '题项2', '题项3']
+TIME_POINTS = ['2025Q1', '2025Q2', '2025Q3']
+DATA = {
+    item: {tp: {'得分': 20.0 * (i + j + 1), '说明': f'说明{i}{j}' if j else ''} for j, tp in enumerate(TIME_POINTS)}
+    for i, item in enumerate(ITEMS)
+}
+COLORS = {'题项1': '#FF6B6B', '题项2': '#4ECDC4', '题项3': '#45B7D1'}
+
+
+def test_render_cache_lru_budget():
+    """测试按字节预算的LRU淘汰和命中统计"""
+    cache = RenderCache(max_bytes=10)
+    cache.put('a', b'12345')
+    cache.put('b', b'12345')
+    assert cache.get('a') == b'12345'
+    cache.put('c', b'123')  # 超出预算，淘汰最久未使用的 b
+    assert cache.get('b') is None
+    assert cache.get('c') == b'123'
+    cache.put('huge', b'x' * 11)  # 单张超过预算的图片不缓存
+    assert cache.get('huge') is None
+    assert cache.stats() == {'hits': 2, 'misses': 2, 'entries': 2, 'bytes': 8}
+
+
+def test_chart_cache_key_tracks_inputs():
+    """测试缓存键随任一输入变化而变化"""
+    key = chart_cache_key(DATA, ITEMS, TIME_POINTS, COLORS, 'png', 100)
+    assert key == chart_cache_key(DATA, ITEMS, TIME_POINTS, dict(COLORS), 'png', 100)
+    assert key != chart_cache_key(DATA, ITEMS, TIME_POINTS, COLORS, 'jpg', 100)
+    assert key != chart_cache_key(DATA, ITEMS, TIME_POINTS, COLORS, 'png', 150)
+    assert key != chart_cache_key(DATA, ITEMS[:2], TIME_POINTS, COLORS, 'png', 100)
+    assert key != chart_cache_key(DATA, ITEMS, TIME_POINTS, {**COLORS, '题项1': '#000000'}, 'png', 100)
+    changed = {**DATA, '题项1': {**DATA['题项1'], '2025Q1': {'得分': 21.0, '说明': ''}}}
+    assert key != chart_cache_key(changed, ITEMS, TIME_POINTS, COLORS, 'png', 100)
+
+
+def test_generate_chart_cached_hits():
+    """测试相同输入第二次生成直接命中缓存"""
+    cache = RenderCache(max_bytes=50 * 1024 * 1024)
+    first = generate_chart_cached(cache, DATA, ITEMS, TIME_POINTS, COLORS, 'png', 60)
+    second = generate_chart_cached(cache, DATA, ITEMS, TIME_POINTS, COLORS, 'png', 60)
+    assert first.getvalue() == second.getvalue()
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_export_cached_rebuilds_only_on_change():
+    """测试导出文件内容未变时复用缓存，数据变化后重新生成"""
+    cache = RenderCache(max_bytes=10 * 1024 * 1024)
+    first = export_cached(cache, data_to_excel, 'xlsx', DATA, ITEMS, TIME_POINTS)
+    assert export_cached(cache, data_to_excel, 'xlsx', DATA, ITEMS, TIME_POINTS) == first
+    assert cache.stats()['hits'] == 1
+    changed = {**DATA, '题项1': {**DATA['题项1'], '2025Q1': {'得分': 21.0, '说明': ''}}}
+    assert export_cached(cache, data_to_excel, 'xlsx', changed, ITEMS, TIME_POINTS) != first
+    assert cache.stats()['misses'] == 2
+
+
+def test_font_registry_loads_once(monkeypatch):
+    """测试字体只注册一次，字体属性和字形宽度被缓存"""
+    import matplotlib
+    from matplotlib.font_manager import fontManager
+
+    font_path = os.path.join(matplotlib.get_data_path(), 'fonts', 'ttf', 'DejaVuSans.ttf')
+    calls = []
+    original_addfont = fontManager.addfont
+    monkeypatch.setattr(fontManager, 'addfont', lambda path: calls.append(path) or original_addfont(path))
+
+    registry = FontRegistry(font_path)
+    assert registry.properties() is registry.properties()
+    assert registry.properties(size=10).get_size_in_points() == 10
+    assert registry.families == ['DejaVu Sans']
+    assert calls == [font_path], f"字体应只注册一次: {calls}"
+
+    assert registry.text_width('ab', 10) == registry.text_width('a', 10) + registry.text_width('b', 10)
+    assert set(registry._advances) == {'a', 'b'}
+
+
+def test_font_registry_fallback():
+    """测试字体文件不存在时使用默认字体列表"""
+    registry = FontRegistry('/nonexistent/STKAITI.TTF')
+    assert registry.properties().get_family() == FontRegistry.FALLBACK_FAMILIES
+    assert registry.families == FontRegistry.FALLBACK_FAMILIES
+
+
+def test_label_layer_matches_individual_texts():
+    """测试批量标注层与逐个 ax.text 的绘制结果逐像素一致"""
+    import numpy as np
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    xs, ys, texts = [0, 1, 2], [10.0, 50.0, 90.0], ['a', 'bb\nbb', 'ccc']
+    style = dict(ha='center', va='top', fontsize=11, color='#555555', zorder=6,
+                 bbox=dict(facecolor='white', alpha=0.4, edgecolor='#FF6B6B', boxstyle='round,pad=0.2'))
+
+    def render(draw_labels):
+        fig, ax = plt.subplots(figsize=(3, 2))
+        ax.plot(xs, ys)
+        draw_labels(ax)
+        fig.tight_layout()
+        fig.canvas.draw()
+        image = np.asarray(fig.canvas.buffer_rgba()).copy()
+        plt.close(fig)
+        return image
+
+    expected = render(lambda ax: [ax.text(x, y, t, **style) for x, y, t in zip(xs, ys, texts)])
+    actual = render(lambda ax: LabelLayer(ax, xs, ys, texts, **style))
+    assert expected.shape == actual.shape
+    assert (expected == actual).all(), "批量标注层的绘制结果与逐个标注不一致"
+
+
+def test_concurrent_renders_match_serial():
+    """测试多线程同时渲染的结果与逐个渲染一致"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    jobs = []
+    for n in range(6):
+        data = {item: {tp: {'得分': float((n * 17 + i * 7 + j * 13) % 100), '说明': f'第{n}张' if j == n % 3 else ''}
+                       for j, tp in enumerate(TIME_POINTS)}
+                for i, item in enumerate(ITEMS)}
+        jobs.append((data, ITEMS[:2 + n % 2], TIME_POINTS, COLORS, 'jpg' if n % 2 else 'png', 60))
+
+    serial = [generate_chart(*job).getvalue() for job in jobs]
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        concurrent = [buf.getvalue() for buf in pool.map(lambda job: generate_chart(*job), jobs)]
+
+    assert len(set(serial)) == len(jobs), "测试数据应生成互不相同的图片"
+    for n, (expected, actual) in enumerate(zip(serial, concurrent)):
+        assert expected == actual, f"第{n}张图在并发渲染时与逐个渲染不一致"
+
+
+def test_tile_strips():
+    """测试子图按行拼成整宽条带：行高、列宽取各分块的尺寸，空位留白"""
+    import numpy as np
+    from mydatatrace.render import tile_rows, tile_strips
+
+    tiles = [np.full(shape, value, dtype=np.uint8) for shape, value in
+             [((3, 2, 3), 10), ((3, 4, 3), 20), ((2, 2, 3), 30)]]
+    strips = list(tile_strips(tile_rows(iter(tiles), 2), width=6))
+    assert [strip.shape for strip in strips] == [(3, 6, 3), (2, 6, 3)]
+    assert strips[0][0, 0, 0] == 10 and strips[0][0, 2, 0] == 20 and strips[1][0, 0, 0] == 30
+    assert (strips[1][:, 2:] == 255).all()
+
+
+def test_layout_engine_fits_content():
+    """测试确定性排版为超长题项名、说明和时间标签留出空间，所有内容都在画布内"""
+    import numpy as np
+    from mydatatrace.render import build_chart_figure
+    from mydatatrace.store import ScoreMatrix
+
+    items = ['A', '一个很长很长很长很长的题项名称', 'C']
+    time_points = ['2025年第一季度', '2025Q2', '2025年第三季度']
+    scores = np.array([[0, 100, 0], [100, 0, 100], [50, 2, 0]], dtype=float)
+    notes = np.array([['很长的说明文字' * 3, '', '尾'], ['', '说明', '说明' * 8], ['', '', '']], dtype=object)
+    data = ScoreMatrix.from_arrays(items, time_points, scores, notes)
+
+    fig = build_chart_figure(data, items, time_points, COLORS, dpi=50)
+    content = fig.get_tightbbox(fig.canvas.get_renderer())
+    width, height = fig.get_size_inches()
+    assert content.x0 >= 0 and content.y0 >= 0, content
+    assert content.x1 <= width and content.y1 <= height, (content, width, height)
+
+    # 单个题项不保留空的第二列
+    single = build_chart_figure(DATA, ITEMS[:1], TIME_POINTS, COLORS, dpi=50)
+    assert single.get_size_inches()[0] < 5
+
+
+def test_tiled_render_parallel_matches_full_chart():
+    """测试分块渲染在进程池中并行、逐个渲染都与整图渲染逐像素一致"""
+    import io
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    import numpy as np
+    from PIL import Image
+    from mydatatrace.render import generate_chart_tiled
+
+    def pixels(buf):
+        return np.asarray(Image.open(io.BytesIO(buf)).convert('RGB'))
+
+    expected = pixels(generate_chart(DATA, ITEMS, TIME_POINTS, COLORS, 'png', 50).getvalue())
+    serial = generate_chart_tiled(DATA, ITEMS, TIME_POINTS, COLORS, 'png', 50).getvalue()
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('spawn')) as pool:
+        parallel = generate_chart_tiled(DATA, ITEMS, TIME_POINTS, COLORS, 'png', 50, map_func=pool.map).getvalue()
+    assert serial == parallel
+    assert expected.shape == pixels(serial).shape
+    assert (expected == pixels(serial)).all(), "分块拼接的图片与整图渲染不一致"
+
+
+def test_vector_output_embeds_glyph_subset():
+    """测试 SVG/PDF 矢量输出：文字转为字形，只嵌入用到的字形，相同输入生成相同文件"""
+    import re
+
+    pdf = generate_chart(DATA, ITEMS, TIME_POINTS, COLORS, 'pdf').getvalue()
+    assert pdf.startswith(b'%PDF')
+    assert pdf == generate_chart(DATA, ITEMS, TIME_POINTS, COLORS, 'pdf').getvalue(), "PDF 输出应可复现"
+    # 嵌入的是带子集前缀的字体，编码表只列出图中出现的字符
+    assert re.search(rb'/FontName /[A-Z]{6}\+', pdf), "字体应以子集形式嵌入"
+    used_chars = set(''.join(ITEMS + TIME_POINTS) + '0123456789' + ''.join(
+        cell['说明'] for item in DATA.values() for cell in item.values()))
+    for differences in re.findall(rb'/Differences \[(.*?)\]', pdf, re.S):
+        glyphs = re.findall(rb'/(\S+)', differences)
+        assert 0 < len(glyphs) <= len(used_chars), f"嵌入了 {len(glyphs)} 个字形"
+
+    svg = generate_chart(DATA, ITEMS, TIME_POINTS, COLORS, 'svg').getvalue()
+    assert svg.lstrip().startswith(b'<?xml') and b'<svg' in svg
+    assert b'<image' not in svg, "矢量图不应包含位图"
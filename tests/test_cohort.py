@@ -0,0 +1,147 @@
+import sys
+import os
+import io
+import logging
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace.cache import chart_cache_key
+from mydatatrace.cohort import Cohort
+from mydatatrace.excel_io import excel_to_cohort, excel_to_data
+from mydatatrace.render import generate_chart
+from mydatatrace.store import ScoreMatrix
+
+ITEMS = ['题项1', '题项2']
+TIME_POINTS = ['2025Q1', '2025Q2']
+
+
+def workbook(sheets):
+    """把 {表名: DataFrame} 写成 Excel 文件"""
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    buf.seek(0)
+    return buf
+
+
+def test_cohort_import_sheets_and_long_format():
+    """测试每人一个工作表和带成员列的长表导入结果一致，未填写的单元格为 NaN"""
+    sheets = {
+        '小明': pd.DataFrame({'时间点': TIME_POINTS, '题项1 - 得分': [10, 20], '题项1 - 说明': ['a', None]}),
+        '小红': pd.DataFrame({'时间点': ['2025Q2'], '题项1 - 得分': [40], '题项2 - 得分': [50]}),
+    }
+    cohort, error = excel_to_cohort(workbook(sheets))
+    assert error is None, error
+    assert cohort.members == ['小明', '小红'] and cohort.items == ITEMS and cohort.time_points == TIME_POINTS
+    assert cohort.scores.shape == (2, 2, 2)
+    assert np.isnan(cohort.scores[0, 1]).all() and np.isnan(cohort.scores[1, 0, 0])
+    assert cohort.notes[0, 0, 0] == 'a'
+
+    long = pd.concat([df.assign(成员=name) for name, df in sheets.items()])
+    same, error = excel_to_cohort(workbook({'团队': long}))
+    assert error is None, error
+    np.testing.assert_array_equal(same.scores, cohort.scores)
+
+    member = cohort.member('小红')
+    assert member.time_points == ['2025Q2'] and member.get_score('题项2', '2025Q2') == 50.0
+
+    _, error = excel_to_cohort(workbook({'说明': pd.DataFrame({'备注': ['无']})}))
+    assert error == "Excel文件缺少'时间点'列"
+
+
+def test_member_matches_single_import_and_last_duplicate_wins():
+    """测试成员数据与单人导入同一工作表的结果一致（未填写的得分默认值相同）；重复的成员、时间点取最后一行"""
+    sheet = pd.DataFrame({'时间点': TIME_POINTS, '题项1 - 得分': [10, None], '题项2 - 得分': [None, 40],
+                          '题项2 - 说明': ['b', None]})
+    expected, _, error = excel_to_data(workbook({'Sheet1': sheet}))
+    assert error is None, error
+    cohort, error = excel_to_cohort(workbook({'小明': sheet}))
+    assert error is None, error
+    assert cohort.member('小明').to_dict() == expected.to_dict()
+    assert np.isnan(cohort.scores[0, 0, 1]), "统计时未填写的单元格仍按缺失处理"
+
+    rows = ['小明', '小红', '小明', '小明']
+    labels = ['2025Q1', '2025Q1', '2025Q2', '2025Q1']
+    scores = np.array([[10.0, 1.0], [20.0, 2.0], [30.0, 3.0], [50.0, 5.0]])
+    notes = np.array([['旧', ''], ['', ''], ['', ''], ['新', '']], dtype=object)
+    cohort = Cohort.from_rows(rows, labels, ITEMS, scores, notes)
+    assert cohort.members == ['小明', '小红'] and cohort.time_points == TIME_POINTS
+    assert cohort.scores[0, :, 0].tolist() == [50.0, 5.0] and cohort.notes[0, 0, 0] == '新'
+    assert cohort.scores[0, :, 1].tolist() == [30.0, 3.0]
+    assert cohort.scores[1, :, 0].tolist() == [20.0, 2.0] and np.isnan(cohort.scores[1, :, 1]).all()
+
+
+def test_cohort_stats_match_per_cell_numpy():
+    """测试向量化统计与逐单元格计算一致，分布带按给定的题项、时间点对齐"""
+    rng = np.random.default_rng(0)
+    scores = rng.uniform(0, 100, (200, 12, 16))
+    scores[rng.random(scores.shape) < 0.1] = np.nan
+    scores[:, 0, 0] = np.nan  # 没有人填写的单元格
+    items = [f"题项{i + 1}" for i in range(12)]
+    time_points = [f"{2022 + j // 4}Q{j % 4 + 1}" for j in range(16)]
+    stats = Cohort([f"成员{k}" for k in range(200)], items, time_points, scores).stats()
+
+    cell = scores[:, 3, 5]
+    cell = cell[~np.isnan(cell)]
+    assert stats.count[3, 5] == len(cell)
+    assert np.isclose(stats.mean[3, 5], cell.mean()) and np.isclose(stats.median[3, 5], np.median(cell))
+    assert np.isclose(stats.percentiles[75][3, 5], np.percentile(cell, 75))
+    assert stats.count[0, 0] == 0 and np.isnan(stats.mean[0, 0])
+
+    band = stats.band(['题项4', '新题项'], [time_points[5], '2030Q1'])
+    assert band.shape == (3, 2, 2)
+    assert np.isclose(band[1, 0, 0], np.median(cell))
+    assert np.isnan(band[:, 1]).all() and np.isnan(band[:, :, 1]).all()
+
+    matrices = {'甲': ScoreMatrix.from_arrays(items[:1], time_points[:1], [[30.0]], [['']]),
+                '乙': ScoreMatrix.from_arrays(items[:1], time_points[:2], [[50.0, 60.0]], [['', '']])}
+    pair = Cohort.from_matrices(matrices).stats()
+    assert pair.mean.tolist() == [[40.0, 60.0]]
+
+
+def test_chart_with_cohort_band():
+    """测试图表可在个人折线后绘制团队分布带，分布带计入缓存键"""
+    warnings.simplefilter('ignore')
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+    data = ScoreMatrix.from_arrays(ITEMS, TIME_POINTS, [[50.0, 60.0], [70.0, 80.0]], [['', ''], ['', '']])
+    colors = {'题项1': '#FF0000', '题项2': '#00FF00'}
+    band = np.array([[[20.0, 30.0], [40.0, np.nan]], [[40.0, 50.0], [60.0, np.nan]], [[60.0, 70.0], [80.0, np.nan]]])
+
+    plain = generate_chart(data, ITEMS, TIME_POINTS, colors, 'png', 60).getvalue()
+    banded = generate_chart(data, ITEMS, TIME_POINTS, colors, 'png', 60, cohort_band=band).getvalue()
+    assert banded != plain
+    assert generate_chart(data, ITEMS, TIME_POINTS, colors, 'svg', cohort_band=band).getvalue().startswith(b'<?xml')
+
+    key = chart_cache_key(data, ITEMS, TIME_POINTS, colors, 'png', 60)
+    assert key == chart_cache_key(data, ITEMS, TIME_POINTS, colors, 'png', 60, None)
+    assert key != chart_cache_key(data, ITEMS, TIME_POINTS, colors, 'png', 60, band)
+
+
+def test_app_loads_member_and_toggles_band():
+    """测试载入成员数据后录入组件显示该成员的得分，切换分布带会使图表过期"""
+    from streamlit.testing.v1 import AppTest
+
+    app_path = os.path.join(os.path.dirname(__file__), '..', 'app.py')
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.session_state['config_items'] = ITEMS
+    at.run()
+    cohort = Cohort(['甲', '乙'], ITEMS, TIME_POINTS, [[[10.0, 20.0], [30.0, 40.0]], [[50.0, 60.0], [70.0, 80.0]]])
+    at.session_state['cohort'] = cohort
+    at.session_state['cohort_stats'] = cohort.stats()
+    at.run()
+
+    at.selectbox(key='cohort_member').select('乙').run()
+    at.button(key='load_cohort_member').click().run()
+    assert not at.exception, at.exception
+    assert at.session_state['data'].get_score('题项1', '2025Q2') == 60.0, "旧的录入组件不应覆盖载入的得分"
+    assert at.number_input(key='题项1_2025Q2_input').value == 60.0
+
+    style_version = at.session_state['state_versions']['style']
+    at.checkbox(key='show_cohort_band').check().run()
+    assert at.session_state['state_versions']['style'] == style_version + 1
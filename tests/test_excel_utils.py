@@ -4,6 +4,7 @@ import pandas as pd
 import io
 import sys
 import os
+import types
 from datetime import datetime
 
 # Add project root to Python path
@@ -151,5 +152,151 @@ class TestExcelUtils(unittest.TestCase):
                 self.assertEqual(original['得分'], new['得分'])
                 self.assertEqual(original['说明'], new['说明'])
 
+    def test_app_excel_to_data_matches_reference(self):
+        from mydatatrace import excel_io
+
+        # 包含空值和重复时间点的表格：重复时间点以最后一行为准
+        df = pd.DataFrame({
+            '时间点': ['2023Q1', '2023Q2', '2023Q1'],
+            'A - 得分': [80.0, None, 90.0],
+            'A - 说明': ['Good', None, 'Best'],
+            'B - 得分': [60.0, 65.0, 70.0],
+        })
+        output = io.BytesIO()
+        df.to_excel(output, index=False)
+
+        output.seek(0)
+        expected, _ = excel_to_data(output, self.items)
+        output.seek(0)
+        matrix, items, error = excel_io.excel_to_data(output)
+
+        self.assertIsNone(error)
+        self.assertEqual(items, ['A', 'B'])
+        self.assertEqual(matrix.time_points, ['2023Q1', '2023Q2'])
+        self.assertEqual(matrix.to_dict(), expected)
+
+    def test_single_item_with_note_column(self):
+        from mydatatrace import excel_io
+
+        # 只有一个题项且得分、说明列都在时，说明列不经过重新索引，pandas 3 可能返回只读数组
+        sheets = [
+            pd.DataFrame({'时间点': ['2023Q1'], 'A - 得分': [80.0], 'A - 说明': [None]}),
+            pd.DataFrame(columns=['时间点', 'A - 得分', 'A - 说明']),
+        ]
+        for df in sheets:
+            output = io.BytesIO()
+            df.to_excel(output, index=False)
+            output.seek(0)
+            matrix, items, error = excel_io.excel_to_data(output)
+            self.assertIsNone(error)
+            self.assertEqual(items, ['A'])
+            self.assertEqual(matrix.to_dict(), {'A': {tp: {'得分': 80.0, '说明': ''} for tp in df['时间点']}})
+            output.seek(0)
+            cohort, error = excel_io.excel_to_cohort(output)
+            self.assertIsNone(error)
+            output.seek(0)
+            streamed, _, error = excel_io.excel_to_data_streaming(output)
+            self.assertIsNone(error)
+            self.assertEqual(streamed.to_dict(), matrix.to_dict())
+
+    def test_streaming_import_matches_excel_to_data(self):
+        from mydatatrace import excel_io
+
+        df = pd.DataFrame({
+            '时间点': [f"2023-{m:02d}" for m in range(1, 13)] + ['2023-01'],
+            'A - 得分': [float(m) for m in range(13)],
+            'A - 说明': ['Note'] * 6 + [None] * 7,
+            'B - 得分': [None] * 13,
+        })
+        output = io.BytesIO()
+        df.to_excel(output, index=False)
+
+        output.seek(0)
+        expected, expected_items, _ = excel_io.excel_to_data(output)
+        output.seek(0)
+        reports = []
+        matrix, items, error = excel_io.excel_to_data_streaming(
+            output, chunk_rows=5, progress=lambda done, total: reports.append(done)
+        )
+
+        self.assertIsNone(error)
+        self.assertEqual(items, expected_items)
+        self.assertEqual(matrix.to_dict(), expected.to_dict())
+        self.assertEqual(reports, [5, 10, 13])
+
+        # 超出内存上限时中止导入并返回错误信息
+        output.seek(0)
+        matrix, items, error = excel_io.excel_to_data_streaming(output, chunk_rows=5, max_memory_mb=0)
+        self.assertIsNone(matrix)
+        self.assertIn('内存上限', error)
+
+    def test_streaming_import_peak_includes_result(self):
+        import tracemalloc
+
+        import numpy as np
+        from openpyxl import load_workbook
+        from mydatatrace import excel_io
+        from mydatatrace.store import ScoreMatrix
+
+        # 内存上限包含最终的得分存储：读完后不再拼接复制，解析之外的峰值不超过结果本身的大小
+        items = [f"题项{i}" for i in range(20)]
+        time_points = [f"T{j}" for j in range(2000)]
+        scores = np.random.default_rng(0).uniform(0, 100, (len(items), len(time_points)))
+        matrix = ScoreMatrix.from_arrays(items, time_points, scores, np.full(scores.shape, '', dtype=object))
+        output = excel_io.data_to_excel(matrix, items, time_points).getvalue()
+        excel_io.excel_to_data_streaming(io.BytesIO(output))
+
+        tracemalloc.start()
+        try:
+            workbook = load_workbook(io.BytesIO(output), read_only=True, data_only=True)
+            for _ in workbook.worksheets[0].iter_rows(values_only=True):
+                pass
+            workbook.close()
+            parse_peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        tracemalloc.start()
+        try:
+            imported, _, error = excel_io.excel_to_data_streaming(io.BytesIO(output), chunk_rows=50)
+            retained, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertIsNone(error)
+        self.assertEqual(imported.time_points, time_points)
+        self.assertTrue(np.allclose(imported.scores, scores))
+        self.assertLessEqual(peak - parse_peak, 1.25 * retained)
+
+        array_mb = (imported.scores.nbytes + imported.notes.nbytes) / 1024 / 1024
+        _, _, error = excel_io.excel_to_data_streaming(io.BytesIO(output), max_memory_mb=array_mb)
+        self.assertIn('内存上限', error)
+
+    def test_export_formats_share_layout(self):
+        from mydatatrace import excel_io
+
+        self.data['B']['2023Q2']['说明'] = ''
+        expected = pd.DataFrame({
+            '时间点': self.time_points,
+            'A - 得分': [80.0, 85.0],
+            'A - 说明': ['Good', 'Better'],
+            'B - 得分': [60.0, 65.0],
+            'B - 说明': ['Okay', ''],
+        })
+        readers = {'xlsx': pd.read_excel, 'csv': pd.read_csv, 'parquet': pd.read_parquet}
+        for fmt, (export_func, _) in excel_io.EXPORT_FORMATS.items():
+            output = export_func(self.data, self.items, self.time_points)
+            df = readers[fmt](output).fillna('')
+            self.assertEqual(list(df.columns), list(expected.columns), fmt)
+            self.assertEqual(df.astype(object).values.tolist(), expected.astype(object).values.tolist(), fmt)
+
+        # 逐行生成，不一次性物化整张表
+        header, rows = excel_io.export_rows(self.data, self.items, self.time_points)
+        self.assertIsInstance(rows, types.GeneratorType)
+        self.assertEqual(next(rows), ['2023Q1', 80.0, 'Good', 60.0, 'Okay'])
+
+        # 导出的xlsx可以原样导入
+        matrix, items, error = excel_io.excel_to_data(excel_io.data_to_excel(self.data, self.items, self.time_points))
+        self.assertIsNone(error)
+        self.assertEqual(matrix.to_dict(), self.data)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,72 @@
+import sys
+import os
+from datetime import datetime
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import apply_grid_edits, grid_frame
+from mydatatrace.store import ScoreMatrix
+
+ITEMS = ['题项1', '题项2']
+TIME_POINTS = ['2025Q1', '2025Q2', '2025Q3']
+
+
+def test_grid_frame_round_trip():
+    """测试表格录入的数据框与得分存储之间的往返，编辑结果批量写回"""
+    matrix = ScoreMatrix.from_arrays(ITEMS, TIME_POINTS, np.array([[10.0, 20.0, 30.0], [40.0, 50.0, 60.0]]),
+                                     np.array([['a', '', ''], ['', 'b', '']], dtype=object))
+    frame = grid_frame(matrix, ITEMS, TIME_POINTS[:2])
+    assert list(frame.index) == ['2025Q1', '2025Q2']
+    assert list(frame.columns) == ['题项1 - 得分', '题项1 - 说明', '题项2 - 得分', '题项2 - 说明']
+    assert frame.loc['2025Q2', '题项2 - 说明'] == 'b'
+
+    assert apply_grid_edits(matrix, ITEMS, TIME_POINTS[:2], frame) == 0, "未编辑时不应写入"
+    frame.loc['2025Q1', '题项2 - 得分'] = 120.0  # 超出范围的得分被截断
+    frame.loc['2025Q2', '题项1 - 说明'] = None  # 清空的说明写为空字符串
+    frame.loc['2025Q2', '题项1 - 得分'] = np.nan
+    assert apply_grid_edits(matrix, ITEMS, TIME_POINTS[:2], frame) == 2
+    assert matrix.get_score('题项2', '2025Q1') == 100.0
+    assert matrix.get_score('题项1', '2025Q2') == 0.0 and matrix.get_note('题项1', '2025Q2') == ''
+    assert matrix.get_score('题项1', '2025Q3') == 30.0, "当前页以外的时间点不受影响"
+
+
+def test_grid_entry_mode_renders_single_editor():
+    """测试表格录入模式按时间范围分页，只渲染一个编辑器，不再逐格创建输入组件"""
+    from streamlit.testing.v1 import AppTest
+
+    app_path = os.path.join(os.path.dirname(__file__), '..', 'app.py')
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.session_state['config_items'] = ['题项1', '题项2', '题项3']
+    at.session_state['time_config'] = {
+        'start_date': datetime(2023, 1, 1), 'end_date': datetime(2024, 12, 1), 'time_granularity': '月份'
+    }
+    at.session_state['entry_mode'] = '表格录入'
+    at.run()
+    assert not at.exception, at.exception
+    assert len(at.text_area) == 0
+    page_select = [box for box in at.selectbox if box.label == '时间范围']
+    assert len(page_select) == 1 and len(page_select[0].options) == 2, "24 个月应分为两页"
+
+
+def test_grid_editor_key_follows_time_points():
+    """测试时间范围变化后换用新的编辑器，旧表格上的编辑不会按行号写到新的时间点"""
+    from streamlit.testing.v1 import AppTest
+
+    app_path = os.path.join(os.path.dirname(__file__), '..', 'app.py')
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.session_state['config_items'] = ITEMS
+    at.session_state['time_config'] = {
+        'start_date': datetime(2023, 1, 1), 'end_date': datetime(2023, 6, 1), 'time_granularity': '月份'
+    }
+    at.session_state['entry_mode'] = '表格录入'
+    at.run()
+    editor_key = at.dataframe[0].key
+    at.run()
+    assert at.dataframe[0].key == editor_key, "时间范围不变时沿用同一个编辑器"
+
+    at.date_input(key='start_date').set_value(datetime(2023, 2, 1)).run()
+    assert not at.exception, at.exception
+    assert at.dataframe[0].key != editor_key
@@ -0,0 +1,149 @@
+import sys
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace.jobs import RenderJob, RenderPool
+from mydatatrace.render import generate_chart, generate_chart_tiled
+
+ITEMS = ['题项1', '题项2']
+TIME_POINTS = ['2025Q1', '2025Q2']
+DATA = {item: {tp: {'得分': 30.0 + 10 * i + j, '说明': ''} for j, tp in enumerate(TIME_POINTS)} for i, item in enumerate(ITEMS)}
+COLORS = {'题项1': '#FF6B6B', '题项2': '#4ECDC4'}
+
+
+def test_render_pool_job_lifecycle():
+    """测试后台渲染结果与直接渲染一致，排队中的任务可以取消"""
+    pool = RenderPool(max_workers=1)
+    try:
+        jobs = [pool.submit(f'job{n}', DATA, ITEMS, TIME_POINTS, COLORS, 'png', 40 + n) for n in range(4)]
+        assert jobs[0].key == 'job0'
+        assert jobs[-1].status == 'queued', f"单个工作进程时最后一个任务应在排队: {jobs[-1].status}"
+        assert jobs[-1].cancel()
+        assert jobs[-1].status == 'cancelled'
+
+        expected = generate_chart(DATA, ITEMS, TIME_POINTS, COLORS, 'png', 40).getvalue()
+        assert jobs[0].result() == expected
+        assert jobs[0].status == 'done'
+    finally:
+        pool.shutdown()
+
+
+def test_tiled_job_matches_local_tiled_render():
+    """测试分块任务在工作进程中渲染、拼接后与本地分块渲染一致，完成回调在拼接完成后只触发一次"""
+    pool = RenderPool(max_workers=2)
+    try:
+        job = pool.submit_tiled('tiled', DATA, ITEMS, TIME_POINTS, COLORS, 'png', 40)
+        assert len(job.futures) == len(ITEMS)
+        calls = []
+        settled = threading.Event()
+        job.add_done_callback(lambda job: (calls.append(job), settled.set()))
+        expected = generate_chart_tiled(DATA, ITEMS, TIME_POINTS, COLORS, 'png', 40).getvalue()
+        assert settled.wait(60)
+        assert job._result == expected, "回调触发前已在后台线程拼接好"
+        assert job.result() == expected
+        assert job.status == 'done'
+        job.add_done_callback(calls.append)  # 已完成的任务立即回调
+        assert calls == [job, job]
+    finally:
+        pool.shutdown()
+
+
+def test_job_assemble_error_reported_as_failed():
+    """测试拼接出错的分块任务状态为 failed，错误由 error() 报告"""
+    def assemble(tiles):
+        raise ValueError("拼接失败")
+
+    future = Future()
+    job = RenderJob('broken', [future], assemble)
+    settled = threading.Event()
+    job.add_done_callback(lambda job: settled.set())
+    future.set_result(b'tile')
+    assert settled.wait(10)
+    assert job.status == 'failed' and isinstance(job.error(), ValueError)
+
+
+def generate_button(at):
+    return next(button for button in at.button if '立即生成' in button.label)
+
+
+def wait_for_render_job(at, timeout=60):
+    """重跑页面直到后台渲染任务结束"""
+    deadline = time.time() + timeout
+    while at.session_state['render_job'] is not None:
+        assert time.time() < deadline, "后台渲染超时"
+        time.sleep(0.2)
+        at.run()
+
+
+def test_app_cache_hit_cancels_pending_job():
+    """测试再次生成命中缓存时也会放弃未完成的旧任务，旧任务不能覆盖新的结果"""
+    from streamlit.testing.v1 import AppTest
+
+    app_path = os.path.join(os.path.dirname(__file__), '..', 'app.py')
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.session_state['config_items'] = ITEMS
+    at.run()
+    generate_button(at).click().run()
+    assert not at.exception, at.exception
+    wait_for_render_job(at)
+    assert at.session_state['chart_is_preview'] is False
+
+    # 模拟对另一份输入提交、尚未完成的任务；当前输入的高清图已在缓存中
+    stale = RenderJob('stale', [Future()])
+    at.session_state['render_job'] = stale
+    at.session_state['render_job_output'] = ('jpg', 300)
+    at.run()
+    generate_button(at).click().run()
+    assert not at.exception, at.exception
+    assert stale.status == 'cancelled'
+    assert at.session_state['render_job'] is None
+    assert at.session_state['chart_is_preview'] is False
+
+
+def test_app_edit_in_entry_fragment_cancels_pending_job():
+    """测试在录入片段中修改得分后，轮询片段会取消未完成的任务；输入未变化时任务保留"""
+    from streamlit.testing.v1 import AppTest
+
+    app_path = os.path.join(os.path.dirname(__file__), '..', 'app.py')
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.session_state['config_items'] = ITEMS
+    at.run()
+    pending = RenderJob('pending', [Future()])
+    at.session_state['render_job'] = pending
+    at.session_state['render_job_output'] = ('jpg', 300)
+    at.session_state['last_chart_versions'] = at.session_state['state_versions'].snapshot()
+    at.run()
+    assert pending.status == 'queued' and at.session_state['render_job'] is pending
+
+    at.number_input(key='题项1_2025Q1_input').set_value(42.0).run()
+    assert not at.exception, at.exception
+    assert pending.status == 'cancelled'
+    assert at.session_state['render_job'] is None
+
+
+def test_app_polls_only_while_job_pending():
+    """测试没有任务时不挂载轮询片段；任务失败后整页重跑并显示一次错误提示"""
+    from streamlit.testing.v1 import AppTest
+
+    app_path = os.path.join(os.path.dirname(__file__), '..', 'app.py')
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.session_state['config_items'] = ITEMS
+    at.run()
+    assert not any('高清图' in info.value for info in at.info)
+
+    failed = Future()
+    failed.set_exception(RuntimeError('渲染进程退出'))
+    at.session_state['render_job'] = RenderJob('failed', [failed])
+    at.session_state['render_job_output'] = ('jpg', 300)
+    at.session_state['last_chart_versions'] = at.session_state['state_versions'].snapshot()
+    at.run()
+    assert not at.exception, at.exception
+    assert at.session_state['render_job'] is None
+    assert any('高清图生成失败: 渲染进程退出' in error.value for error in at.error)
+    at.run()
+    assert not any('高清图生成失败' in error.value for error in at.error)
@@ -0,0 +1,43 @@
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace import perf
+from mydatatrace.excel_io import data_to_excel
+from mydatatrace.store import ScoreMatrix
+
+
+def test_stages_are_recorded_only_when_enabled(monkeypatch):
+    """测试关闭时不记录任何阶段；开启后按嵌套关系汇总，自身耗时扣除子阶段"""
+    matrix = ScoreMatrix(['题项1'], ['2025Q1'])
+    with perf.recording() as records:
+        data_to_excel(matrix, ['题项1'], ['2025Q1'])
+    assert records == []
+
+    monkeypatch.setattr(perf, '_enabled', True)
+    with perf.recording() as records:
+        with perf.stage('export'):
+            data_to_excel(matrix, ['题项1'], ['2025Q1'])
+            data_to_excel(matrix, ['题项1'], ['2025Q1'])
+    rows = {row['stage']: row for row in perf.summarize(records)}
+    assert [record.name for record in records[:3]] == ['export', 'excel.rows', 'excel.write']
+    assert rows['excel.write']['calls'] == 2 and rows['excel.write']['depth'] == 1
+    children = rows['excel.rows']['total_ms'] + rows['excel.write']['total_ms']
+    assert abs(rows['export']['self_ms'] - (rows['export']['total_ms'] - children)) < 1e-6
+
+
+def test_perf_panel_shows_rerun_breakdown(monkeypatch):
+    """测试开启埋点后侧边栏显示整页重跑的阶段耗时和会话状态大小"""
+    from streamlit.testing.v1 import AppTest
+
+    monkeypatch.setattr(perf, '_enabled', True)
+    app_path = os.path.join(os.path.dirname(__file__), '..', 'app.py')
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.run()
+    assert not at.exception, at.exception
+    stages = list(at.sidebar.dataframe[0].value['阶段'])
+    assert stages[0] == 'app.rerun'
+    assert any(stage.strip('　') == 'app.export_section' for stage in stages)
+    assert any('会话状态' in caption.value for caption in at.sidebar.caption)
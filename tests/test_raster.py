@@ -0,0 +1,133 @@
+import sys
+import os
+import io
+
+import numpy as np
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace.raster import PngStreamWriter, RasterBudgetError, plan_raster
+from mydatatrace.render import (assemble_chart, generate_chart, generate_chart_tiled, panel_tasks, plan_chart,
+                                render_panel)
+
+ITEMS = ['题项1', '题项2', '题项3']
+TIME_POINTS = ['2025Q1', '2025Q2', '2025Q3']
+DATA = {
+    item: {tp: {'得分': 20.0 * (i + j + 1), '说明': f'说明{i}{j}' if j else ''} for j, tp in enumerate(TIME_POINTS)}
+    for i, item in enumerate(ITEMS)
+}
+COLORS = {'题项1': '#FF6B6B', '题项2': '#4ECDC4', '题项3': '#45B7D1'}
+# 四行子图，条带只占整图高度的四分之一
+MANY_ITEMS = [f'题项{i + 1}' for i in range(8)]
+MANY_DATA = {
+    item: {tp: {'得分': 10.0 * (i + j + 1), '说明': f'说明{i}{j}' if j else ''} for j, tp in enumerate(TIME_POINTS)}
+    for i, item in enumerate(MANY_ITEMS)
+}
+
+
+def test_plan_raster_budget():
+    """测试超出预算时先改为条带渲染，再自动降低分辨率或拒绝"""
+    figsize, strip_size = (10, 20), (10, 4)
+    full = plan_raster(figsize, 'png', 100, max_bytes=10 ** 9, strip_size=strip_size)
+    assert (full.width, full.height, full.strips, full.dpi) == (1000, 2000, False, 100)
+    assert full.peak_bytes == 1000 * 2000 * 4
+
+    strips = plan_raster(figsize, 'png', 100, max_bytes=6 * 10 ** 6, strip_size=strip_size)
+    assert strips.strips and strips.dpi == 100 and strips.peak_bytes <= 6 * 10 ** 6
+    # JPEG 的条带模式要计入整张图的编码缓冲区，分块模式要计入全部分块
+    assert plan_raster(figsize, 'jpg', 100, max_bytes=10 ** 9, strip_size=strip_size).peak_bytes == 1000 * 2000 * 7
+    jpg_strips = plan_raster(figsize, 'jpg', 100, max_bytes=10 * 10 ** 6, strip_size=strip_size)
+    assert jpg_strips.strips and jpg_strips.peak_bytes > 1000 * 2000 * 4
+    tiled = plan_raster(figsize, 'png', 100, max_bytes=10 ** 9, strip_size=strip_size, tiled=True)
+    assert not tiled.strips and tiled.peak_bytes > 1000 * 2000 * 3
+
+    downgraded = plan_raster(figsize, 'png', 100, max_bytes=2 * 10 ** 6, strip_size=strip_size)
+    assert downgraded.downgraded and downgraded.peak_bytes <= 2 * 10 ** 6
+    assert downgraded.width == int(np.ceil(10 * downgraded.dpi))
+
+    with pytest.raises(RasterBudgetError):
+        plan_raster(figsize, 'png', 100, max_bytes=2 * 10 ** 6, over_budget='refuse', strip_size=strip_size)
+    with pytest.raises(RasterBudgetError):
+        plan_raster(figsize, 'png', 100, max_bytes=100)
+
+
+def test_png_stream_writer_roundtrip():
+    """测试逐条写入的 PNG 能被 PIL 正确解码"""
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (37, 23, 3), dtype=np.uint8)
+    image[10:20] = 255
+    buf = io.BytesIO()
+    writer = PngStreamWriter(buf, 23, 37, dpi=150)
+    for start in range(0, 37, 8):
+        writer.write_rows(image[start:start + 8])
+    writer.close()
+
+    decoded = Image.open(io.BytesIO(buf.getvalue()))
+    assert decoded.mode == 'RGB'
+    assert round(decoded.info['dpi'][0]) == 150
+    assert (np.asarray(decoded) == image).all()
+
+    with pytest.raises(ValueError):
+        PngStreamWriter(io.BytesIO(), 23, 37).close()
+
+
+def test_generate_chart_strips_match_full_render():
+    """测试超出内存预算时按条带渲染的图片与整图渲染逐像素一致（误差不超过 1），拒绝模式抛出异常"""
+    from PIL import Image
+
+    def pixels(buf):
+        return np.asarray(Image.open(buf).convert('RGB'))
+
+    # 条带渲染与分块渲染共用同一条拼接、编码路径
+    expected = pixels(generate_chart(DATA, ITEMS, TIME_POINTS, COLORS, 'png', 60))
+    assert (pixels(generate_chart_tiled(DATA, ITEMS, TIME_POINTS, COLORS, 'png', 60)) == expected).all()
+    # 整图约 1.4 MB，条带渲染约 1.3 MB
+    assert plan_chart(MANY_DATA, MANY_ITEMS, TIME_POINTS, 'png', 60, max_bytes=1400 * 1024).strips
+    full = pixels(generate_chart(MANY_DATA, MANY_ITEMS, TIME_POINTS, COLORS, 'png', 60))
+    striped = pixels(generate_chart(MANY_DATA, MANY_ITEMS, TIME_POINTS, COLORS, 'png', 60, max_bytes=1400 * 1024))
+    assert full.shape == striped.shape
+    # 条带边界处的抗锯齿可能相差 1 个色阶
+    assert np.abs(full.astype(int) - striped.astype(int)).max() <= 1
+
+    with pytest.raises(RasterBudgetError):
+        generate_chart(DATA, ITEMS, TIME_POINTS, COLORS, 'png', 60, max_bytes=100 * 1024, over_budget='refuse')
+    downgraded = pixels(generate_chart(MANY_DATA, MANY_ITEMS, TIME_POINTS, COLORS, 'jpg', 120,
+                                       max_bytes=4000 * 1024))
+    assert full.shape[0] <= downgraded.shape[0] < 2 * full.shape[0]
+
+
+def test_measured_peak_within_plan():
+    """测试条带渲染（PNG/JPEG）和主进程拼接分块时实际分配的内存不超过 plan_raster 的估算"""
+    import tracemalloc
+
+    dpi = 150
+    generate_chart(MANY_DATA, MANY_ITEMS, TIME_POINTS, COLORS, 'png', 30)  # 预先注册字体、填充缓存
+    for output_format in ('png', 'jpg'):
+        full = plan_chart(MANY_DATA, MANY_ITEMS, TIME_POINTS, output_format, dpi, max_bytes=10 ** 12)
+        budget = full.peak_bytes - 1
+        plan = plan_chart(MANY_DATA, MANY_ITEMS, TIME_POINTS, output_format, dpi, max_bytes=budget)
+        assert plan.strips
+        tracemalloc.start()
+        try:
+            generate_chart(MANY_DATA, MANY_ITEMS, TIME_POINTS, COLORS, output_format, dpi, max_bytes=budget)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert plan.width * plan.height * 3 < 2 * peak  # 确实测到了像素缓冲区
+        assert peak <= plan.peak_bytes, (output_format, peak, plan.peak_bytes)
+
+        # 分块由工作进程渲染，在主进程中接收全部分块后拼接
+        tiled = plan_chart(MANY_DATA, MANY_ITEMS, TIME_POINTS, output_format, dpi, max_bytes=10 ** 12, tiled=True)
+        rendered = [render_panel(*task) for task in panel_tasks(MANY_DATA, MANY_ITEMS, TIME_POINTS, COLORS, dpi)]
+        tracemalloc.start()
+        try:
+            tiles = [tile.copy() for tile in rendered]
+            assemble_chart(tiles, output_format, dpi)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert peak <= tiled.peak_bytes, (output_format, peak, tiled.peak_bytes)
@@ -0,0 +1,53 @@
+import sys
+import os
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace.reconcile import Reconciler
+from mydatatrace.store import ScoreMatrix
+
+ITEMS = ['题项1', '题项2']
+MONTHS = ['2025-01', '2025-02', '2025-03', '2025-04', '2025-05', '2025-06']
+
+
+def test_reconcile_range_change_touches_only_diff():
+    """测试时间范围变化只新增缺失的列，已录入的得分不变，配置未变化时跳过"""
+    matrix = ScoreMatrix(ITEMS)
+    reconciler = Reconciler(default_score=70.0)
+    assert reconciler.reconcile(matrix, ITEMS, MONTHS[:3])
+    matrix.set_score('题项1', '2025-02', 10.0)
+    assert not reconciler.reconcile(matrix, ITEMS, MONTHS[:3]), "配置和存储都未变化时应跳过"
+
+    assert reconciler.reconcile(matrix, ITEMS, MONTHS[1:])
+    assert matrix.get_score('题项1', '2025-02') == 10.0
+    assert matrix.get_score('题项2', '2025-06') == 70.0
+    # 相同粒度、不在范围内的时间点保留，扩大范围后得分仍在
+    assert '2025-01' in matrix.tp_index
+
+    reconciler.reconcile(matrix, ITEMS + ['题项3'], MONTHS[1:])
+    assert matrix.get_score('题项3', '2025-03') == 70.0
+
+
+def test_reconcile_granularity_switch_keeps_scores():
+    """测试月份切换为季度时按所选方式合并得分和说明，切回月份时沿用季度得分"""
+    scores = np.array([[10, 20, 60, 50, 50, 50], [70, 70, 70, 70, 70, 70]], dtype=float)
+    notes = np.array([['一', '', '三', '', '', ''], [''] * 6], dtype=object)
+    matrix = ScoreMatrix.from_arrays(ITEMS, MONTHS, scores, notes)
+    reconciler = Reconciler()
+
+    reconciler.reconcile(matrix, ITEMS, ['2025Q1', '2025Q2'], aggregation='平均')
+    assert matrix.time_points == ['2025Q1', '2025Q2'], "换算后应删除月份的列"
+    assert matrix.get_score('题项1', '2025Q1') == 30.0
+    assert matrix.get_note('题项1', '2025Q1') == '一；三'
+
+    last = ScoreMatrix.from_arrays(ITEMS, MONTHS, scores, notes)
+    Reconciler().reconcile(last, ITEMS, ['2025Q1', '2025Q2'], aggregation='最后')
+    assert last.get_score('题项1', '2025Q1') == 60.0
+
+    reconciler.reconcile(matrix, ITEMS, MONTHS[:3])
+    assert [matrix.get_score('题项1', tp) for tp in MONTHS[:3]] == [30.0, 30.0, 30.0]
+    assert [matrix.get_note('题项1', tp) for tp in MONTHS[:3]] == ['一；三', '', '']
+    assert '2025Q1' not in matrix.tp_index
@@ -0,0 +1,70 @@
+import sys
+import os
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace.store import ScoreMatrix
+
+
+def sample_dict():
+    return {
+        '题项1': {'2025Q1': {'得分': 50.0, '说明': '起步'}, '2025Q2': {'得分': 55.0, '说明': ''}},
+        '题项2': {'2025Q1': {'得分': 60.0, '说明': ''}},
+    }
+
+
+def test_dict_round_trip():
+    """测试与嵌套字典之间的互相转换"""
+    matrix = ScoreMatrix.from_dict(sample_dict())
+    assert matrix.items == ['题项1', '题项2']
+    assert matrix.time_points == ['2025Q1', '2025Q2']
+    assert np.isnan(matrix.get_score('题项2', '2025Q2')), "未录入的单元格应为 NaN"
+    assert matrix.to_dict() == sample_dict(), f"往返转换结果不一致: {matrix.to_dict()}"
+
+
+def test_row_operations():
+    """测试题项的增删改均为行操作"""
+    matrix = ScoreMatrix.from_dict(sample_dict())
+
+    matrix.add_item('题项3')
+    assert matrix.scores.shape == (3, 2)
+    assert matrix.item_index['题项3'] == 2
+
+    matrix.rename_item('题项1', '新题项1')
+    assert '题项1' not in matrix and '新题项1' in matrix
+    assert matrix.get_note('新题项1', '2025Q1') == '起步'
+
+    matrix.delete_item('题项2')
+    assert matrix.items == ['新题项1', '题项3']
+    assert matrix.item_index == {'新题项1': 0, '题项3': 1}, f"删除后索引未重建: {matrix.item_index}"
+
+
+def test_time_points_and_block():
+    """测试时间点补齐、默认值填充和子矩阵读取"""
+    matrix = ScoreMatrix.from_dict(sample_dict())
+    matrix.add_time_points(['2025Q2', '2025Q3'])
+    matrix.fill_missing(['题项1', '题项2'], ['2025Q1', '2025Q2', '2025Q3'], 70.0)
+    assert matrix.get_score('题项1', '2025Q1') == 50.0, "已录入的得分不应被覆盖"
+    assert matrix.get_score('题项2', '2025Q3') == 70.0
+
+    scores, notes = matrix.block(['题项2', '不存在'], ['2025Q1', '2024Q4'])
+    assert scores.tolist() == [[60.0, 0.0], [0.0, 0.0]], f"子矩阵得分错误: {scores}"
+    assert notes.tolist() == [['', ''], ['', '']]
+
+
+def test_update_block_writes_only_changes():
+    """测试批量写回只写入改动的单元格，未改动的未录入单元格保持 NaN"""
+    matrix = ScoreMatrix.from_dict(sample_dict())
+    scores, notes = matrix.block(['题项1', '题项2', '不存在'], ['2025Q1', '2025Q2'])
+    scores[0, 0] = 51.0
+    notes[1, 0] = '新说明'
+    scores[2, 1] = 99.0  # 不存在的题项被忽略
+    written = matrix.update_block(['题项1', '题项2', '不存在'], ['2025Q1', '2025Q2'], scores, notes)
+    assert written == 2
+    assert matrix.get_score('题项1', '2025Q1') == 51.0
+    assert matrix.get_note('题项2', '2025Q1') == '新说明' and matrix.get_score('题项2', '2025Q1') == 60.0
+    assert np.isnan(matrix.get_score('题项2', '2025Q2')), "未改动的未录入单元格应保持 NaN"
+    assert '不存在' not in matrix
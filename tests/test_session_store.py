@@ -0,0 +1,77 @@
+import sys
+import os
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace.session_store import SessionStore, SessionWriter
+from mydatatrace.store import ScoreMatrix
+
+TOKEN = 'abcdefghijklmnopqrstuv'
+CONFIG = {
+    'time_config': {'start_date': '2025-01-01T00:00:00', 'end_date': '2025-06-30T00:00:00', 'time_granularity': '季度'},
+    'config_items': ['题项1', '题项2'],
+    'style_config': {'ncol': 2, 'nrow': 6, 'color_palette': '默认配色', 'custom_colors': []},
+}
+
+
+def test_session_writer_batches_changed_cells(tmp_path):
+    """测试延迟写入只写改动的单元格，删除和重命名同步到存储，重新加载后数据一致"""
+    store = SessionStore(str(tmp_path / 'sessions.sqlite'))
+    writer = SessionWriter(store, TOKEN, interval=60)
+    matrix = ScoreMatrix(['题项1', '题项2'], ['2025Q1', '2025Q2'])
+    matrix.fill_missing(matrix.items, matrix.time_points, 70.0)
+    assert store.load(TOKEN) is None
+
+    assert writer.flush(matrix, CONFIG) == 4
+    matrix.set_score('题项1', '2025Q1', 80.0)
+    matrix.set_note('题项2', '2025Q2', '说明')
+    assert writer.flush(matrix, CONFIG) is None, "未到写入间隔时应跳过"
+    assert writer.flush(matrix, CONFIG, force=True) == 2
+    assert writer.flush(matrix, CONFIG, force=True) == 0
+
+    matrix.rename_item('题项1', '新题项')
+    matrix.add_time_points(['2025Q3'])
+    assert writer.flush(matrix, {**CONFIG, 'config_items': ['新题项', '题项2']}, force=True) == 2
+
+    config, loaded = store.load(TOKEN)
+    assert config['config_items'] == ['新题项', '题项2']
+    assert loaded.items == matrix.items and loaded.time_points == matrix.time_points
+    assert np.array_equal(loaded.scores, matrix.scores, equal_nan=True)
+    assert (loaded.notes == matrix.notes).all()
+    rows = store._conn.execute("SELECT COUNT(*) FROM cells WHERE item = '题项1'").fetchone()[0]
+    assert rows == 0, "重命名后旧题项的单元格应被删除"
+    store.close()
+
+
+def test_app_restores_session_from_token(tmp_path, monkeypatch):
+    """测试页面按链接中的会话令牌恢复存储中的配置和得分，之后的录入在重跑结束时写回存储"""
+    from streamlit.testing.v1 import AppTest
+
+    db_path = str(tmp_path / 'sessions.sqlite')
+    store = SessionStore(db_path)
+    matrix = ScoreMatrix(['题项1', '题项2'], ['2025Q1', '2025Q2'])
+    matrix.fill_missing(matrix.items, matrix.time_points, 42.0)
+    SessionWriter(store, TOKEN).flush(matrix, CONFIG)
+    store.close()
+
+    monkeypatch.setenv('MYDATATRACE_SESSION_DB', db_path)
+    app_path = os.path.join(os.path.dirname(__file__), '..', 'app.py')
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.query_params['session'] = TOKEN
+    at.run()
+    assert not at.exception, at.exception
+    assert at.session_state.config_items == ['题项1', '题项2']
+    assert at.session_state.time_config['time_granularity'] == '季度'
+    assert at.session_state.data.get_score('题项2', '2025Q2') == 42.0
+    assert at.query_params['session'] == TOKEN
+
+    # 录入的改动在本次重跑结束时写入，不依赖定时任务
+    at.number_input(key='题项1_2025Q2_input').set_value(77.0).run()
+    assert not at.exception, at.exception
+    store = SessionStore(db_path)
+    _, saved = store.load(TOKEN)
+    assert saved.get_score('题项1', '2025Q2') == 77.0
+    store.close()
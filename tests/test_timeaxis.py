@@ -0,0 +1,52 @@
+import sys
+import os
+from datetime import date, datetime
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace.timeaxis import coarsen, get_time_axis, parse_time_point
+
+
+def test_time_axis_is_cached_and_indexed():
+    """测试相同配置复用同一条时间轴，提供标签索引和起始日期数组"""
+    axis = get_time_axis(datetime(2024, 11, 15), datetime(2025, 5, 1), '季度')
+    assert axis is get_time_axis(date(2024, 11, 15), date(2025, 5, 1), '季度')
+    assert axis.labels == ('2024Q4', '2025Q1', '2025Q2')
+    assert axis.index['2025Q1'] == 1 and '2025Q3' not in axis
+    assert list(axis.positions(['2025Q2', '2026Q1'])) == [2, -1]
+    assert axis.starts.tolist() == [date(2024, 10, 1), date(2025, 1, 1), date(2025, 4, 1)]
+    assert list(axis.years) == [2024, 2025, 2025]
+    assert len(get_time_axis(date(2025, 3, 1), date(2025, 1, 1), '月份')) == 0
+
+
+def test_week_and_half_year_granularities():
+    """测试周（ISO 周）和半年度时间点"""
+    half = get_time_axis(date(2024, 5, 1), date(2025, 7, 1), '半年度')
+    assert half.labels == ('2024H1', '2024H2', '2025H1', '2025H2')
+
+    # 2024-12-30 所在的周属于 2025 年第 1 周
+    weeks = get_time_axis(date(2024, 12, 20), date(2025, 1, 8), '周')
+    assert weeks.labels == ('2024-W51', '2024-W52', '2025-W01', '2025-W02')
+    assert weeks.starts[2] == np.datetime64('2024-12-30')
+    assert list(weeks.years) == [2024, 2024, 2025, 2025]
+    ten_years = get_time_axis(date(2015, 1, 1), date(2024, 12, 31), '周')
+    assert len(ten_years) == 523 and len(ten_years.index) == 523
+    assert ten_years.labels[0] == '2015-W01' and ten_years.labels[-1] == '2025-W01'
+
+
+def test_parse_and_coarsen_time_points():
+    """测试时间点标签的解析和向粗粒度换算"""
+    assert parse_time_point('2025-04') == ('月份', 2025, 4)
+    assert parse_time_point('2025Q2') == ('季度', 2025, 4)
+    assert parse_time_point('2025') == ('年度', 2025, 1)
+    assert parse_time_point('2025-13') is None and parse_time_point('第一季度') is None
+    assert coarsen('2025-05', '季度') == '2025Q2'
+    assert coarsen('2025Q3', '年度') == '2025'
+    assert coarsen('2025Q3', '月份') is None, "粗粒度不能换算为细粒度"
+    assert parse_time_point('2025H2') == ('半年度', 2025, 7)
+    assert coarsen('2024-W01', '月份') == '2024-01'
+    assert coarsen('2025-W01', '季度') == '2025Q1', "跨年的周按周四所在的年、月归属"
+    assert coarsen('2025-05', '半年度') == '2025H1'
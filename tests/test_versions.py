@@ -0,0 +1,59 @@
+import sys
+import os
+import io
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mydatatrace.cache import export_cache_key
+from mydatatrace.versions import StateVersions
+
+ITEMS = ['题项1', '题项2']
+TIME_POINTS = ['2025Q1', '2025Q2']
+
+
+def test_state_versions_track_sections():
+    """测试版本号按部分递增，快照之后的修改能被识别，版本标识可代替得分内容作为导出缓存键"""
+    versions = StateVersions()
+    snapshot = versions.snapshot()
+    assert versions.changed_since(snapshot) == []
+    assert versions.changed_since(None) == ['data', 'items', 'time', 'style']
+
+    versions.bump('data')
+    versions.bump('items', 'style')
+    assert versions.changed_since(snapshot) == ['data', 'items', 'style']
+    assert versions['data'] == 1 and versions['time'] == 0
+
+    key = export_cache_key(None, ITEMS, TIME_POINTS, 'xlsx', versions.token('data'))
+    assert key == export_cache_key(None, ITEMS, TIME_POINTS, 'xlsx', versions.token('data'))
+    assert key != export_cache_key(None, ITEMS, TIME_POINTS, 'xlsx', StateVersions().token('data')), \
+        "不同会话的版本号不应共用缓存"
+    versions.bump('data')
+    assert key != export_cache_key(None, ITEMS, TIME_POINTS, 'xlsx', versions.token('data'))
+
+
+def test_app_marks_chart_stale_after_edit():
+    """测试录入得分后递增得分的版本号，并提示已显示的图表过期；未修改时重跑不改变版本号"""
+    from PIL import Image
+    from streamlit.testing.v1 import AppTest
+
+    app_path = os.path.join(os.path.dirname(__file__), '..', 'app.py')
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.session_state['config_items'] = ITEMS
+    at.run()
+    assert not at.exception, at.exception
+
+    image = io.BytesIO()
+    Image.new('RGB', (4, 4)).save(image, format='JPEG')
+    versions = at.session_state['state_versions']
+    at.session_state['last_chart_buf'] = image
+    at.session_state['last_chart_versions'] = versions.snapshot()
+    at.session_state['chart_is_preview'] = True
+    at.session_state['show_results'] = True
+    at.run()
+    assert versions.changed_since(at.session_state['last_chart_versions']) == []
+    assert not any('已修改' in warning.value for warning in at.warning)
+
+    at.number_input(key='题项1_2025Q1_input').set_value(42.0).run()
+    assert versions.changed_since(at.session_state['last_chart_versions']) == ['data']
+    assert any('得分和说明已修改' in warning.value for warning in at.warning)